@@ -0,0 +1,784 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for the MIDI → volume sync pipeline (no MIDI hardware or Spotify needed)"""
+
+import argparse
+import asyncio
+import importlib.util
+import logging
+import math
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from orthocontrol.auth import TokenRefresher
+from orthocontrol.midi.drain import drain_midi_input
+from orthocontrol.midi.mapping import DispatchTable, default_mappings
+from orthocontrol.midi.motion import MotionTracker
+from orthocontrol.midi.session import SessionLog, SessionRecorder, replay_session
+from orthocontrol.playback import PlaybackStateCache
+from orthocontrol.ratelimit import AdaptiveTokenBucket
+from orthocontrol.spotify import AsyncSpotifyClient
+from orthocontrol.sync import BURST_SYNC_INTERVAL, SETTLE_DELAY, SYNC_INTERVAL, VolumeSyncWorker
+from tests.fakes import (FakeOAuth, FakeTokenEndpoint, FlakyBackend, HandshakeCountingServer, InlineExecutor,
+                         MockSpotifyApi, RateLimited, VirtualClockLoop, knob_gestures, replay_gestures,
+                         self_signed_certificate, static_token)
+
+
+class LegacyPollingWorker:
+    """Reference copy of the original 50ms sleep-poll loop, kept for comparison."""
+
+    def __init__(self, sync_volume):
+        self._sync_volume = sync_volume
+        self._lock = threading.Lock()
+        self._target = None
+        self._stop = False
+        self._thread = None
+        self.wakeups = 0
+
+    def set_target(self, volume_percent):
+        with self._lock:
+            self._target = volume_percent
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop = True
+        self._thread.join(timeout=timeout)
+
+    def run(self):
+        last_synced_volume = None
+        last_sync_time = 0
+        while not self._stop:
+            time.sleep(0.05)
+            self.wakeups += 1
+            now = time.time()
+            if now - last_sync_time < SYNC_INTERVAL:
+                continue
+            with self._lock:
+                current_target = self._target
+            if current_target is not None and current_target != last_synced_volume:
+                if self._sync_volume(current_target):
+                    last_synced_volume = current_target
+                    last_sync_time = now
+
+
+class BackgroundLoop:
+    """Runs an asyncio loop on its own thread, standing in for orthocontrol's runtime while
+    the main thread plays the part of rtmidi."""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    def call(self, func, *args):
+        """Runs func(*args) on the loop thread and waits for the result."""
+        async def invoke():
+            return func(*args)
+        return self.wait(invoke())
+
+    def wait(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+def measure_worker(name, start, set_target, stop, get_wakeups, sync_times, synced, args):
+    start()
+
+    # Idle: nobody touches the knob
+    wakeups_before = get_wakeups()
+    time.sleep(args.idle_seconds)
+    idle_per_minute = (get_wakeups() - wakeups_before) * 60.0 / args.idle_seconds
+
+    # First change after a quiet period, at a random phase relative to any poll loop
+    latencies = []
+    for trial in range(args.trials):
+        time.sleep(SYNC_INTERVAL + random.uniform(0.0, 0.05))
+        synced.clear()
+        started = time.perf_counter()
+        set_target(trial % 100 + 1)
+        if synced.wait(timeout=2.0):
+            latencies.append((sync_times[-1] - started) * 1000.0)
+    stop()
+
+    latencies.sort()
+    print(f"{name:>20}: first-change latency median {statistics.median(latencies):6.2f}ms "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1]:6.2f}ms, "
+          f"idle wakeups/min {idle_per_minute:7.1f}")
+
+
+def bench_worker(args):
+    """First-change latency and idle wakeups for the legacy poller vs the event-driven worker."""
+    synced = threading.Event()
+    sync_times: list[float] = []
+
+    def sync_volume(_volume):
+        sync_times.append(time.perf_counter())
+        synced.set()
+        return True
+
+    legacy = LegacyPollingWorker(sync_volume)
+    measure_worker("legacy poll (50ms)", legacy.start, legacy.set_target, legacy.stop,
+                   lambda: legacy.wakeups, sync_times, synced, args)
+
+    with BackgroundLoop() as background:
+        worker = VolumeSyncWorker(sync_volume)
+        measure_worker("event-driven", lambda: background.call(worker.start),
+                       lambda volume: background.loop.call_soon_threadsafe(worker.set_target, volume),
+                       lambda: background.wait(worker.stop()),
+                       lambda: worker.wakeups, sync_times, synced, args)
+
+
+def load_orthocontrol_script():
+    """Loads orthocontrol.py the same way orthocontrol/__main__.py does, with one latched
+    controller on the default mappings. Returns (module, controller)."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "orthocontrol.py")
+    spec = importlib.util.spec_from_file_location("orthocontrol_main", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    controller = module.MidiController("benchmark", default_mappings())
+    controller.takeover.engage()
+    module.controllers.append(controller)
+    return module, controller
+
+
+def bench_callback(args):
+    """Stress the rtmidi callback with a CC flood while the sync worker runs against a slow backend."""
+    logging.basicConfig(level=logging.WARNING)
+    orthocontrol_main, controller = load_orthocontrol_script()
+
+    def slow_backend(_volume):
+        time.sleep(args.backend_ms / 1000.0)
+        return True
+
+    with BackgroundLoop() as background:
+        worker = VolumeSyncWorker(slow_backend, sync_interval=args.sync_ms / 1000.0)
+        orthocontrol_main.volume_sync = worker
+        background.call(worker.start)
+        callback_data = (background.loop, controller, False, 'info')
+
+        period = 1.0 / args.rate
+        durations = []
+        next_send = time.perf_counter()
+        for i in range(int(args.rate * args.seconds)):
+            # Pace the producer like rtmidi would, spinning off the remainder of each period
+            while time.perf_counter() < next_send:
+                pass
+            started = time.perf_counter()
+            orthocontrol_main.post_midi_message(([176, 1, i % 128], period), callback_data)
+            durations.append(time.perf_counter() - started)
+            next_send += period
+        background.wait(worker.stop())
+
+    durations.sort()
+    count = len(durations)
+    print(f"{count} CC messages at {args.rate}/s: callback p50 {durations[count // 2] * 1e6:.1f}us "
+          f"p99 {durations[int(count * 0.99) - 1] * 1e6:.1f}us max {durations[-1] * 1e6:.1f}us; "
+          f"worker woke {worker.wakeups} times, skipped {worker.skipped_targets} intermediate targets; "
+          f"{worker.writes} backend writes, {worker.coalesced} targets coalesced while one was in flight")
+
+
+def synthetic_flood(seconds, rate, seed=1):
+    """A bursty knob session: CC sweeps at ~`rate` msgs/s separated by pauses, plus the odd button tap."""
+    rng = random.Random(seed)
+    timed_messages = []
+    t = 0.0
+    value = 64
+    while t < seconds:
+        burst_end = t + rng.uniform(0.2, 0.8)
+        while t < burst_end:
+            t += rng.expovariate(rate)
+            value = max(0, min(127, value + rng.choice((-1, 1))))
+            timed_messages.append((t, [0xB0, 1, value]))
+        if rng.random() < 0.2:
+            timed_messages.append((t + 0.05, [0x90, 16, 127]))
+            timed_messages.append((t + 0.13, [0x80, 16, 0]))
+        t += rng.uniform(0.15, 0.5)
+    events = []
+    previous = 0.0
+    for t, message in timed_messages:
+        events.append((message, t - previous))
+        previous = t
+    return events
+
+
+class QueuedMidiIn:
+    """Stands in for rtmidi.MidiIn's internal queue in drain mode."""
+
+    def __init__(self):
+        self.queue = deque()
+
+    def get_message(self):
+        return self.queue.popleft() if self.queue else None
+
+
+def feed_in_real_time(events, deliver, slot=0.001):
+    """Calls deliver(event) for each event once its timestamp is due, checking every `slot` seconds."""
+    started = time.perf_counter()
+    due = 0.0
+    index = 0
+    while index < len(events):
+        time.sleep(slot)
+        elapsed = time.perf_counter() - started
+        while index < len(events) and due + events[index][1] <= elapsed:
+            due += events[index][1]
+            deliver(events[index])
+            index += 1
+
+
+def bench_drain(args):
+    """CPU per 1k messages: per-message rtmidi callback vs batched drain, on the same flood."""
+    logging.basicConfig(level=logging.WARNING)
+    orthocontrol_main, controller = load_orthocontrol_script()
+    events = synthetic_flood(args.seconds, args.rate)
+
+    def never_sync(_volume):
+        return True
+
+    for mode in ("callback", "drain"):
+        with BackgroundLoop() as background:
+            worker = VolumeSyncWorker(never_sync)
+            orthocontrol_main.volume_sync = worker
+            background.call(worker.start)
+            handled = [0]
+            midi_callback = orthocontrol_main.midi_callback
+
+            def counting_callback(event, *callback_args):
+                handled[0] += 1
+                midi_callback(event, *callback_args)
+
+            orthocontrol_main.midi_callback = counting_callback
+            cpu_before = time.process_time()
+            if mode == "callback":
+                callback_data = (background.loop, controller, False, 'info')
+                feed_in_real_time(events, lambda event: orthocontrol_main.post_midi_message(event, callback_data))
+                background.call(lambda: None)  # Let the loop work through what was posted
+            else:
+                midi_in = QueuedMidiIn()
+                drain_task = background.call(lambda: background.loop.create_task(
+                    drain_midi_input(midi_in, counting_callback, args.tick_ms / 1000.0, controller, False, 'info',
+                                     midi_filter=controller.midi_filter)))
+                feed_in_real_time(events, midi_in.queue.append)
+                time.sleep(args.tick_ms / 1000.0 * 2)
+                background.call(drain_task.cancel)
+            cpu_used = time.process_time() - cpu_before
+            orthocontrol_main.midi_callback = midi_callback
+            background.wait(worker.stop())
+
+        print(f"{mode:>9}: {len(events)} messages, {handled[0]} handled in Python on the loop, "
+              f"CPU {cpu_used * 1000.0 / len(events) * 1000:.2f}ms per 1k messages")
+
+
+def bench_motion(args):
+    """API calls per gesture and final-value error, with and without motion-aware pacing."""
+    gestures = knob_gestures(args.gestures)
+    for name, use_tracker in (("fixed interval", False), ("motion-aware", True)):
+        loop = VirtualClockLoop()
+        synced = []
+
+        def sync_volume(volume):
+            synced.append((loop.time(), volume))
+            return True
+
+        tracker = MotionTracker() if use_tracker else None
+        # As orthocontrol runs it: the token bucket does the limiting, the interval is a floor
+        worker = VolumeSyncWorker(sync_volume, sync_interval=BURST_SYNC_INTERVAL, executor=InlineExecutor(),
+                                  pace=tracker.pace_factor if tracker else None, limiter=AdaptiveTokenBucket(),
+                                  rng=random.Random(1))
+        windows = loop.run_until_complete(replay_gestures(gestures, worker, tracker, args.gap))
+        loop.close()
+
+        calls, errors, final_latencies = [], [], []
+        for start, end, final in windows:
+            in_gesture = [(t, v) for t, v in synced if start <= t < end + args.gap]
+            calls.append(len(in_gesture))
+            at_check = [v for t, v in in_gesture if t <= end + args.check_ms / 1000.0]
+            errors.append(abs(final - at_check[-1]) if at_check else final)
+            final_at = next((t for t, v in in_gesture if v == final and t >= end), None)
+            if final_at is not None:
+                final_latencies.append((final_at - end) * 1000.0)
+        print(f"{name:>15}: {statistics.mean(calls):5.2f} calls/gesture, "
+              f"mean final-value error {statistics.mean(errors):5.2f}% {args.check_ms:.0f}ms after the knob stops, "
+              f"final value lands {statistics.mean(final_latencies):6.1f}ms after the last message")
+
+
+def bench_ratelimit(args):
+    """Short gestures and long spins against a backend that allows --limit calls per --window seconds.
+
+    The backend's 429s carry a Retry-After header (when the oldest call leaves the window)
+    unless --no-retry-after is given, in which case the worker falls back to its fixed backoff.
+    """
+    short = knob_gestures(args.gestures)
+    spins = knob_gestures(args.spins, seed=3, durations=(5.0, 15.0))
+    for name, sync_interval, limiter in (("fixed interval", SYNC_INTERVAL, None),
+                                         ("token bucket", BURST_SYNC_INTERVAL, AdaptiveTokenBucket())):
+        loop = VirtualClockLoop()
+        synced, rejected, window = [], [], deque()
+
+        def sync_volume(volume):
+            now = loop.time()
+            while window and window[0] <= now - args.window:
+                window.popleft()
+            if len(window) >= args.limit:
+                rejected.append(now)
+                raise RateLimited(None if args.no_retry_after else window[0] + args.window - now)
+            window.append(now)
+            synced.append((now, volume))
+            return True
+
+        worker = VolumeSyncWorker(sync_volume, sync_interval=sync_interval, executor=InlineExecutor(), limiter=limiter,
+                                  rng=random.Random(1))
+
+        async def replay():
+            return (await replay_gestures(short, worker, None, args.gap),
+                    await replay_gestures(spins, worker, None, args.gap))
+
+        short_windows, spin_windows = loop.run_until_complete(replay())
+        loop.close()
+
+        def report(kind, windows):
+            firsts, latencies, spacings = [], [], []
+            synced_values = dict(synced)
+            for start, end, final in windows:
+                times = [t for t, v in synced if start <= t < end + args.gap]
+                if times:
+                    firsts.append((times[0] - start) * 1000.0)
+                spacings.extend((b - a) * 1000.0 for a, b in zip(times, times[1:]) if b <= end)
+                if times and synced_values[times[-1]] == round(final):
+                    latencies.append(max(0.0, times[-1] - end) * 1000.0)
+            spacing = f"first update after {statistics.median(firsts):5.1f}ms, then every {statistics.median(spacings):5.1f}ms" \
+                if spacings else "no updates"
+            landed = f"final value lands {statistics.median(latencies):7.1f}ms (median) after the last message" \
+                if latencies else "final value never lands"
+            print(f"{name:>15} {kind:>6}: {spacing}, {landed} ({len(latencies)}/{len(windows)} gestures)")
+
+        report("short", short_windows)
+        report("spins", spin_windows)
+        limits = f", learned {limiter.rate:.2f} requests/s, burst {limiter.burst:.1f}" if limiter else ""
+        print(f"{name:>15} total: {len(synced)} calls, {len(rejected)} rate limited{limits}")
+
+
+def simulate_settle(gestures, gap, failure_rate, rate_limit_rate, seed, settle_delay=SETTLE_DELAY):
+    """Replays gestures on a virtual clock against a backend that fails and rate limits.
+
+    Returns (backend calls, settles per gesture, gestures whose final value never landed,
+    ms from the knob stopping to its final value being sent, per settled gesture).
+    """
+    loop = VirtualClockLoop()
+    backend = FlakyBackend(loop, failure_rate, rate_limit_rate, seed)
+    tracker = MotionTracker()
+    worker = backend.worker = VolumeSyncWorker(
+        backend, sync_interval=BURST_SYNC_INTERVAL, executor=InlineExecutor(), pace=tracker.pace_factor,
+        limiter=AdaptiveTokenBucket(), rng=random.Random(seed), settle_delay=settle_delay)
+    windows = loop.run_until_complete(replay_gestures(gestures, worker, tracker, gap))
+    loop.close()
+
+    settles_per_gesture, unsettled, late = [], 0, []
+    settles_before = 0
+    for start, end, final in windows:
+        in_gesture = [(t, v, settles) for t, v, settles in backend.attempts if start <= t < end + gap]
+        settles_after = in_gesture[-1][2] if in_gesture else settles_before
+        settles_per_gesture.append(settles_after - settles_before)
+        settles_before = settles_after
+        final_attempts = [t for t, v, _ in in_gesture if t >= end and v == round(final)]
+        if not in_gesture or in_gesture[-1][1] != round(final):
+            unsettled += 1
+        elif final_attempts:
+            late.append((final_attempts[0] - end) * 1000.0)
+    return len(backend.attempts), settles_per_gesture, unsettled, late
+
+
+def bench_settle(args):
+    """Checks on a virtual clock that the settle timer fires at most once per gesture and
+    that every gesture's final value lands, against a backend that fails and rate limits."""
+    gestures = knob_gestures(args.gestures, seed=args.seed)
+    calls, settles_per_gesture, unsettled, late = simulate_settle(
+        gestures, args.gap, args.failure_rate, args.rate_limit_rate, args.seed,
+        settle_delay=None if args.no_settle else SETTLE_DELAY)
+
+    print(f"{len(gestures)} gestures, {calls} backend calls, {sum(settles_per_gesture)} settles: "
+          f"at most {max(settles_per_gesture)} per gesture, {unsettled} gestures without their final value, "
+          f"final value sent {statistics.median(late) if late else 0.0:.1f}ms (median), "
+          f"{max(late, default=0.0):.1f}ms (max) after the knob stopped")
+    if max(settles_per_gesture) > 1 or unsettled:
+        raise SystemExit("FAIL: the settle timer must fire at most once per gesture and deliver every final value")
+
+
+def bench_auth(args):
+    """Volume writes across several token lifetimes, with and without proactive refresh, against a local token endpoint."""
+    endpoint = FakeTokenEndpoint(args.lifetime, args.endpoint_ms / 1000.0)
+    for name, proactive in (("lazy refresh", False), ("proactive refresh", True)):
+        auth = FakeOAuth(endpoint.url, args.lifetime, args.lifetime / 10)
+        refresher = TokenRefresher(auth, executor=ThreadPoolExecutor(max_workers=1, thread_name_prefix="auth"))
+        backend = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backend")
+
+        async def knob():
+            loop = asyncio.get_running_loop()
+            if proactive:
+                await refresher.load()
+                refresher.start()
+            waits = []
+            deadline = loop.time() + args.seconds
+            while loop.time() < deadline:
+                started = time.perf_counter()
+                if proactive:
+                    await refresher.access_token()  # As AsyncSpotifyClient does
+                else:
+                    await loop.run_in_executor(backend, auth.get_access_token)
+                waits.append((time.perf_counter() - started) * 1000.0)
+                await asyncio.sleep(args.write_ms / 1000.0)
+            await refresher.stop()
+            return waits
+
+        waits = sorted(asyncio.run(knob()))
+        backend.shutdown()
+        print(f"{name:>17}: {len(waits)} writes over {args.seconds / args.lifetime:.1f} token lifetimes, "
+              f"token wait p50 {waits[len(waits) // 2]:.2f}ms max {waits[-1]:.1f}ms; "
+              f"{auth.inline_refreshes} refreshes on the write path, {refresher.refreshes} ahead of expiry")
+    endpoint.shutdown()
+
+
+def bench_http(args):
+    """First-request latency after idle and TLS handshakes per client, against a local HTTPS stand-in server."""
+    with tempfile.TemporaryDirectory() as directory:
+        certfile = self_signed_certificate(directory)
+        server = HandshakeCountingServer(certfile, args.idle_timeout, args.rtt_ms / 1000.0)
+        modes = (("requests session", False, False), ("client, resumption", True, False),
+                 ("client, keep-alive", True, True))
+        for name, async_client, keep_warm in modes:
+            server.full_handshakes = server.resumed_handshakes = 0
+
+            async def workload():
+                loop = asyncio.get_running_loop()
+                if async_client:
+                    client = AsyncSpotifyClient(static_token, base_url=server.url, cafile=certfile)
+                    request = client.current_user
+                else:
+                    client = None
+                    session = requests.Session()
+                    session.verify = certfile
+                    session.trust_env = False  # REQUESTS_CA_BUNDLE would override `verify`
+                    backend = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backend")
+
+                    async def request():
+                        await loop.run_in_executor(backend, lambda: session.get(server.url + "me").content)
+                await request()  # As run() does, reading the initial volume
+                keep_alive = None
+                if keep_warm:
+                    keep_alive = loop.create_task(client.keep_alive(args.idle_timeout / 2))
+                first_after_idle = []
+                for burst in range(args.bursts):
+                    for i in range(3):
+                        started = time.perf_counter()
+                        await request()
+                        if i == 0 and burst:
+                            first_after_idle.append((time.perf_counter() - started) * 1000.0)
+                        await asyncio.sleep(0.05)
+                    await asyncio.sleep(args.idle_timeout * 1.5)
+                if keep_alive:
+                    keep_alive.cancel()
+                if client:
+                    await client.close()
+                    client.stats.log_metrics()
+                else:
+                    session.close()
+                return first_after_idle
+
+            first_after_idle = asyncio.run(workload())
+            print(f"{name:>18}: first request after idle {statistics.median(first_after_idle):6.1f}ms (median); "
+                  f"{server.full_handshakes} full and {server.resumed_handshakes} resumed TLS handshakes "
+                  f"for {args.bursts * 3 + 1} requests")
+        server.shutdown()
+
+
+def bench_spotify(args):
+    """Final-value latency and playback read latency with volume writes that sometimes stall,
+    for blocking calls on the backend executor vs. the async client, against a local mock API."""
+    gestures = knob_gestures(args.gestures)
+    for name, native in (("blocking executor", False), ("async client", True)):
+        server = MockSpotifyApi(args.rtt_ms / 1000.0, args.stall_every, args.stall_ms / 1000.0)
+        reads = []
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=1, thread_name_prefix="backend"))
+            if native:
+                client = AsyncSpotifyClient(static_token, base_url=server.url)
+
+                async def sync_volume(volume):
+                    await client.volume(round(volume))
+                    return True
+
+                fetch = client.current_playback
+            else:
+                session = requests.Session()
+                session.trust_env = False
+                headers = {"Authorization": "Bearer token"}
+
+                def sync_volume(volume):
+                    session.put(f"{server.url}/me/player/volume", params={"volume_percent": round(volume)},
+                                headers=headers, timeout=5).raise_for_status()
+                    return True
+
+                def fetch():
+                    return session.get(f"{server.url}/me/player", headers=headers, timeout=5).json()
+
+            worker = VolumeSyncWorker(sync_volume, sync_interval=BURST_SYNC_INTERVAL, limiter=AdaptiveTokenBucket())
+            cache = PlaybackStateCache(fetch, fast_interval=args.read_ms / 1000.0, idle_interval=args.read_ms / 1000.0)
+            refresh = cache.refresh
+
+            async def timed_refresh():
+                # Includes any wait for the backend executor, as the reader sees it
+                started = time.perf_counter()
+                await refresh()
+                reads.append((time.perf_counter() - started) * 1000.0)
+
+            cache.refresh = timed_refresh
+            cache.start()
+            windows = await replay_gestures(gestures, worker, None, args.gap)
+            await cache.stop()
+            if native:
+                await client.close()
+            return worker, windows
+
+        worker, windows = asyncio.run(run())
+        server.shutdown()
+
+        # A final value that had not landed when the next gesture started counts as infinitely late
+        latencies = []
+        for start, end, final in windows:
+            applied = [(t, v) for t, v in server.applied if start <= t < end + args.gap]
+            landed = applied and applied[-1][1] == round(final)
+            latencies.append(max(0.0, applied[-1][0] - end) * 1000.0 if landed else math.inf)
+        missed = latencies.count(math.inf)
+        reads.sort()
+        print(f"{name:>17}: final value lands {statistics.median(latencies):6.1f}ms (median), "
+              f"{sorted(latencies)[len(latencies) * 9 // 10]:6.1f}ms (p90) after the last message, "
+              f"{missed} not within the gap; "
+              f"playback reads p50 {reads[len(reads) // 2]:5.1f}ms max {reads[-1]:6.1f}ms; "
+              f"{worker.writes} writes, {worker.abandoned} abandoned in flight")
+
+
+def bench_transfer(args):
+    """Knob gestures that each start with no active Spotify device, against a local mock API:
+    the old fixed sleep(0.5) after a playback transfer vs. orthocontrol's activation polling."""
+    logging.basicConfig(level=logging.ERROR)  # Every gesture starts with a 404 and a transfer
+    orthocontrol_main, _controller = load_orthocontrol_script()
+    gestures = knob_gestures(args.gestures)
+    for name, polling in (("fixed sleep(0.5)", False), ("activation polling", True)):
+        server = MockSpotifyApi(args.rtt_ms / 1000.0, activation_delay=args.activation_ms / 1000.0)
+        targets = []
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=1, thread_name_prefix="backend"))
+            if polling:
+                orthocontrol_main.spotify_api = AsyncSpotifyClient(static_token, base_url=server.url)
+                orthocontrol_main.playback_state = PlaybackStateCache(orthocontrol_main.get_spotify_playback)
+                sync_volume = orthocontrol_main.sync_spotify_volume
+            else:
+                session = requests.Session()
+                session.trust_env = False
+                headers = {"Authorization": "Bearer token"}
+
+                def put_volume(volume):
+                    session.put(f"{server.url}/me/player/volume", params={"volume_percent": round(volume)},
+                                headers=headers, timeout=5).raise_for_status()
+
+                def sync_volume(volume):
+                    # The fallback as it was: transfer, sleep half a second, retry the same value
+                    try:
+                        put_volume(volume)
+                    except requests.HTTPError:
+                        session.put(f"{server.url}/me/player", json={"device_ids": ["mock-device"], "play": False},
+                                    headers=headers, timeout=5).raise_for_status()
+                        time.sleep(0.5)
+                        put_volume(volume)
+                    return True
+
+            worker = VolumeSyncWorker(sync_volume, sync_interval=BURST_SYNC_INTERVAL, limiter=AdaptiveTokenBucket())
+            set_target = worker.set_target
+            worker.set_target = lambda volume: (targets.append((time.monotonic(), volume)), set_target(volume))
+            windows = []
+            for events in gestures:
+                server.active_at = float("inf")  # Playback stopped elsewhere: no active device
+                windows.extend(await replay_gestures([events], worker, None, args.gap))
+            if polling:
+                await orthocontrol_main.spotify_api.close()
+            return windows
+
+        windows = asyncio.run(run())
+        server.shutdown()
+
+        firsts, lags, landed = [], [], 0
+        for start, end, final in windows:
+            applied = [(t, v) for t, v in server.applied if start <= t < end + args.gap]
+            if not applied:
+                continue
+            first_time, first_value = applied[0]
+            firsts.append((first_time - start) * 1000.0)
+            latest = [v for t, v in targets if t <= first_time][-1]
+            lags.append(abs(first_value - round(latest)))
+            landed += applied[-1][1] == round(final)
+        print(f"{name:>18}: first volume lands {statistics.median(firsts):6.1f}ms (median) after the gesture starts, "
+              f"{statistics.median(lags):4.1f}% (median) {max(lags):4.1f}% (max) behind the knob; "
+              f"final value landed for {landed}/{len(windows)} gestures")
+
+
+def bench_replay(args):
+    """Replay a recorded (or synthetic) MIDI session through the filter, mappings and sync worker."""
+    if args.session:
+        session = SessionLog(args.session)
+    else:
+        session = synthetic_flood(args.seconds, args.rate)
+        if args.record:
+            with SessionRecorder(args.record) as recorder:
+                for event in session:
+                    recorder.record(event)
+
+    loop = VirtualClockLoop()
+    synced = []
+
+    def sync_volume(volume):
+        synced.append(volume)
+        return True
+
+    tracker = MotionTracker()
+    worker = VolumeSyncWorker(sync_volume, executor=InlineExecutor(), pace=tracker.pace_factor)
+
+    def handle_volume(percent, delta):
+        tracker.update(percent, delta)
+        worker.set_target(percent)
+
+    table = DispatchTable(default_mappings(), {"volume": handle_volume, "play_pause": lambda _value, _delta: None,
+                                              "button": lambda _value, _delta: None})
+    midi_filter = table.midi_filter()
+
+    async def replay():
+        worker.start()
+        delivered = await replay_session(session, lambda event: table.dispatch(event[0], event[1]),
+                                         speed=args.speed, midi_filter=midi_filter)
+        await asyncio.sleep(1.0)
+        await worker.stop()
+        return delivered
+
+    started = time.perf_counter()
+    delivered = loop.run_until_complete(replay())
+    wall = time.perf_counter() - started
+    virtual = loop.time()
+    loop.close()
+    if isinstance(session, SessionLog):
+        session.close()
+
+    print(f"{len(session)} messages, {delivered} delivered, {virtual:.2f}s of loop time in {wall:.3f}s wall "
+          f"({delivered / wall:,.0f} messages/s): {len(synced)} backend calls, "
+          f"final target {worker.target}%, last synced {synced[-1] if synced else None}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    worker_parser = subparsers.add_parser("worker", help=bench_worker.__doc__)
+    worker_parser.add_argument("--trials", type=int, default=40)
+    worker_parser.add_argument("--idle-seconds", type=float, default=5.0)
+    worker_parser.set_defaults(func=bench_worker)
+
+    callback_parser = subparsers.add_parser("callback", help=bench_callback.__doc__)
+    callback_parser.add_argument("--rate", type=int, default=10_000, help="messages per second")
+    callback_parser.add_argument("--seconds", type=float, default=3.0)
+    callback_parser.add_argument("--backend-ms", type=float, default=30.0, help="simulated backend round trip")
+    callback_parser.add_argument("--sync-ms", type=float, default=SYNC_INTERVAL * 1000.0,
+                                 help="sync interval; 0 leaves only the single-flight limit of one write per round trip")
+    callback_parser.set_defaults(func=bench_callback)
+
+    drain_parser = subparsers.add_parser("drain", help=bench_drain.__doc__)
+    drain_parser.add_argument("--rate", type=int, default=2000, help="messages per second while turning")
+    drain_parser.add_argument("--seconds", type=float, default=5.0)
+    drain_parser.add_argument("--tick-ms", type=float, default=10.0, help="drain interval")
+    drain_parser.set_defaults(func=bench_drain)
+
+    motion_parser = subparsers.add_parser("motion", help=bench_motion.__doc__)
+    motion_parser.add_argument("--gestures", type=int, default=200)
+    motion_parser.add_argument("--gap", type=float, default=2.0, help="seconds between gestures")
+    motion_parser.add_argument("--check-ms", type=float, default=100.0)
+    motion_parser.set_defaults(func=bench_motion)
+
+    ratelimit_parser = subparsers.add_parser("ratelimit", help=bench_ratelimit.__doc__)
+    ratelimit_parser.add_argument("--gestures", type=int, default=100)
+    ratelimit_parser.add_argument("--spins", type=int, default=10)
+    ratelimit_parser.add_argument("--gap", type=float, default=2.0, help="seconds between gestures")
+    ratelimit_parser.add_argument("--limit", type=int, default=90, help="calls the backend allows per window")
+    ratelimit_parser.add_argument("--window", type=float, default=30.0, help="backend rate limit window in seconds")
+    ratelimit_parser.add_argument("--no-retry-after", action="store_true", help="send 429s without Retry-After")
+    ratelimit_parser.set_defaults(func=bench_ratelimit)
+
+    settle_parser = subparsers.add_parser("settle", help=bench_settle.__doc__)
+    settle_parser.add_argument("--gestures", type=int, default=500)
+    settle_parser.add_argument("--gap", type=float, default=2.0, help="seconds between gestures")
+    settle_parser.add_argument("--failure-rate", type=float, default=0.1, help="share of calls that fail")
+    settle_parser.add_argument("--rate-limit-rate", type=float, default=0.02, help="share of calls that get a 429")
+    settle_parser.add_argument("--seed", type=int, default=4)
+    settle_parser.add_argument("--no-settle", action="store_true", help="disable the settle timer, for comparison")
+    settle_parser.set_defaults(func=bench_settle)
+
+    auth_parser = subparsers.add_parser("auth", help=bench_auth.__doc__)
+    auth_parser.add_argument("--lifetime", type=float, default=2.0, help="token lifetime in seconds")
+    auth_parser.add_argument("--seconds", type=float, default=8.0)
+    auth_parser.add_argument("--endpoint-ms", type=float, default=150.0, help="token endpoint round trip")
+    auth_parser.add_argument("--write-ms", type=float, default=50.0, help="time between volume writes")
+    auth_parser.set_defaults(func=bench_auth)
+
+    http_parser = subparsers.add_parser("http", help=bench_http.__doc__)
+    http_parser.add_argument("--bursts", type=int, default=6, help="bursts of 3 requests, each followed by an idle gap")
+    http_parser.add_argument("--idle-timeout", type=float, default=1.0, help="server closes idle connections after this")
+    http_parser.add_argument("--rtt-ms", type=float, default=30.0, help="simulated network round trip")
+    http_parser.set_defaults(func=bench_http)
+
+    spotify_parser = subparsers.add_parser("spotify", help=bench_spotify.__doc__)
+    spotify_parser.add_argument("--gestures", type=int, default=10)
+    spotify_parser.add_argument("--gap", type=float, default=0.8, help="seconds between gestures")
+    spotify_parser.add_argument("--rtt-ms", type=float, default=30.0, help="mock API round trip")
+    spotify_parser.add_argument("--stall-every", type=int, default=6, help="every Nth volume write stalls")
+    spotify_parser.add_argument("--stall-ms", type=float, default=1500.0, help="how long a stalled write takes")
+    spotify_parser.add_argument("--read-ms", type=float, default=250.0, help="time between playback reads")
+    spotify_parser.set_defaults(func=bench_spotify)
+
+    transfer_parser = subparsers.add_parser("transfer", help=bench_transfer.__doc__)
+    transfer_parser.add_argument("--gestures", type=int, default=8)
+    transfer_parser.add_argument("--gap", type=float, default=0.8, help="seconds between gestures")
+    transfer_parser.add_argument("--rtt-ms", type=float, default=30.0, help="mock API round trip")
+    transfer_parser.add_argument("--activation-ms", type=float, default=200.0,
+                                 help="time a device takes to become active after a transfer")
+    transfer_parser.set_defaults(func=bench_transfer)
+
+    replay_parser = subparsers.add_parser("replay", help=bench_replay.__doc__)
+    replay_parser.add_argument("--session", help="session log recorded with --midi-record (default: synthetic flood)")
+    replay_parser.add_argument("--record", help="write the synthetic flood to this session log")
+    replay_parser.add_argument("--speed", type=float, default=0.0, help="replay speed, 0 = max")
+    replay_parser.add_argument("--rate", type=int, default=2000, help="synthetic messages per second while turning")
+    replay_parser.add_argument("--seconds", type=float, default=5.0)
+    replay_parser.set_defaults(func=bench_replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
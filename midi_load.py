@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Virtual MIDI load generator: pretends to be the Ortho Remote on a virtual port"""
+
+import argparse
+import itertools
+import random
+import time
+from typing import Iterator
+
+import rtmidi
+
+CONTROL_CHANGE = 0xB0
+NOTE_ON = 0x90
+NOTE_OFF = 0x80
+
+SEND_SLOT = 0.0005  # Scheduler granularity; everything due within a slot is sent back to back
+
+TimedMessage = tuple[float, list[int]]  # (seconds after the previous message, message bytes)
+
+
+def sweep(_rng: random.Random, rate: float, cc: int, _note: int) -> Iterator[TimedMessage]:
+    """Full-range knob sweeps up and down at a steady rate."""
+    for value in itertools.cycle(itertools.chain(range(128), range(126, 0, -1))):
+        yield 1.0 / rate, [cc, 1, value]
+
+
+def jitter(rng: random.Random, rate: float, cc: int, _note: int) -> Iterator[TimedMessage]:
+    """A hand resting on the knob: small random steps with irregular spacing."""
+    value = 64
+    while True:
+        value = max(0, min(127, value + rng.choice((-2, -1, -1, 1, 1, 2))))
+        yield rng.expovariate(rate), [cc, 1, value]
+
+
+def burst(rng: random.Random, rate: float, cc: int, _note: int) -> Iterator[TimedMessage]:
+    """Fast turns at `rate` separated by pauses, the way the remote floods while turning."""
+    value = 64
+    pause = 0.0
+    while True:
+        direction = rng.choice((-1, 1))
+        for i in range(rng.randint(int(rate * 0.1) + 1, int(rate * 0.6) + 2)):
+            if not 0 < value + direction < 127:
+                direction = -direction
+            value += direction
+            yield (pause if i == 0 else 0.0) + rng.expovariate(rate), [cc, 1, value]
+        pause = rng.uniform(0.15, 0.5)
+
+
+def taps(rng: random.Random, rate: float, cc: int, note: int) -> Iterator[TimedMessage]:
+    """Button taps: Note On, then Note Off after a short hold."""
+    while True:
+        yield rng.expovariate(rate / 2), [NOTE_ON | (cc & 0x0F), note, 127]
+        yield rng.uniform(0.03, 0.15), [NOTE_OFF | (cc & 0x0F), note, 0]
+
+
+def mixed(rng: random.Random, rate: float, cc: int, note: int) -> Iterator[TimedMessage]:
+    """Bursty turning with the odd button tap in between."""
+    turns = burst(rng, rate, cc, note)
+    while True:
+        delay, message = next(turns)
+        if delay > 0.1 and rng.random() < 0.2:
+            yield delay / 2, [NOTE_ON | (cc & 0x0F), note, 127]
+            yield 0.08, [NOTE_OFF | (cc & 0x0F), note, 0]
+            delay = max(0.0, delay / 2 - 0.08)
+        yield delay, message
+
+
+PATTERNS = {"sweep": sweep, "jitter": jitter, "burst": burst, "taps": taps, "mixed": mixed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--name", default="ortho remote", help="virtual port name (default: %(default)s)")
+    parser.add_argument("--pattern", choices=PATTERNS, default="mixed")
+    parser.add_argument("--rate", type=float, default=1000.0, help="messages per second (default: %(default)s)")
+    parser.add_argument("--seconds", type=float, default=0.0, help="stop after this long (default: run until Ctrl-C)")
+    parser.add_argument("--channel", type=int, default=1, help="MIDI channel 1-16 (default: %(default)s)")
+    parser.add_argument("--note", type=int, default=16, help="note number for button taps (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # orthocontrol.py wants the name in both its input and output port lists, so open both sides.
+    # On ALSA the two sides get different client ids; orthocontrol ignores those when matching.
+    midi_out = rtmidi.MidiOut(name=args.name)
+    midi_in = rtmidi.MidiIn(name=args.name)
+    midi_out.open_virtual_port(args.name)
+    midi_in.open_virtual_port(args.name)
+    midi_in.ignore_types(sysex=False)
+    midi_in.set_callback(lambda event, _data: print(f"Received from orthocontrol: {event[0]}"))
+
+    time.sleep(0.2)  # Give the MIDI server a moment to publish the ports
+    listed = [port for port in rtmidi.MidiIn().get_ports() if args.name in port]
+    print(f"Virtual port open. Connect with: python3 orthocontrol.py --midi-name '{listed[0] if listed else args.name}'")
+    print(f"Sending '{args.pattern}' at ~{args.rate:g} messages/s on channel {args.channel}. Ctrl-C to stop.")
+
+    messages = PATTERNS[args.pattern](random.Random(args.seed), args.rate, CONTROL_CHANGE | (args.channel - 1), args.note)
+    sent = 0
+    worst_lag = 0.0
+    started = time.perf_counter()
+    due = 0.0
+    try:
+        delay, message = next(messages)
+        while not args.seconds or due + delay <= args.seconds:
+            elapsed = time.perf_counter() - started
+            if due + delay > elapsed:
+                time.sleep(min(SEND_SLOT, due + delay - elapsed))
+                continue
+            due += delay
+            midi_out.send_message(message)
+            worst_lag = max(worst_lag, elapsed - due)
+            sent += 1
+            delay, message = next(messages)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.perf_counter() - started
+        print(f"\nSent {sent} messages in {elapsed:.1f}s ({sent / elapsed if elapsed else 0:.0f}/s), "
+              f"worst scheduling lag {worst_lag * 1000:.1f}ms")
+        midi_in.close_port()
+        midi_out.close_port()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,83 @@
+import asyncio
 import psutil
 import sys
 import subprocess
 import getopt
 import rtmidi # type: ignore[reportMissingModuleSource]
 import time
-from functools import wraps, partial
-from threading import Timer, Thread, Lock, Event
-import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
 from typing import Callable, TypeVar, Any
-from Quartz.CoreGraphics import CGEventPost, kCGHIDEventTap
-from AppKit import NSEvent
-from CoreMIDI import MIDIRestart
 import logging
 from dotenv import load_dotenv
 import spotipy # type: ignore[reportMissingModuleSource]
 from spotipy.exceptions import SpotifyException # type: ignore[reportMissingModuleSource]
 from spotipy.oauth2 import SpotifyOAuth # type: ignore[reportMissingModuleSource]
 
+from orthocontrol.auth import TokenRefresher
+from orthocontrol.connection import PooledSession
+from orthocontrol.midi.drain import drain_midi_input
+from orthocontrol.midi.encoder import RelativeEncoder
+from orthocontrol.midi.feedback import MidiFeedback
+from orthocontrol.midi.filter import configure_port
+from orthocontrol.midi.gestures import DOUBLE_TAP, LONG_PRESS_GESTURE, TAP, TRIPLE_TAP, ButtonGestures
+from orthocontrol.midi.mapping import CURVES, DispatchTable, MidiMapping, default_mappings, load_mappings, parse_channel
+from orthocontrol.midi.motion import MotionTracker
+from orthocontrol.midi.ports import BACKOFF_MAX, ENUMERATION_TTL, RESTART_BUDGET, MidiServerRestarts, PortDirectory, PortSupervisor
+from orthocontrol.midi.session import SessionLog, SessionRecorder, replay_session
+from orthocontrol.midi.takeover import DEFAULT_APP, SoftTakeover, TakeoverSettings, parse_takeover_settings
+from orthocontrol.playback import PlaybackState, PlaybackStateCache
+from orthocontrol.ratelimit import AdaptiveTokenBucket
+from orthocontrol.spotify import DEVICE_CACHE_TTL, AsyncSpotifyClient, SpotifyApiError
+from orthocontrol.sync import BURST_SYNC_INTERVAL, VolumeSyncWorker
+
 # Constants
 CODE_PLAY = 16  # Default MIDI code for play/pause
-LATCH_TOLERANCE_PERCENT = 3 # Tolerance for latching remote to app volume
+CODE_NEXT = 17  # Media key codes for the button gestures
+CODE_PREVIOUS = 18
+CODE_MUTE = 7
+FINE_ADJUST_SCALE = 0.25  # Knob movement is scaled by this while the button is held
+REPLAY_SETTLE_SECONDS = 1.0 # Time for the last replayed target to reach the backend
+TRANSFER_POLL_INTERVAL = 0.05  # First wait before checking that a transferred-to device is active; doubles
+TRANSFER_POLL_MAX = 0.8  # Longest wait between activation checks
+TRANSFER_TIMEOUT = 5.0  # Give up waiting for the device to become active after this long
 
 # Global State for Latching
 actual_app_volume_on_connect: int | None = None
-is_latched: bool = False
+volume_app: str | None = None  # App that volume was read from
+
+# Soft takeover mode and tolerance per app (--midi-takeover)
+takeover_settings: dict[str, TakeoverSettings] = {DEFAULT_APP: TakeoverSettings()}
 
 # Global Spotify Client
 sp: "spotipy.Spotify | None" = None
 
-# Volume sync thread variables
-target_volume: int | None = None
-target_volume_lock = Lock()
-volume_sync_thread: Thread | None = None
-stop_sync_thread = False
+# HTTP session shared by the Spotify client and its auth manager: pooled, kept warm, timed
+http_session: PooledSession | None = None
+
+# Async Web API client for playback reads and volume writes; spotipy keeps auth and setup
+spotify_api: AsyncSpotifyClient | None = None
+
+# Shared Spotify playback state, refreshed in the background and updated by our own writes
+playback_state: PlaybackStateCache | None = None
+
+# Last Spotify device seen playing or resolved for a transfer: (device id, time.monotonic())
+spotify_device: tuple[str, float] | None = None
+
+# Playback transfer in progress, joined by volume writes until the device is active
+spotify_transfer: "asyncio.Task[bool] | None" = None
+
+# Volume sync worker, shared by all MIDI controllers
+volume_sync: VolumeSyncWorker | None = None
+
+# One per --midi-name; each has its own mappings and latch state
+controllers: list["MidiController"] = []
+
+# Controller that moved the volume last; its knob motion paces the volume sync
+active_controller: "MidiController | None" = None
+
+# Session log that incoming MIDI events are recorded to (--midi-record)
+midi_recorder: SessionRecorder | None = None
 
 def setup_logging(level='info'):
     level_dict = {
@@ -54,18 +99,34 @@ def process_command_line_args():
         options, _ = getopt.getopt(
             sys.argv[1:],
             '',
-            ["midi-name=", "midi-restart", "midi-restart-interval=", "midi-sysex", "midi-notifications", "log-level="]
+            ["midi-name=", "midi-restart", "midi-restart-interval=", "midi-restart-budget=", "midi-sysex", "midi-notifications", "midi-drain-interval=", "midi-channel=", "midi-map=",
+             "midi-feedback", "midi-takeover=", "midi-record=", "midi-replay=", "midi-replay-speed=", "log-level="]
         )
+        # --midi-name and --midi-map may be repeated, one controller per --midi-name
+        port_names = [value for key, value in options if key == "--midi-name"]
+        map_paths = [value for key, value in options if key == "--midi-map"]
         options = dict(options)
-        if "--midi-name" not in options:
+        if not port_names and "--midi-replay" not in options:
             logging.error("Missing --midi-name argument")
             sys.exit(1)
+        if len(map_paths) > 1 and len(map_paths) != len(port_names):
+            logging.error("Give either one --midi-map for all ports or one per --midi-name")
+            sys.exit(1)
+        port_names = port_names or [None]
+        if len(map_paths) <= 1:
+            map_paths = map_paths * len(port_names) or [None] * len(port_names)
+        ports = list(zip(port_names, map_paths))
+        try:
+            parse_channel(options.get("--midi-channel", 1))
+        except ValueError as e:
+            logging.error(f"Invalid --midi-channel: {e}")
+            sys.exit(1)
         if "--log-level" in options:
             setup_logging(options["--log-level"])
         else:
             setup_logging()  # Default setup if no log level specified
         logging.info("Command line arguments processed successfully.")
-        return options
+        return options, ports
     except getopt.GetoptError as e:
         logging.error(f"Command line error: {e}")
         sys.exit(1)
@@ -74,6 +135,9 @@ def throttle_debounce(throttle_ms: int, debounce_ms: int, first_call_threshold_m
                   initial_throttle_ms: int = 50, max_throttle_ms: int = 500, 
                   backoff_factor: float = 1.5) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
     """Decorator that combines throttling and debouncing with a special case for the first call and backoff.
+
+    The decorated function must be called on the running event loop; debounced calls are
+    scheduled with loop.call_later rather than a Timer thread.
     
     Args:
         throttle_ms: Base throttle time between executions in milliseconds (used as a reference)
@@ -96,13 +160,14 @@ def throttle_debounce(throttle_ms: int, debounce_ms: int, first_call_threshold_m
         last_call_time: list[float] = [0.0]  # Time of the last throttled execution
         # Time of the last actual execution (either throttled or debounced), marks end of an interaction sequence
         last_interaction_end_time: list[float] = [0.0]
-        debounce_timer: list[Timer | None] = [None]
+        debounce_timer: list[asyncio.TimerHandle | None] = [None]
         # Track the current throttle interval with backoff
         current_throttle_interval: list[float] = [initial_throttle_interval]
 
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> None:
-            now = time.time()
+            loop = asyncio.get_running_loop()
+            now = loop.time()
 
             if debounce_timer[0] is not None:
                 debounce_timer[0].cancel()
@@ -139,13 +204,12 @@ def throttle_debounce(throttle_ms: int, debounce_ms: int, first_call_threshold_m
                         logging.debug(f"throttle_debounce: Debounced call for {getattr(func, '__name__', 'decorated_function')}")
                         func(*args, **kwargs)
                         # Update last_call_time as this is an execution, helps throttle next immediate if any
-                        current_time_debounced = time.time()
+                        current_time_debounced = loop.time()
                         last_call_time[0] = current_time_debounced 
                         last_interaction_end_time[0] = current_time_debounced
                     
                     logging.debug(f"throttle_debounce: Setting up debounce for {getattr(func, '__name__', 'decorated_function')}")
-                    debounce_timer[0] = Timer(debounce_interval, call_it_debounced)
-                    debounce_timer[0].start()
+                    debounce_timer[0] = loop.call_later(debounce_interval, call_it_debounced)
 
         return wrapper
     return decorator
@@ -159,13 +223,11 @@ def is_process_running(app_name):
 
 def get_application_volume(app_name: str) -> int | None:
     """Get the current sound volume of a given application."""
-    global sp
-    if app_name == "Spotify" and sp:
-        api_volume = get_spotify_volume_api()
-        if api_volume is not None:
-            return api_volume
-        # Fall through to AppleScript if API fails for Spotify
-        logging.debug("Spotify API failed to get volume, falling back to AppleScript for Spotify.")
+    if app_name == "Spotify" and playback_state and playback_state.volume is not None:
+        return playback_state.volume  # The API itself is read on the loop (get_spotify_volume_api)
+
+    if sys.platform != "darwin":
+        return None  # AppleScript is macOS only
 
     if not is_process_running(app_name):
         logging.debug(f"{app_name} is not running, cannot get volume.")
@@ -213,6 +275,10 @@ def set_application_volume(app_name, volume):
     if not 0 <= volume <= 100:
         raise ValueError("Volume must be between 0 and 100.")
 
+    if sys.platform != "darwin":
+        logging.debug(f"Cannot set {app_name} volume: AppleScript is macOS only.")
+        return
+
     # Early exit if the application is not running
     if not is_process_running(app_name):
         logging.debug(f"{app_name} is not running.")
@@ -233,42 +299,115 @@ def set_application_volume(app_name, volume):
     except subprocess.CalledProcessError as e:
         logging.error(f"Failed to set {app_name} volume.", exc_info=e)
 
-def get_spotify_volume_api() -> int | None:
-    """Gets the current volume from Spotify via API."""
-    global sp
-    if not sp:
+async def get_spotify_playback(raise_rate_limited: bool = False) -> PlaybackState | None:
+    """Gets the current playback state from Spotify via API. A 429 is raised with
+    `raise_rate_limited`, so the playback-state cache can back off."""
+    if not spotify_api:
         return None
     try:
-        playback = sp.current_playback()
-        if playback and playback.get('device') and playback['device'].get('volume_percent') is not None:
-            volume = playback['device']['volume_percent']
-            logging.debug(f"Spotify API: Current volume is {volume}%")
-            return int(volume)
-        else:
-            logging.debug("Spotify API: No active device or volume info found.")
-            return None
-    except SpotifyException as e:
-        logging.warning(f"Spotify API error getting volume: {e}")
+        playback = await spotify_api.current_playback()
+        if playback and playback.get('device'):
+            remember_spotify_device(playback['device'].get('id'))
+        return playback
+    except SpotifyApiError as e:
+        if raise_rate_limited and e.http_status == 429:
+            raise
+        logging.warning(f"Spotify API error getting playback state: {e}")
         if "authentication credentials" in str(e).lower() or "token expired" in str(e).lower():
             logging.error("Spotify token may be invalid or expired. Please update SPOTIFY_TOKEN in .env")
         return None
     except Exception as e:
-        logging.error(f"Unexpected error getting Spotify volume via API: {e}")
+        logging.error(f"Unexpected error getting Spotify playback state via API: {e}")
+        return None
+
+async def get_spotify_volume_api() -> int | None:
+    """Gets the current volume from Spotify via API, refreshing the shared playback state."""
+    playback = await get_spotify_playback()
+    if playback_state and playback:
+        playback_state.set(playback)
+    if playback and playback.get('device') and playback['device'].get('volume_percent') is not None:
+        volume = playback['device']['volume_percent']
+        logging.debug(f"Spotify API: Current volume is {volume}%")
+        return int(volume)
+    logging.debug("Spotify API: No active device or volume info found.")
+    return None
+
+def remember_spotify_device(device_id: str | None):
+    global spotify_device
+    spotify_device = (device_id, time.monotonic()) if device_id else None
+
+
+def is_device_error(e: SpotifyApiError) -> bool:
+    """True for errors that mean the device we knew of is gone or no longer active."""
+    return e.http_status == 404 or "NO_ACTIVE_DEVICE" in str(e).upper()
+
+
+async def resolve_spotify_device() -> str | None:
+    """Device to transfer playback to: the cached one while fresh, else the active (or first)
+    device from the API. Costs no request while the cache holds."""
+    if spotify_device and time.monotonic() - spotify_device[1] < DEVICE_CACHE_TTL:
+        return spotify_device[0]
+    devices = await spotify_api.devices() # type: ignore
+    if not devices or not devices.get('devices'):
+        remember_spotify_device(None)
         return None
+    # Fallback to first available device if no active one was found
+    device = next((device for device in devices['devices'] if device.get('is_active')), devices['devices'][0])
+    remember_spotify_device(device.get('id'))
+    return device.get('id')
+
+
+async def transfer_spotify_playback(device_id: str) -> bool:
+    """Transfers playback to `device_id` and polls, with a backoff, until the device reports
+    active. Returns True as soon as it does, False on errors or after TRANSFER_TIMEOUT."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    try:
+        await spotify_api.transfer_playback(device_id=device_id, force_play=False) # type: ignore
+    except SpotifyApiError as e:
+        if is_device_error(e):
+            remember_spotify_device(None)  # Resolve again from the API on the next attempt
+        logging.error(f"Spotify API: Failed to transfer playback: {e}")
+        return False
+    delay = TRANSFER_POLL_INTERVAL
+    while loop.time() + delay - started < TRANSFER_TIMEOUT:
+        await asyncio.sleep(delay)
+        playback = await get_spotify_playback()
+        device = (playback or {}).get('device') or {}
+        if device.get('id') == device_id and device.get('is_active'):
+            if playback_state:
+                playback_state.set(playback)
+            logging.info(f"Spotify API: Device {device_id} active after {(loop.time() - started) * 1000:.0f}ms.")
+            return True
+        delay = min(TRANSFER_POLL_MAX, delay * 2)
+    logging.error(f"Spotify API: Device {device_id} not active {TRANSFER_TIMEOUT:g}s after the transfer.")
+    return False
 
-def set_spotify_volume_api(volume_percent: int) -> bool:
-    """Sets Spotify volume using the API, returns True on success."""
-    global sp
-    if not sp:
-        logging.warning("Spotify API: Spotipy client not initialized, cannot set volume.")
+
+async def set_spotify_volume_api(volume_percent: int) -> bool:
+    """Sets Spotify volume using the API, returns True on success. Cancellable at any await.
+
+    With no active device, playback is transferred and False is returned once the device
+    is active (or the transfer failed), so the volume sync worker retries straight away with
+    whatever target is latest by then, not the one this call was made with.
+    """
+    global spotify_transfer
+    if not spotify_api:
+        logging.warning("Spotify API: client not initialized, cannot set volume.")
+        return False
+    if spotify_transfer and not spotify_transfer.done():
+        # Shielded: abandoning a stale write must not cancel the transfer it joined
+        await asyncio.shield(spotify_transfer)
         return False
     # Clamp volume_percent to Spotify's valid range (0-100)
     clamped_volume = max(0, min(100, volume_percent))
     try:
-        sp.volume(clamped_volume) # type: ignore
+        await spotify_api.volume(clamped_volume)
         logging.debug(f"Spotify API: Volume set to {clamped_volume}%")
         return True
-    except SpotifyException as e:
+    except SpotifyApiError as e:
+        if e.http_status == 429:
+            raise  # The volume sync worker backs off for the server's Retry-After
         logging.warning(f"Spotify API error setting volume: {e}")
         if "authentication credentials" in str(e).lower() or "token expired" in str(e).lower():
             logging.error("Spotify token may be invalid or expired. Please update SPOTIFY_TOKEN in .env")
@@ -276,42 +415,34 @@ def set_spotify_volume_api(volume_percent: int) -> bool:
              logging.warning("Spotify API: Cannot set volume. No active device or device is restricted.")
         # Attempt to find an active device and transfer playback if none is active - simplified
         try:
-            devices = sp.devices() # type: ignore
-            if devices and devices.get('devices'):
-                active_or_first_device_id: str | None = None
-                for device in devices['devices']:
-                    if device.get('is_active'):
-                        active_or_first_device_id = device.get('id')
-                        break
-                if not active_or_first_device_id and devices['devices']:
-                    # Fallback to first available device if no active one was found
-                    active_or_first_device_id = devices['devices'][0].get('id') 
-                
-                if active_or_first_device_id:
-                    logging.info(f"Spotify API: Attempting to transfer playback to device ID {active_or_first_device_id} and retry volume set.")
-                    sp.transfer_playback(device_id=active_or_first_device_id, force_play=False) # type: ignore
-                    time.sleep(0.5) # Give a moment for transfer to occur
-                    sp.volume(clamped_volume) # type: ignore # Retry volume set
-                    logging.debug(f"Spotify API: Volume set to {clamped_volume}% after playback transfer.")
-                    return True
-        except SpotifyException as transfer_e:
-            logging.error(f"Spotify API: Failed to transfer playback or set volume after transfer: {transfer_e}")
+            active_or_first_device_id = await resolve_spotify_device()
+        except SpotifyApiError as devices_e:
+            if devices_e.http_status == 429:
+                raise
+            logging.error(f"Spotify API: Failed to list devices for a playback transfer: {devices_e}")
+            return False
+        if active_or_first_device_id:
+            logging.info(f"Spotify API: Attempting to transfer playback to device ID {active_or_first_device_id} and retry volume set.")
+            spotify_transfer = asyncio.ensure_future(transfer_spotify_playback(active_or_first_device_id))
+            await asyncio.shield(spotify_transfer)
         return False
     except Exception as e:
         logging.error(f"Unexpected error setting Spotify volume via API: {e}")
         return False
 
-def set_volume(volume_percentage: int):
-    """Simply updates the target volume. Worker thread handles syncing."""
-    global target_volume
-    
-    with target_volume_lock:
-        if target_volume != volume_percentage:
-            logging.debug(f"Target volume: {volume_percentage}%")
-        target_volume = volume_percentage
+def set_volume(volume_percentage: float):
+    """Simply updates the target volume. The sync task handles syncing."""
+    if volume_sync:
+        volume_sync.set_target(volume_percentage)
 
 
 def tap(code: int, flags: int = 0):
+    if sys.platform != "darwin":
+        logging.debug(f"Media key {code} not sent: media keys are macOS only.")
+        return
+    from AppKit import NSEvent
+    from Quartz.CoreGraphics import CGEventPost, kCGHIDEventTap
+
     event = NSEvent.otherEventWithType_location_modifierFlags_timestamp_windowNumber_context_subtype_data1_data2_(
         14, # NSSystemDefined
         (0, 0), 
@@ -330,64 +461,198 @@ def toggle_play_pause():
     tap(CODE_PLAY)
 
 
-def volume_sync_worker():
-    """Simple fixed-rate sync with rate limit protection."""
-    global target_volume, stop_sync_thread, sp
-    
-    last_synced_volume = None
-    last_sync_time = 0
-    rate_limited_until = 0
-    
-    SYNC_INTERVAL = 0.25  # 250ms = 4 updates/second max
-    RATE_LIMIT_BACKOFF = 10.0  # 10 seconds when rate limited
-    
-    logging.info("Volume sync worker started (250ms interval)")
-    
-    while not stop_sync_thread:
-        try:
-            time.sleep(0.05)  # Small sleep to prevent CPU spinning
-            now = time.time()
-            
-            # Skip if rate limited
-            if now < rate_limited_until:
-                continue
-            
-            # Skip if too soon since last sync
-            if now - last_sync_time < SYNC_INTERVAL:
-                continue
-            
-            # Get current target
-            with target_volume_lock:
-                current_target = target_volume
-            
-            # Sync if changed
-            if current_target is not None and current_target != last_synced_volume:
-                logging.info(f"Syncing volume: {last_synced_volume}% → {current_target}%")
-                
-                try:
-                    if sp and set_spotify_volume_api(current_target):
-                        last_synced_volume = current_target
-                        last_sync_time = now
-                except SpotifyException as e:
-                    if hasattr(e, 'http_status') and e.http_status == 429:
-                        logging.warning(f"RATE LIMITED! Backing off for {RATE_LIMIT_BACKOFF} seconds")
-                        rate_limited_until = now + RATE_LIMIT_BACKOFF
-                    else:
-                        logging.error(f"Spotify error: {e}")
-                except Exception as e:
-                    logging.error(f"Unexpected error: {e}")
-            
-        except Exception as e:
-            logging.error(f"Worker error: {e}")
-            time.sleep(1.0)
-    
-    logging.info("Volume sync worker stopped")
+def next_track():
+    tap(CODE_NEXT)
+
+
+def previous_track():
+    tap(CODE_PREVIOUS)
+
+
+def toggle_mute():
+    tap(CODE_MUTE)
+
+
+# What the knob's button does; play/pause toggles, so a tap can fire on release before a
+# possible double tap is ruled out (a second tap undoes it)
+BUTTON_GESTURES = {
+    TAP: toggle_play_pause,
+    DOUBLE_TAP: next_track,
+    TRIPLE_TAP: previous_track,
+    LONG_PRESS_GESTURE: toggle_mute,
+}
+UNDOABLE_GESTURES = frozenset({TAP})
+
+
+async def sync_spotify_volume(volume_percent: float) -> bool:
+    """Backend call used by the volume sync worker; cancelled when a newer target makes it stale."""
+    return bool(spotify_api) and await set_spotify_volume_api(round(volume_percent))
+
 
+def post_midi_message(message: tuple[list[int], float], data: tuple[asyncio.AbstractEventLoop, "MidiController", bool, str]):
+    """rtmidi callback, runs on the rtmidi thread: drops unwanted messages, hands the rest to the event loop."""
+    loop, controller, sysex_enabled, log_level = data
+    if controller.midi_filter.accepts(message[0]):
+        loop.call_soon_threadsafe(midi_callback, message, controller, sysex_enabled, log_level)
 
-def midi_callback(message: tuple[list[int], float], _time_stamp: float, sysex_enabled: bool = False, log_level: str = 'info'):
-    """Process MIDI messages instantly - no throttling here!"""
-    global is_latched, actual_app_volume_on_connect, LATCH_TOLERANCE_PERCENT
 
+class MidiController:
+    """State for one MIDI port: its compiled mappings, latch, relative position, knob motion
+    and button gestures.
+
+    All controllers feed the shared volume sync worker. When one of them moves the volume,
+    the others drop their latch and take over again from the new volume (see SoftTakeover),
+    so an absolute knob that was left elsewhere does not jump the volume back when it is
+    touched again.
+    """
+
+    def __init__(self, port_name: str | None, mappings: list[MidiMapping]):
+        self.port_name = port_name
+        self.takeover = SoftTakeover()  # Latch state of the absolute volume knob
+        # Accumulated position for knobs in relative mode (--midi-sysex); these never need latching
+        self.relative_encoder = RelativeEncoder()
+        # Knob speed estimate, used to pace volume syncs
+        self.volume_motion = MotionTracker()
+        self.button = ButtonGestures(BUTTON_GESTURES, UNDOABLE_GESTURES)
+        self._fine_anchor: tuple[float, float] | None = None  # (remote, volume) when press+turn started
+        # Absolute volume knob the player volume is echoed to with --midi-feedback
+        self._feedback_mapping = next((mapping for mapping in mappings if mapping.action == "volume" and mapping.message == "cc"), None)
+        self.feedback: MidiFeedback | None = None
+        self._feedback_cc: tuple[int | None, int | None] = (None, None)
+        self.message: list[int] | None = None  # Message being dispatched
+        self.dispatch_table = DispatchTable(mappings, {action: getattr(self, method) for action, method in MIDI_ACTIONS.items()})
+        self.midi_filter = self.dispatch_table.midi_filter()
+
+    def reset(self, volume: float | None) -> None:
+        """Releases the latch; the remote takes over `volume` again as the app's takeover mode says."""
+        self.takeover.reset(volume, takeover_settings.get(volume_app or DEFAULT_APP, takeover_settings[DEFAULT_APP]))
+        self.relative_encoder.reset(volume)
+
+    def connect_feedback(self, send: Callable[[list[int]], None]) -> None:
+        """Starts echoing the player volume to the knob through `send` (the port's MidiOut)."""
+        if self._feedback_mapping is None:
+            return
+        mapping = self._feedback_mapping
+        # Reuse the CC learned on an earlier connection if the mapping does not name one
+        status, number = (mapping.status, mapping.number) if mapping.number is not None else self._feedback_cc
+        curve = tuple(CURVES[mapping.curve](value) for value in range(128))
+        self.feedback = MidiFeedback(send, curve, status, number)
+
+    def disconnect_feedback(self) -> None:
+        if self.feedback:
+            self.feedback.cancel()
+            self._feedback_cc = (self.feedback.status, self.feedback.number)
+            self.feedback = None
+
+    def follow(self, volume: float) -> bool:
+        """The player volume changed elsewhere. With feedback, moves the knob there and stays
+        latched; returns False if it had to release the latch instead."""
+        self.reset(volume)
+        if self.feedback and self.feedback.update(volume):
+            self.takeover.engage()
+        return self.takeover.engaged
+
+    def set_volume(self, volume_percent: float) -> None:
+        global active_controller
+        if active_controller is not self:
+            active_controller = self
+            for other in controllers:
+                if other is not self:
+                    other.reset(volume_percent)
+        set_volume(volume_percent)
+
+    def handle_volume(self, remote_value_percent: float, delta: float):
+        """'volume' action: takes over the app volume (see SoftTakeover), then updates the target."""
+        if self.feedback and self.message:
+            self.feedback.learn(self.message)
+        if self.button.turned():
+            self._fine_adjust(remote_value_percent, delta)
+            return
+
+        # Once engaged this passes the knob straight through - just update the target instantly!
+        volume = self.takeover.feed(remote_value_percent)
+        if volume is not None:
+            self.volume_motion.update(volume, delta)
+            self.set_volume(volume)
+
+    def handle_volume_relative(self, steps: int, delta: float):
+        """'volume_relative' action: steps the target directly, faster turns take bigger steps."""
+        if self.button.turned():
+            volume = self.relative_encoder.feed(steps, delta, multiplier=FINE_ADJUST_SCALE)
+        else:
+            volume = self.relative_encoder.feed(steps, delta)
+        self.volume_motion.update(volume, delta)
+        logging.debug(f"Relative encoder: {steps:+d} detents after {delta * 1000:.0f}ms → {volume:.1f}%")
+        self.set_volume(volume)
+
+    def handle_play_pause(self, _value: int, _delta: float):
+        """'play_pause' action."""
+        toggle_play_pause()
+        logging.debug("Play/Pause toggled by MIDI.")
+
+    def handle_button(self, velocity: int, _delta: float):
+        """'button' action: press (velocity > 0) and release, recognised as gestures."""
+        if velocity:
+            self.button.press()
+            return
+        self.button.release()
+        if self._fine_anchor is not None:
+            # The knob moved at a different rate than the volume, so it has to pick up again
+            self._fine_anchor = None
+            self.reset(volume_sync.target if volume_sync else None)
+
+    def _fine_adjust(self, remote_value_percent: float, delta: float):
+        """Press+turn on an absolute knob: the volume follows the knob at FINE_ADJUST_SCALE."""
+        if self._fine_anchor is None:
+            volume = volume_sync.target if volume_sync and volume_sync.target is not None else self.takeover.volume
+            self._fine_anchor = (remote_value_percent, remote_value_percent if volume is None else volume)
+        anchor_remote, anchor_volume = self._fine_anchor
+        volume = max(0.0, min(100.0, anchor_volume + (remote_value_percent - anchor_remote) * FINE_ADJUST_SCALE))
+        self.volume_motion.update(volume, delta)
+        logging.debug(f"Fine adjust: remote at {remote_value_percent:.4g}% → {volume:.4g}%")
+        self.set_volume(volume)
+
+
+# Action names usable in MIDI mappings, and the MidiController methods they run
+MIDI_ACTIONS = {
+    "volume": "handle_volume",
+    "volume_relative": "handle_volume_relative",
+    "play_pause": "handle_play_pause",
+    "button": "handle_button",
+}
+
+
+def volume_synced(volume_percent: float):
+    """The backend accepted a new volume: other knobs follow it (with --midi-feedback)."""
+    if playback_state:
+        playback_state.update(volume=round(volume_percent))
+        playback_state.touch()
+    for controller in controllers:
+        if controller is not active_controller and controller.feedback:
+            controller.follow(volume_percent)
+
+
+def player_volume_changed(volume: int, follow: bool = False):
+    """The playback state shows a volume we did not set. With --midi-feedback (`follow`),
+    the knobs move there."""
+    if volume_sync.target is not None and volume_sync.quantize(volume_sync.target) != volume_sync.synced_volume:
+        return  # A knob change is on its way to the player
+    if volume == volume_sync.synced_volume:
+        return
+    logging.info(f"Player volume changed to {volume}% outside the remote")
+    volume_sync.observed(volume)
+    if follow:
+        for controller in controllers:
+            controller.follow(volume)
+
+
+def volume_sync_pace() -> float:
+    """Sync interval multiplier from the knob that is currently moving the volume."""
+    return active_controller.volume_motion.pace_factor() if active_controller else 1.0
+
+
+def midi_callback(message: tuple[list[int], float], controller: MidiController, sysex_enabled: bool = False, log_level: str = 'info'):
+    """Process MIDI messages instantly on the event loop - no throttling here!"""
     logging.debug(f"MIDI message received: {message}")
     message_type, note, velocity = message[0]
 
@@ -396,46 +661,23 @@ def midi_callback(message: tuple[list[int], float], _time_stamp: float, sysex_en
     elif log_level == 'debug':
         logging.debug(f"MIDI Raw: Type={message_type}, Note={note}, Velocity={velocity}")
 
-    if message_type == 176:  # CC message
-        remote_value_percent = int((velocity / 127.0) * 100)
-
-        if not is_latched:
-            if actual_app_volume_on_connect is not None:
-                if abs(remote_value_percent - actual_app_volume_on_connect) <= LATCH_TOLERANCE_PERCENT:
-                    is_latched = True
-                    logging.info(f"Remote latched at {remote_value_percent}%. App volume was {actual_app_volume_on_connect}%. Control engaged.")
-                    set_volume(remote_value_percent)
-                else:
-                    logging.debug(
-                        f"Waiting for latch: Remote at {remote_value_percent}%, App at {actual_app_volume_on_connect}%. "
-                        f"Difference {abs(remote_value_percent - actual_app_volume_on_connect)}% > {LATCH_TOLERANCE_PERCENT}%"
-                    )
-            else:
-                # No initial app volume, latch immediately
-                is_latched = True
-                logging.info(f"No initial app volume. Remote latched immediately at {remote_value_percent}%. Control engaged.")
-                set_volume(remote_value_percent)
-        else:
-            # Already latched - just update the target instantly!
-            set_volume(remote_value_percent)
-
-    elif message_type == 144:  # Note On message
-        toggle_play_pause()
-        logging.debug(f"Play/Pause toggled based on MIDI note {note}.")
-
+    if midi_recorder:
+        midi_recorder.record(message)
 
-def main():
-    options = process_command_line_args()
+    # Status, channel and controller/note were already matched by the MidiFilter
+    controller.message = message[0]
+    controller.dispatch_table.dispatch(message[0], message[1])
 
-    # Load environment variables from .env file
-    _ = load_dotenv()
 
-    # Spotify setup using SpotifyOAuth
-    global sp
+def init_spotify():
+    """Creates the global Spotify client. Blocking (OAuth may prompt), so run it off the loop."""
+    global sp, http_session
     spotify_scope = "user-read-playback-state user-modify-playback-state"
 
     try:
+        http_session = PooledSession()
         auth_manager = SpotifyOAuth(
+            requests_session=http_session,
             scope=spotify_scope,
             # client_id, client_secret, redirect_uri will be picked up from env vars:
             # SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_SECRET, SPOTIPY_REDIRECT_URI
@@ -445,8 +687,10 @@ def main():
             # redirect_uri=os.getenv('SPOTIPY_REDIRECT_URI'),
             open_browser=True, # Set to True to re-enable automatic browser opening
         )
-        # Disable automatic retries to handle rate limits ourselves
-        sp = spotipy.Spotify(auth_manager=auth_manager, retries=0)
+        # The session's adapter never retries, so we handle rate limits ourselves: a 429 arrives
+        # as an HTTP error that keeps the Retry-After header. (Given a session, spotipy does not
+        # install its own retrying adapter.) Player calls go through the AsyncSpotifyClient in run().
+        sp = spotipy.Spotify(auth_manager=auth_manager, requests_session=http_session)
 
         # Test if authentication was successful by making a simple API call
         try:
@@ -466,103 +710,256 @@ def main():
         logging.error(f"Failed to initialize Spotify client: {e}")
         sp = None # Ensure sp is None if auth fails
 
-    # Initialize actual_app_volume_on_connect for Spotify if sp is available
-    if sp:
-        initial_spotify_volume = get_spotify_volume_api() # This now uses the authenticated sp
-        if initial_spotify_volume is not None:
-            global actual_app_volume_on_connect, is_latched
-            actual_app_volume_on_connect = initial_spotify_volume
-            is_latched = False # Reset latching state on connect
-            logging.info(f"Initial Spotify volume (API): {actual_app_volume_on_connect}%. Latching will occur on first remote interaction.")
-        else:
-            logging.warning("Could not get initial Spotify volume via API after authentication.")
-    else:
-        logging.info("Spotify client not available. Spotify features will be disabled.")
+
+async def replay_midi_session(path: str, speed: float, controller: MidiController, sysex_enabled: bool, log_level: str):
+    """Feeds a recorded session (--midi-replay) through the same filter, mappings and sync worker as live input."""
+    controller.reset(actual_app_volume_on_connect)
+    try:
+        with SessionLog(path) as session:
+            logging.info(f"Replaying {len(session)} MIDI messages ({session.duration():.1f}s) from {path} "
+                         f"at {f'{speed:g}x' if speed > 0 else 'max'} speed")
+            await replay_session(session, midi_callback, controller, sysex_enabled, log_level,
+                                 speed=speed, midi_filter=controller.midi_filter)
+        await asyncio.sleep(REPLAY_SETTLE_SECONDS)
+    finally:
+        controller.midi_filter.log_counters()
+
+
+def restart_midi_server():
+    """Restarts the CoreMIDI server. A no-op off macOS: ALSA has no server to restart."""
+    if sys.platform != "darwin":
+        logging.info("MIDI server restarts are macOS only; skipping.")
+        return
+    from CoreMIDI import MIDIRestart
+    MIDIRestart()
+
+
+async def serve_port(controller: MidiController, options: dict[str, str], port_directory: PortDirectory,
+                     restarts: MidiServerRestarts | None):
+    """Connects, listens to and reconnects one controller's MIDI port, forever."""
+    global actual_app_volume_on_connect, volume_app
+
+    loop = asyncio.get_running_loop()
+    sysex_enabled = "--midi-sysex" in options
+    current_log_level = options.get("--log-level", "info").lower()
 
     # MIDI setup
     midi_in = rtmidi.MidiIn()
     midi_out = rtmidi.MidiOut()
-    sysex_enabled = "--midi-sysex" in options
     restart_interval = float(options.get("--midi-restart-interval", 1.0))
-    current_log_level = options.get("--log-level", "info").lower()
+    # Batched polling instead of one Python callback per message (interval in ms, 0 = callback mode)
+    drain_interval = float(options.get("--midi-drain-interval", 0)) / 1000.0
 
-    port_name = options["--midi-name"]
-    restart_enable = "--midi-restart" in options
+    port_name = controller.port_name
+    supervisor = PortSupervisor(
+        port_directory, port_name, check_interval=restart_interval,
+        restarts=restarts,
+        backoff_initial=restart_interval, backoff_max=max(restart_interval, BACKOFF_MAX))
 
     while True:
-        ports_in = midi_in.get_ports()
-        ports_out = midi_out.get_ports()
-        logging.info(f"Available MIDI input ports: {ports_in}")
-        logging.info(f"Available MIDI output ports: {ports_out}")
-
-        if port_name in ports_in and port_name in ports_out:
-            try:
-                with midi_in.open_port(ports_in.index(port_name)), \
-                     midi_out.open_port(ports_out.index(port_name)):
-
-                    if sysex_enabled:
-                        sysex_message = [0xF0, 0x00, 0x20, 0x76, 0x02, 0x00, 0x02, 0x00, 0xF7]
-                        logging.info(f"SYSEX Mode Enabled: Attempting to send SYSEX message: {sysex_message}")
-                        try:
-                            midi_out.send_message(sysex_message)
-                            logging.info("SYSEX message sent successfully.")
-                        except Exception as e:
-                            logging.error(f"Failed to send SYSEX message: {e}")
-                    
+        port_in_index, port_out_index = await supervisor.wait_for_port()
+        try:
+            with midi_in.open_port(port_in_index), \
+                 midi_out.open_port(port_out_index):
+                supervisor.connected()
+
+                if sysex_enabled:
+                    sysex_message = [0xF0, 0x00, 0x20, 0x76, 0x02, 0x00, 0x02, 0x00, 0xF7]
+                    logging.info(f"SYSEX Mode Enabled: Attempting to send SYSEX message: {sysex_message}")
+                    try:
+                        midi_out.send_message(sysex_message)
+                        logging.info("SYSEX message sent successfully.")
+                    except Exception as e:
+                        logging.error(f"Failed to send SYSEX message: {e}")
+                
+                if "--midi-feedback" in options:
+                    controller.connect_feedback(midi_out.send_message)
+
+                if controller.feedback and volume_sync.synced_volume is not None and \
+                        controller.follow(volume_sync.synced_volume):
+                    # The player volume is known and the knob has been moved there: nothing to read or latch
+                    logging.info(f"Remote set to the player volume ({volume_sync.synced_volume:.4g}%). Control engaged.")
+                else:
                     # Log initial volumes and set for latching
-                    initial_spotify_volume = get_application_volume("Spotify")
+                    initial_spotify_volume = None
+                    if spotify_api and not playback_state.state:
+                        initial_spotify_volume = await get_spotify_volume_api()
+                    if initial_spotify_volume is None:
+                        initial_spotify_volume = await loop.run_in_executor(None, get_application_volume, "Spotify")
                     if initial_spotify_volume is not None:
                         logging.info(f"Initial Spotify volume: {initial_spotify_volume}%")
                         if actual_app_volume_on_connect is None: # Prioritize Spotify
                             actual_app_volume_on_connect = initial_spotify_volume
-                    
-                    initial_music_volume = get_application_volume("Music")
+                            volume_app = "Spotify"
+                
+                    initial_music_volume = await loop.run_in_executor(None, get_application_volume, "Music")
                     if initial_music_volume is not None:
                         logging.info(f"Initial Music volume: {initial_music_volume}%")
                         if actual_app_volume_on_connect is None: # Use Music if Spotify wasn't available
                             actual_app_volume_on_connect = initial_music_volume
+                            volume_app = "Music"
 
                     if actual_app_volume_on_connect is not None:
                         logging.info(f"App volume for latching set to: {actual_app_volume_on_connect}%")
                     else:
                         logging.warning("Could not determine initial application volume for latching. Will latch on first remote movement.")
-                    
-                    is_latched = False # Reset latch state on new connection
-
-                    # Prepare callback with current sysex_enable status and log_level
-                    callback_with_context = partial(midi_callback, sysex_enabled=sysex_enabled, log_level=current_log_level)
-                    midi_in.set_callback(callback_with_context)
+                
+                    # Reset latch state on new connection; pick up from where other controllers left the volume
+                    controller.reset(actual_app_volume_on_connect if volume_sync.target is None else volume_sync.target)
+
+                configure_port(midi_in)
+                midi_filter = controller.midi_filter
+                drain_task: asyncio.Task[None] | None = None
+                if drain_interval > 0:
+                    # Messages queue up inside rtmidi and are drained in batches on the loop
+                    # Relative detents add up, so only absolute CC positions can be collapsed
+                    drain_task = loop.create_task(drain_midi_input(
+                        midi_in, midi_callback, drain_interval, controller, sysex_enabled, current_log_level,
+                        midi_filter=midi_filter, collapse_cc=controller.dispatch_table.can_collapse_cc))
+                    logging.info(f"'{port_name}' opened successfully. Draining input. Waiting for MIDI data...")
+                else:
+                    # Messages are processed on the loop; the rtmidi thread only forwards them
+                    midi_in.set_callback(post_midi_message, (loop, controller, sysex_enabled, current_log_level))
                     logging.info(f"'{port_name}' opened successfully. Callback set. Waiting for MIDI data...")
-                    logging.info("Turn the knob on your Ortho Remote to test the connection.")
-                    
-                    # Start the volume sync worker thread
-                    global volume_sync_thread, stop_sync_thread
-                    stop_sync_thread = False
-                    volume_sync_thread = Thread(target=volume_sync_worker, daemon=True)
-                    volume_sync_thread.start()
-                    
-                    # Log initial volumes
-                    _ = get_application_volume("Music")
-                    _ = get_application_volume("Spotify")
+                logging.info("Turn the knob on your Ortho Remote to test the connection.")
 
-                    while port_name in midi_in.get_ports() and port_name in midi_out.get_ports():
-                        time.sleep(restart_interval)
-                    
-                    # Stop the sync thread when MIDI disconnects
-                    stop_sync_thread = True
-                    if volume_sync_thread:
-                        volume_sync_thread.join(timeout=1.0)
-                    
-                    midi_in.cancel_callback()
-            except Exception as e:
-                logging.error(f"Error with MIDI port {port_name}: {str(e)}")
+                try:
+                    await supervisor.watch()
+                finally:
+                    # Stop listening when MIDI disconnects; the sync worker keeps serving other ports
+                    if drain_task:
+                        drain_task.cancel()
+                    else:
+                        midi_in.cancel_callback()
+                    midi_filter.log_counters()
+        except Exception as e:
+            logging.error(f"Error with MIDI port {port_name}: {str(e)}")
+            supervisor.disconnected(failed=True)
+        else:
+            supervisor.disconnected()
+        if controller.feedback:
+            controller.feedback.log_counters()
+            controller.disconnect_feedback()
+        supervisor.log_metrics()
+        controller.takeover.log_metrics()
+
+
+async def run(options: dict[str, str], ports: list[tuple[str | None, str | None]]):
+    """Core runtime: one event loop owns port supervision, volume sync scheduling and timers.
+
+    Every MIDI port gets its own controller state and supervision task; they share one
+    volume sync worker and one set of backend clients. Spotify Web API reads and writes are
+    async and overlap on the loop; blocking backend calls (osascript, Spotify setup) run one
+    at a time on a single executor thread, and rtmidi hands messages in through
+    call_soon_threadsafe. OAuth token refreshes (ahead of expiry) run on a maintenance
+    thread of their own, so a volume write never waits for one.
+    """
+    global actual_app_volume_on_connect, volume_app, volume_sync, takeover_settings, playback_state, spotify_api
+
+    try:
+        for port_name, map_path in ports:
+            if map_path:
+                mappings = load_mappings(map_path)
+            else:
+                mappings = default_mappings(parse_channel(options.get("--midi-channel", 1)), relative="--midi-sysex" in options)
+            controllers.append(MidiController(port_name, mappings))
+    except (OSError, KeyError, ValueError) as e:
+        logging.error(f"Invalid MIDI mapping: {e}")
+        sys.exit(1)
+
+    try:
+        takeover_settings = parse_takeover_settings(options.get("--midi-takeover", ""))
+    except ValueError as e:
+        logging.error(f"Invalid --midi-takeover: {e}")
+        sys.exit(1)
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=1, thread_name_prefix="backend"))
+
+    await loop.run_in_executor(None, init_spotify)
+    token_refresher = None
+    if sp:
+        # Requests take the token from the refresher's memory; spotipy's auth manager reads
+        # the cache file and may refresh (or prompt) inline, so it is never called on the loop
+        maintenance = ThreadPoolExecutor(max_workers=1, thread_name_prefix="maintenance")
+        token_refresher = TokenRefresher(sp.auth_manager, executor=maintenance)
+        await token_refresher.load()
+        spotify_api = AsyncSpotifyClient(token_refresher.access_token, on_unauthorized=token_refresher.unauthorized)
+
+    # Volume writes and playback-state refreshes share the Spotify backend's token bucket
+    spotify_limiter = AdaptiveTokenBucket()
+    playback_state = PlaybackStateCache(partial(get_spotify_playback, raise_rate_limited=True),
+                                        on_volume_change=partial(player_volume_changed, follow="--midi-feedback" in options),
+                                        limiter=spotify_limiter)
+
+    # Initialize actual_app_volume_on_connect for Spotify if sp is available
+    if sp:
+        initial_spotify_volume = await get_spotify_volume_api()
+        if initial_spotify_volume is not None:
+            actual_app_volume_on_connect = initial_spotify_volume
+            volume_app = "Spotify"
+            logging.info(f"Initial Spotify volume (API): {actual_app_volume_on_connect}%. Latching will occur on first remote interaction.")
         else:
-            logging.info(f"Port unavailable: '{port_name}'")
+            logging.warning("Could not get initial Spotify volume via API after authentication.")
+    else:
+        logging.info("Spotify client not available. Spotify features will be disabled.")
+
+    # One volume sync worker for all controllers, limited by the Spotify backend's token bucket
+    volume_sync = VolumeSyncWorker(sync_spotify_volume, sync_interval=BURST_SYNC_INTERVAL, pace=volume_sync_pace,
+                                   on_synced=volume_synced, limiter=spotify_limiter)
+    if actual_app_volume_on_connect is not None:
+        volume_sync.observed(actual_app_volume_on_connect)
+    volume_sync.start()
+    keep_alive_task = None
+    if sp:
+        playback_state.start()
+        token_refresher.start()
+        keep_alive_task = loop.create_task(spotify_api.keep_alive(), name="http-keep-alive")
+    try:
+        if "--midi-replay" in options:
+            # 0 = as fast as possible
+            await replay_midi_session(options["--midi-replay"], float(options.get("--midi-replay-speed", 1.0)),
+                                      controllers[0], "--midi-sysex" in options, options.get("--log-level", "info").lower())
+            return
+        # One set of port lists for all supervisors, enumerated with MIDI clients of its own
+        port_directory = PortDirectory(rtmidi.MidiIn(), rtmidi.MidiOut(),
+                                       ttl=min(ENUMERATION_TTL, float(options.get("--midi-restart-interval", 1.0)) / 2))
+        # A MIDI server restart drops every port, so all ports share one restart budget
+        restarts = MidiServerRestarts(restart_midi_server, int(options.get("--midi-restart-budget", RESTART_BUDGET))) \
+            if "--midi-restart" in options else None
+        await asyncio.gather(*(serve_port(controller, options, port_directory, restarts) for controller in controllers))
+    finally:
+        await playback_state.stop()
+        if token_refresher:
+            await token_refresher.stop()
+            token_refresher.log_metrics()
+        if keep_alive_task:
+            keep_alive_task.cancel()
+            await spotify_api.close()
+            spotify_api.log_metrics()
+            http_session.stats.log_metrics("Spotify auth")
+        await volume_sync.stop()
+        volume_sync.log_metrics()
+
 
-        if restart_enable:
-            logging.info(f"Attempting MIDIRestart due to port '{port_name}' unavailability.")
-            MIDIRestart()
-        time.sleep(restart_interval)
+def main():
+    global midi_recorder
+    options, ports = process_command_line_args()
+
+    # Load environment variables from .env file
+    _ = load_dotenv()
+
+    if "--midi-record" in options:
+        midi_recorder = SessionRecorder(options["--midi-record"])
+        logging.info(f"Recording MIDI input to {options['--midi-record']}")
+
+    try:
+        asyncio.run(run(options, ports))
+    except KeyboardInterrupt:
+        logging.info("Interrupted, shutting down.")
+    finally:
+        if midi_recorder:
+            midi_recorder.close()
 
 if __name__ == "__main__":
     main()
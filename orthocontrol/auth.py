@@ -0,0 +1,148 @@
+# orthocontrol/auth.py
+
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import Executor
+from contextlib import suppress
+from typing import Any
+
+REFRESH_MARGIN = 300.0  # Refresh this long before expiry; spotipy itself would refresh inline at 60s
+REFRESH_JITTER = 30.0  # Up to this much earlier still, so restarted instances don't refresh in lockstep
+RETRY_DELAY = 10.0  # Wait after a failed refresh before trying again
+EXPIRY_MARGIN = 60.0  # A token this close to expiry is refreshed before use, as spotipy does
+WAKE_CHECK_INTERVAL = 30.0  # Longest single sleep: the loop clock stops while the machine is suspended
+
+TokenInfo = dict[str, Any]  # spotipy's token_info: access_token, refresh_token, expires_in, expires_at
+
+
+class TokenRefresher:
+    """Refreshes an OAuth access token ahead of its expiry on a background task.
+
+    Works with a spotipy auth manager (SpotifyOAuth): the token is read from its
+    `cache_handler` and renewed with `refresh_access_token`, which stores the new one back
+    in the cache. The current token is also kept in memory: `access_token` returns it
+    without touching the cache file or spotipy's auth manager, so request code on the loop
+    can call it for every request. Because the refresh happens `margin` (minus jitter)
+    before expiry, that token is normally valid, and a volume write never pays for a
+    refresh round trip. For short-lived tokens, margin and jitter shrink to fit the token's
+    lifetime.
+
+    Expiry is wall-clock time, but the loop's clock stops while the machine sleeps, so the
+    background task sleeps in chunks of at most WAKE_CHECK_INTERVAL and rechecks. Until it
+    does, `access_token` refreshes a token within EXPIRY_MARGIN of expiry before returning
+    it, and `unauthorized` refreshes after a request was rejected with 401. Both hold off
+    for `retry_delay` after a failed refresh.
+
+    Refreshes are single-flight: `refresh` joins one already in progress. They run on
+    `executor`, which should not be the backend executor, so a slow token endpoint cannot
+    hold up volume writes queued behind it.
+    """
+
+    def __init__(self, auth_manager: Any, margin: float = REFRESH_MARGIN, jitter: float = REFRESH_JITTER,
+                 retry_delay: float = RETRY_DELAY, executor: Executor | None = None, rng: random.Random | None = None):
+        self._auth_manager = auth_manager
+        self._margin = margin
+        self._jitter = jitter
+        self._retry_delay = retry_delay
+        self._executor = executor
+        self._rng = rng or random.Random()
+        self._in_flight: asyncio.Future[bool] | None = None
+        self._task: asyncio.Task[None] | None = None
+        self._token_info: TokenInfo | None = None
+        self._retry_at = float("-inf")  # time.monotonic() before which on-demand refreshes are skipped
+        self.refreshes = 0
+        self.failures = 0
+
+    def token_info(self) -> TokenInfo | None:
+        return self._auth_manager.cache_handler.get_cached_token()
+
+    async def access_token(self) -> str:
+        """The current access token, from memory ("" before `load`, or without a cached token).
+        Refreshes first if it is about to expire."""
+        if self._token_info and self.expiring(self._token_info) and time.monotonic() >= self._retry_at:
+            await self.refresh()
+        return self._token_info['access_token'] if self._token_info else ""
+
+    async def unauthorized(self) -> bool:
+        """A request was rejected with 401. Returns True if a fresh token is now in memory."""
+        if time.monotonic() < self._retry_at:
+            return False
+        return await self.refresh()
+
+    def expiring(self, token_info: TokenInfo) -> bool:
+        lifetime = float(token_info.get('expires_in', EXPIRY_MARGIN * 10))
+        return token_info['expires_at'] - min(EXPIRY_MARGIN, lifetime / 10) <= time.time()
+
+    async def load(self) -> TokenInfo | None:
+        """Reads the cached token (on the executor) into memory."""
+        self._token_info = await asyncio.get_running_loop().run_in_executor(self._executor, self.token_info)
+        return self._token_info
+
+    def refresh_delay(self, token_info: TokenInfo) -> float:
+        """Seconds from now until `token_info` should be refreshed."""
+        lifetime = float(token_info.get('expires_in', self._margin * 2))
+        margin = min(self._margin, lifetime / 2)
+        jitter = min(self._jitter, lifetime / 10)
+        return max(0.0, token_info['expires_at'] - margin - self._rng.uniform(0.0, jitter) - time.time())
+
+    async def refresh(self) -> bool:
+        """Refreshes the token now, or waits for the refresh already in progress."""
+        if self._in_flight is None:
+            self._in_flight = asyncio.ensure_future(self._refresh())
+            self._in_flight.add_done_callback(self._clear_in_flight)
+        return await asyncio.shield(self._in_flight)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run(), name="token-refresh")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        token_info = await self.load()
+        if not token_info or 'refresh_token' not in token_info:
+            logging.error("Token refresh: no cached token with a refresh token. Proactive refresh is disabled; "
+                          "requests retry a refresh from the cache when the token expires or is rejected")
+            return
+        while True:
+            token_info = self._token_info
+            deadline = time.time() + self.refresh_delay(token_info)
+            logging.debug(f"Token refresh: next refresh in {deadline - time.time():.0f}s")
+            while (remaining := deadline - time.time()) > 0 and self._token_info is token_info:
+                await asyncio.sleep(min(remaining, WAKE_CHECK_INTERVAL))
+            if self._token_info is not token_info:
+                continue  # Refreshed on demand in the meantime
+            if not await self.refresh():
+                await asyncio.sleep(self._retry_delay)
+
+    def log_metrics(self) -> None:
+        logging.info(f"Token refresh: {self.refreshes} refreshes, {self.failures} failures")
+
+    async def _refresh(self) -> bool:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            token_info = await loop.run_in_executor(self._executor, self.token_info)
+            if not token_info or 'refresh_token' not in token_info:
+                raise ValueError("no refresh token in the token cache")
+            # Returns the new token_info, as well as storing it in the cache
+            self._token_info = await loop.run_in_executor(self._executor, self._auth_manager.refresh_access_token,
+                                                          token_info['refresh_token'])
+        except Exception as e:
+            self.failures += 1
+            self._retry_at = time.monotonic() + self._retry_delay
+            logging.warning(f"Token refresh failed: {e}")
+            return False
+        self._retry_at = float("-inf")
+        self.refreshes += 1
+        logging.info(f"Access token refreshed ahead of expiry in {(loop.time() - started) * 1000:.0f}ms")
+        return True
+
+    def _clear_in_flight(self, _future: asyncio.Future[bool]) -> None:
+        self._in_flight = None
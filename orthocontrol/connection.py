@@ -0,0 +1,144 @@
+# orthocontrol/connection.py
+
+import logging
+import ssl
+import statistics
+import time
+from collections import deque
+
+import certifi
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+
+POOL_HOSTS = 2  # api.spotify.com and accounts.spotify.com
+POOL_SIZE = 2  # Connections kept per host: setup calls and token refreshes
+TIMING_HISTORY = 200  # Phase timings kept for metrics
+
+
+class ConnectionStats:
+    """Counters and recent phase timings (DNS+TCP connect, TLS handshake, whole request) for
+    one session."""
+
+    def __init__(self):
+        self.requests = 0  # Including probes
+        self.probes = 0
+        self.connections = 0
+        self.resumed = 0  # Connections whose TLS handshake resumed an earlier session
+        self.connect_ms: deque[float] = deque(maxlen=TIMING_HISTORY)
+        self.tls_ms: deque[float] = deque(maxlen=TIMING_HISTORY)
+        self.request_ms: deque[float] = deque(maxlen=TIMING_HISTORY)
+        self.last_request = float("-inf")  # time.monotonic() of the latest request or probe
+
+    def log_metrics(self, label: str = "HTTP") -> None:
+        def median(values: deque[float]) -> str:
+            return f"{statistics.median(values):.1f}ms" if values else "-"
+        logging.info(f"{label}: {self.requests} requests ({self.probes} keep-alive probes) over {self.connections} "
+                     f"connections ({self.resumed} TLS resumed); median connect {median(self.connect_ms)}, "
+                     f"TLS {median(self.tls_ms)}, request {median(self.request_ms)}")
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """Client SSL context that offers the last TLS session seen for a host, so a new
+    connection after the old one was dropped gets an abbreviated handshake.
+
+    Works for blocking sockets (`wrap_socket`, used by urllib3) and for asyncio streams
+    (`wrap_bio`). Whoever reads the first response stores the connection's session in
+    `sessions`, keyed by host name. Certificates come from `cafile`, or certifi's bundle as
+    requests uses (the system store is often empty on python.org and standalone builds).
+    """
+
+    def __new__(cls, stats: ConnectionStats, cafile: str | None = None):
+        context = super().__new__(cls, ssl.PROTOCOL_TLS_CLIENT)
+        context.stats = stats
+        context.sessions = {}
+        return context
+
+    def __init__(self, stats: ConnectionStats, cafile: str | None = None):
+        super().__init__()
+        self.load_verify_locations(cafile or certifi.where())
+
+    def wrap_socket(self, sock, *args, server_hostname: str | None = None,
+                    session: ssl.SSLSession | None = None, **kwargs):
+        session = session or self.sessions.get(server_hostname)
+        return super().wrap_socket(sock, *args, server_hostname=server_hostname, session=session, **kwargs)
+
+    def wrap_bio(self, incoming, outgoing, *args, server_hostname: str | None = None,
+                 session: ssl.SSLSession | None = None, **kwargs):
+        session = session or self.sessions.get(server_hostname)
+        return super().wrap_bio(incoming, outgoing, *args, server_hostname=server_hostname, session=session,
+                                **kwargs)
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    """Times the connect phases and hands TLS sessions back to a `ResumingSSLContext`."""
+
+    _connect_time = 0.0
+
+    def _new_conn(self):
+        started = time.perf_counter()
+        sock = super()._new_conn()
+        self._connect_time = time.perf_counter() - started
+        return sock
+
+    def connect(self) -> None:
+        started = time.perf_counter()
+        super().connect()
+        context = self.ssl_context
+        if isinstance(context, ResumingSSLContext):
+            context.stats.connections += 1
+            context.stats.connect_ms.append(self._connect_time * 1000.0)
+            context.stats.tls_ms.append((time.perf_counter() - started - self._connect_time) * 1000.0)
+            if getattr(self.sock, 'session_reused', False):
+                context.stats.resumed += 1
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        # TLS 1.3 tickets arrive after the handshake; by the first response they are in
+        if isinstance(self.ssl_context, ResumingSSLContext) and getattr(self.sock, 'session', None):
+            self.ssl_context.sessions[self.host] = self.sock.session
+        return response
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with a sized pool, TLS session resumption, per-request timing and no
+    retries (a 429 must reach the caller with its Retry-After header)."""
+
+    def __init__(self, stats: ConnectionStats, pool_size: int = POOL_SIZE):
+        self._stats = stats
+        self._ssl_context = ResumingSSLContext(stats)
+        super().__init__(pool_connections=POOL_HOSTS, pool_maxsize=pool_size, max_retries=0)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, ssl_context=self._ssl_context, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {**self.poolmanager.pool_classes_by_scheme,
+                                                   "https": TimedHTTPSConnectionPool}
+
+    def send(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().send(request, *args, **kwargs)
+        finally:
+            self._stats.requests += 1
+            self._stats.request_ms.append((time.perf_counter() - started) * 1000.0)
+            self._stats.last_request = time.monotonic()
+
+
+class PooledSession(requests.Session):
+    """requests.Session for spotipy's own traffic: the setup calls and OAuth token requests.
+    (Player calls go through `AsyncSpotifyClient`.)
+
+    Connections are pooled and never retried, and a connection opened after the pooled
+    one was dropped resumes the TLS session instead of doing a full handshake. Timings go
+    to `stats`.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE):
+        super().__init__()
+        self.stats = ConnectionStats()
+        self.mount("https://", PooledAdapter(self.stats, pool_size))
@@ -1,16 +1,33 @@
 # orthocontrol/control/spotify_api_strategy.py
 
 import logging
+import time
 from typing import override # For Python 3.12+
 
 import spotipy
 from spotipy.exceptions import SpotifyException
 
+from ..playback import PlaybackStateCache
+from ..spotify import DEVICE_CACHE_TTL
 from .base import MediaControlStrategy
 
 class SpotifyApiMediaStrategy(MediaControlStrategy):
-    def __init__(self, sp_client: spotipy.Spotify | None):
+    """Spotify through the Web API. The device used for volume control is cached for
+    `device_ttl` seconds, so a steady-state volume change is one sp.volume() call; a
+    device error clears the cache and the next call looks the device up again.
+
+    With a `playback_state`, reads come from that shared cache instead of the API, and
+    successful writes update it optimistically. A device the API rejected with 404 is not
+    taken from the shared state again until a write to it succeeds, as the state may
+    predate the rejection; the device is looked up through the API instead."""
+
+    def __init__(self, sp_client: spotipy.Spotify | None, device_ttl: float = DEVICE_CACHE_TTL,
+                 playback_state: PlaybackStateCache | None = None):
         self._sp = sp_client
+        self._device_ttl = device_ttl
+        self._playback_state = playback_state
+        self._device: tuple[str, float] | None = None  # (device id, time.monotonic() when seen)
+        self._rejected_device: str | None = None  # Last device a write got 404 for
 
     @property
     @override
@@ -34,11 +51,14 @@ class SpotifyApiMediaStrategy(MediaControlStrategy):
         if not self.is_available(app_name):
             return None
         assert self._sp is not None # Ensured by is_available or should be
+        if self._playback_state and self._playback_state.volume is not None:
+            return self._playback_state.volume
 
         try:
             playback = self._sp.current_playback()
             if playback and playback.get('device') and playback['device'].get('volume_percent') is not None:
                 volume = int(playback['device']['volume_percent'])
+                self._remember_device(playback['device'].get('id'))
                 logging.debug(f"SpotifyAPI: Current volume is {volume}% via API.")
                 return volume
             else:
@@ -53,14 +73,24 @@ class SpotifyApiMediaStrategy(MediaControlStrategy):
             logging.error(f"SpotifyAPI: Unexpected error getting volume: {e}")
             return None
 
+    def _remember_device(self, device_id: str | None) -> None:
+        self._device = (device_id, time.monotonic()) if device_id else None
+
     def _get_spotify_device_id_for_volume_control(self) -> str | None:
         """
         Attempts to find a suitable Spotify device ID for volume control.
-        Prioritizes active devices, then preferred types (Computer, Speaker), then any available device.
+        Returns the cached device while it is fresh, without any API call.
+        Otherwise prioritizes active devices, then preferred types (Computer, Speaker), then any available device.
         Will attempt to transfer playback to a non-active device if found.
         Returns the device ID if successful, otherwise None.
         """
         assert self._sp is not None
+        if self._device and time.monotonic() - self._device[1] < self._device_ttl:
+            return self._device[0]
+        device_id = self._playback_state.device_id if self._playback_state else None
+        if device_id and device_id != self._rejected_device:
+            self._remember_device(device_id)
+            return device_id
         logging.debug("SpotifyAPI: Searching for device for volume control.")
 
         try:
@@ -77,9 +107,11 @@ class SpotifyApiMediaStrategy(MediaControlStrategy):
 
             if active_device_id_from_playback and is_playing_on_device:
                 logging.info(f"SpotifyAPI: Found active playing device: {active_device_name_from_playback} (ID: {active_device_id_from_playback}). Using this device.")
+                self._remember_device(active_device_id_from_playback)
                 return active_device_id_from_playback
             elif active_device_id_from_playback:
                 logging.info(f"SpotifyAPI: Found current (possibly paused) device: {active_device_name_from_playback} (ID: {active_device_id_from_playback}). Using this device.")
+                self._remember_device(active_device_id_from_playback)
                 return active_device_id_from_playback
 
             logging.info("SpotifyAPI: No current device or not playing. Listing all available devices.")
@@ -127,6 +159,7 @@ class SpotifyApiMediaStrategy(MediaControlStrategy):
             else:
                 logging.info(f"SpotifyAPI: Target device {target_device_name} (ID: {target_device_id}) is already the current device.")
 
+            self._remember_device(target_device_id)
             return target_device_id
 
         except SpotifyException as e:
@@ -157,10 +190,16 @@ class SpotifyApiMediaStrategy(MediaControlStrategy):
             logging.info(f"SpotifyAPI: Attempting to set volume to {clamped_volume}% on device ID: {target_device_id}.")
             self._sp.volume(volume_percent=clamped_volume, device_id=target_device_id) # type: ignore
             logging.info(f"SpotifyAPI: Volume successfully set to {clamped_volume}% on device ID: {target_device_id}.")
+            self._rejected_device = None
+            if self._playback_state:
+                self._playback_state.update(volume=clamped_volume)
             return True
 
         except SpotifyException as e:
             logging.error(f"SpotifyAPI: SpotifyException setting volume: {e}. HTTP: {e.http_status}, Code: {e.code}, Reason: {e.reason}")
+            if e.http_status == 404 or "NO_ACTIVE_DEVICE" in str(e).upper():
+                self._remember_device(None) # The cached device is gone or inactive; look it up again next time
+                self._rejected_device = target_device_id
             if "authentication credentials" in str(e).lower() or "token expired" in str(e).lower():
                 logging.error("SpotifyAPI: Token may be invalid or expired. Please check credentials/token.")
             return False
@@ -175,8 +214,12 @@ class SpotifyApiMediaStrategy(MediaControlStrategy):
         assert self._sp is not None
 
         try:
-            playback = self._sp.current_playback()
-            if playback and playback.get('is_playing'):
+            # The shared state saves reading the playback before every toggle
+            is_playing = self._playback_state.is_playing if self._playback_state else None
+            if is_playing is None:
+                playback = self._sp.current_playback()
+                is_playing = bool(playback and playback.get('is_playing'))
+            if is_playing:
                 _ = self._sp.pause_playback()
                 logging.debug("SpotifyAPI: Paused playback.")
             else:
@@ -184,6 +227,8 @@ class SpotifyApiMediaStrategy(MediaControlStrategy):
                 # This also handles the case where playback is paused on an active device.
                 _ = self._sp.start_playback()
                 logging.debug("SpotifyAPI: Started/Resumed playback.")
+            if self._playback_state:
+                self._playback_state.update(is_playing=not is_playing)
             return True
         except SpotifyException as e:
             # Handle common issues like no active device
@@ -0,0 +1,73 @@
+# orthocontrol/midi/drain.py
+
+import asyncio
+import logging
+from typing import Any, Callable
+
+from .filter import CONTROL_CHANGE, MidiFilter
+
+MidiEvent = tuple[list[int], float]  # (message bytes, delta seconds since previous message) as rtmidi delivers it
+
+
+def collapse_batch(batch: list[MidiEvent]) -> list[MidiEvent]:
+    """Collapses a batch to the last value of each CC controller plus every other message, in order.
+
+    Only the last occurrence of each (status, controller) pair survives, at its original
+    position. Deltas of dropped messages are folded into the next surviving message so the
+    timeline (and any velocity estimate built on it) is preserved.
+    """
+    keep = [False] * len(batch)
+    seen_controllers: set[tuple[int, int]] = set()
+    for i in range(len(batch) - 1, -1, -1):
+        message = batch[i][0]
+        if message[0] & 0xF0 == CONTROL_CHANGE and len(message) >= 3:
+            key = (message[0], message[1])
+            if key in seen_controllers:
+                continue
+            seen_controllers.add(key)
+        keep[i] = True
+
+    collapsed: list[MidiEvent] = []
+    carried_delta = 0.0
+    for kept, (message, delta) in zip(keep, batch):
+        carried_delta += delta
+        if kept:
+            collapsed.append((message, carried_delta))
+            carried_delta = 0.0
+    return collapsed
+
+
+def drain_batch(midi_in: Any, midi_filter: MidiFilter | None = None) -> list[MidiEvent]:
+    """Pulls everything rtmidi has queued for the port, dropping what `midi_filter` rejects.
+
+    Deltas of rejected messages are carried into the next accepted one.
+    """
+    batch: list[MidiEvent] = []
+    carried_delta = 0.0
+    while (event := midi_in.get_message()) is not None:
+        if midi_filter is None or midi_filter.accepts(event[0]):
+            batch.append((event[0], event[1] + carried_delta) if carried_delta else event)
+            carried_delta = 0.0
+        else:
+            carried_delta += event[1]
+    return batch
+
+
+async def drain_midi_input(midi_in: Any, callback: Callable[..., None], tick: float, *callback_args: Any,
+                           midi_filter: MidiFilter | None = None, collapse_cc: bool = True) -> None:
+    """Polls `midi_in` every `tick` seconds instead of taking a Python callback per message.
+
+    Each drained batch is filtered, collapsed with `collapse_batch` (unless `collapse_cc` is
+    False, as for relative encoders where every message counts) and handed to
+    `callback(event, *callback_args)`, the same signature rtmidi uses for callbacks.
+    """
+    logging.info(f"MIDI drain mode: polling input every {tick * 1000:.0f}ms")
+    while True:
+        await asyncio.sleep(tick)
+        batch = drain_batch(midi_in, midi_filter)
+        if not batch:
+            continue
+        collapsed = collapse_batch(batch) if collapse_cc else batch
+        logging.debug(f"MIDI drain: {len(batch)} messages collapsed to {len(collapsed)}")
+        for event in collapsed:
+            callback(event, *callback_args)
@@ -0,0 +1,51 @@
+# orthocontrol/midi/encoder.py
+
+import logging
+
+# Turning speed is judged by the time between detents (rtmidi message deltas)
+SLOW_INTERVAL = 0.12  # At or above this, every detent is a fine step
+FAST_INTERVAL = 0.015  # At or below this, every detent gets the full acceleration
+MAX_MULTIPLIER = 6.0
+
+
+class RelativeEncoder:
+    """Turns relative encoder steps into an absolute volume, with speed-based acceleration.
+
+    Slow turns move `step` percent per detent for fine adjustment; faster turns scale the
+    step up linearly to `max_multiplier` times, so a quick spin covers the range in one
+    gesture. The value is kept as a float so fractional steps accumulate instead of
+    being rounded away, and it is clamped to 0-100.
+    """
+
+    def __init__(self, step: float = 1.0, max_multiplier: float = MAX_MULTIPLIER,
+                 slow_interval: float = SLOW_INTERVAL, fast_interval: float = FAST_INTERVAL):
+        self._step = step
+        self._max_multiplier = max_multiplier
+        self._slow_interval = slow_interval
+        self._fast_interval = fast_interval
+        self.value: float | None = None
+
+    def reset(self, value: float | None) -> None:
+        """Sets the position the next steps are applied to (e.g. the app volume on connect)."""
+        self.value = value
+
+    def multiplier(self, interval: float) -> float:
+        if interval >= self._slow_interval:
+            return 1.0
+        if interval <= self._fast_interval:
+            return self._max_multiplier
+        speed = (self._slow_interval - interval) / (self._slow_interval - self._fast_interval)
+        return 1.0 + (self._max_multiplier - 1.0) * speed
+
+    def feed(self, steps: int, interval: float, multiplier: float | None = None) -> float:
+        """Applies `steps` detents that arrived `interval` seconds after the previous message.
+
+        `multiplier`, if given, replaces the speed-based one (e.g. for fine adjustment).
+        """
+        if self.value is None:
+            self.value = 50.0
+            logging.warning("Relative encoder: starting position unknown, starting from 50%.")
+        if multiplier is None:
+            multiplier = self.multiplier(interval)
+        self.value = max(0.0, min(100.0, self.value + steps * self._step * multiplier))
+        return self.value
@@ -0,0 +1,89 @@
+# orthocontrol/midi/feedback.py
+
+import asyncio
+import bisect
+import logging
+from typing import Callable
+
+from .filter import CONTROL_CHANGE
+
+FEEDBACK_INTERVAL = 0.05  # At most one feedback message per this many seconds; the latest value wins
+
+
+class MidiFeedback:
+    """Sends the player's volume back to a controller as CC, so the knob's absolute position
+    follows volume changes made elsewhere.
+
+    `curve` is the mapping's lut (MIDI value → percent), searched to find the MIDI value
+    that maps closest to a volume. Values the knob already sits at (the last one it sent or
+    was sent) are dropped, and sends are spaced at least `min_interval` apart with a
+    loop.call_later for the trailing value. The CC is learned from the knob's own messages
+    unless the mapping names one.
+    """
+
+    def __init__(self, send: Callable[[list[int]], None], curve: tuple[float, ...],
+                 status: int | None = None, number: int | None = None, min_interval: float = FEEDBACK_INTERVAL):
+        self._send = send
+        self._curve = curve
+        self._ascending = curve[0] <= curve[-1]
+        self._min_interval = min_interval
+        self.status = status
+        self.number = number
+        self._position: int | None = None  # Where the knob is, as far as we know
+        self._pending: asyncio.TimerHandle | None = None
+        self._pending_value: int | None = None
+        self._last_send_time = float("-inf")
+        self.sent = 0
+        self.deduplicated = 0
+
+    def learn(self, message: list[int]) -> None:
+        """Records a message from the knob: its CC, and its position (which needs no feedback)."""
+        if message[0] & 0xF0 == CONTROL_CHANGE:
+            self.status, self.number = message[0], message[1]
+            self._position = message[2]
+
+    def midi_value(self, volume_percent: float) -> int:
+        """The MIDI value whose curve value is closest to `volume_percent`."""
+        curve = self._curve if self._ascending else self._curve[::-1]
+        index = bisect.bisect_left(curve, volume_percent)
+        if index == len(curve) or index > 0 and volume_percent - curve[index - 1] <= curve[index] - volume_percent:
+            index -= 1
+        return index if self._ascending else len(curve) - 1 - index
+
+    def update(self, volume_percent: float) -> bool:
+        """Moves the knob to `volume_percent`. Returns False if the CC is not known yet."""
+        if self.status is None or self.number is None:
+            return False
+        value = self.midi_value(volume_percent)
+        if value == (self._pending_value if self._pending else self._position):
+            self.deduplicated += 1
+            return True
+
+        loop = asyncio.get_running_loop()
+        self._pending_value = value
+        if self._pending is None:
+            delay = self._last_send_time + self._min_interval - loop.time()
+            if delay > 0:
+                self._pending = loop.call_later(delay, self._flush)
+            else:
+                self._flush()
+        return True
+
+    def cancel(self) -> None:
+        if self._pending:
+            self._pending.cancel()
+            self._pending = None
+
+    def log_counters(self) -> None:
+        logging.info(f"MIDI feedback: {self.sent} messages sent, {self.deduplicated} deduplicated")
+
+    def _flush(self) -> None:
+        self._pending = None
+        value = self._pending_value
+        if value is None or value == self._position:
+            return
+        self._send([self.status, self.number, value])
+        self._position = value
+        self._last_send_time = asyncio.get_running_loop().time()
+        self.sent += 1
+        logging.debug(f"MIDI feedback: CC {self.number} → {value}")
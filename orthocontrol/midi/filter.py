@@ -0,0 +1,47 @@
+# orthocontrol/midi/filter.py
+
+import logging
+from typing import Any
+
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+
+
+class MidiFilter:
+    """Precompiled accept/reject table for incoming MIDI messages.
+
+    `accept` maps a status byte (message type | channel) to the data1 values (controller or
+    note numbers) that should get through, or None for all of them. The dispatch table
+    derives it from the MIDI mappings. The filter compiles this
+    into a flat 256x128 table, so checking a message is a single index regardless of how many
+    rules there are. Clock, active sensing and sysex are dropped inside rtmidi via
+    `configure_port` and never reach Python at all.
+    """
+
+    __slots__ = ("_table", "delivered", "filtered")
+
+    def __init__(self, accept: dict[int, set[int] | None]):
+        table = bytearray(256 * 128)
+        for status, data1_values in accept.items():
+            for data1 in range(128) if data1_values is None else data1_values:
+                table[(status << 7) | data1] = 1
+        self._table = bytes(table)
+        self.delivered = 0
+        self.filtered = 0
+
+    def accepts(self, message: list[int]) -> bool:
+        """Returns True if `message` should be delivered, counting the decision either way."""
+        if self._table[(message[0] << 7) | (message[1] & 0x7F if len(message) > 1 else 0)]:
+            self.delivered += 1
+            return True
+        self.filtered += 1
+        return False
+
+    def log_counters(self) -> None:
+        logging.info(f"MIDI filter: {self.delivered} messages delivered, {self.filtered} filtered")
+
+
+def configure_port(midi_in: Any) -> None:
+    """Drops sysex, MIDI clock and active sensing inside rtmidi, before any Python callback."""
+    midi_in.ignore_types(sysex=True, timing=True, active_sense=True)
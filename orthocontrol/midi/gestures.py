@@ -0,0 +1,144 @@
+# orthocontrol/midi/gestures.py
+
+import asyncio
+import logging
+from typing import Callable
+
+LONG_PRESS = 0.5  # Held at least this long (without turning) is a long press
+MULTI_TAP_WINDOW = 0.3  # A press within this long after a release continues the tap sequence
+
+TAP = "tap"
+DOUBLE_TAP = "double_tap"
+TRIPLE_TAP = "triple_tap"
+LONG_PRESS_GESTURE = "long_press"
+TAP_GESTURES = (TAP, DOUBLE_TAP, TRIPLE_TAP)  # By number of taps in a sequence
+
+
+class ButtonGestures:
+    """Timing state machine that turns press/release events of one button into gestures.
+
+    Recognises tap, double-tap, triple-tap and long-press, and tells the knob handler when
+    the button is held (press+turn). Timers are loop.call_later handles, so deciding
+    gestures never needs a thread.
+
+    To keep single taps instant, a tap sequence is resolved as early as possible:
+    - if the gesture is in `undoable` (a toggle, which undoes itself when fired twice),
+      it fires speculatively and is fired again to cancel it when another tap follows. It
+      fires on press when no long press is bound (and is cancelled if the press turns into
+      a press+turn), otherwise on release, so a long press never toggles it first;
+    - otherwise, if no binding exists for one more tap, the gesture fires on release;
+    - otherwise it fires once MULTI_TAP_WINDOW has passed without another press.
+    """
+
+    def __init__(self, bindings: dict[str, Callable[[], None]], undoable: frozenset[str] = frozenset(),
+                 long_press: float = LONG_PRESS, multi_tap_window: float = MULTI_TAP_WINDOW):
+        self._bindings = bindings
+        self._undoable = undoable
+        self._long_press = long_press
+        self._multi_tap_window = multi_tap_window
+        self._max_taps = max((i + 1 for i, gesture in enumerate(TAP_GESTURES) if gesture in bindings), default=0)
+        self.pressed = False
+        self._taps = 0  # Taps in the current sequence
+        self._speculative: str | None = None  # Gesture already fired for the current sequence
+        self._fired_on_press: str | None = None  # Gesture fired by the current press, should it be a tap
+        self._held_gesture = False  # The current press became a long press or press+turn
+        self._long_press_timer: asyncio.TimerHandle | None = None
+        self._tap_timer: asyncio.TimerHandle | None = None
+
+    def press(self) -> None:
+        if self.pressed:
+            return
+        self.pressed = True
+        self._held_gesture = False
+        if self._tap_timer:
+            self._tap_timer.cancel()
+            self._tap_timer = None
+        if LONG_PRESS_GESTURE in self._bindings:
+            self._long_press_timer = asyncio.get_running_loop().call_later(self._long_press, self._on_long_press)
+        gesture = TAP_GESTURES[min(self._taps + 1, len(TAP_GESTURES)) - 1]
+        if gesture in self._undoable and LONG_PRESS_GESTURE not in self._bindings:
+            self._fire(gesture, "speculative")
+            self._fired_on_press = gesture
+
+    def release(self) -> None:
+        if not self.pressed:
+            return
+        self.pressed = False
+        self._cancel_long_press()
+        if self._held_gesture:
+            return
+
+        self._taps += 1
+        gesture = TAP_GESTURES[min(self._taps, len(TAP_GESTURES)) - 1]
+        if self._speculative:
+            self._fire(self._speculative, "cancel")  # Another tap followed: undo the speculative one
+            self._speculative = None
+        if self._fired_on_press == gesture:
+            # Already fired on press; it stands unless another tap follows
+            self._fired_on_press = None
+            if self._taps >= self._max_taps:
+                self._end_sequence()
+            else:
+                self._speculative = gesture
+                self._tap_timer = asyncio.get_running_loop().call_later(self._multi_tap_window, self._end_sequence)
+        elif self._taps >= self._max_taps:
+            self._finish(gesture)
+        elif gesture in self._undoable:
+            self._fire(gesture, "speculative")
+            self._speculative = gesture
+            self._tap_timer = asyncio.get_running_loop().call_later(self._multi_tap_window, self._end_sequence)
+        else:
+            self._tap_timer = asyncio.get_running_loop().call_later(
+                self._multi_tap_window, self._finish, gesture)
+
+    def turned(self) -> bool:
+        """Called by the knob handler on every turn; True if the button is held (press+turn)."""
+        if not self.pressed:
+            return False
+        if not self._held_gesture:
+            self._held_gesture = True
+            self._cancel_long_press()
+            self._undo_press()
+            self._resolve_pending()
+            logging.debug("Button gesture: press+turn")
+        return True
+
+    def _on_long_press(self) -> None:
+        self._long_press_timer = None
+        self._held_gesture = True
+        self._undo_press()
+        self._resolve_pending()
+        self._fire(LONG_PRESS_GESTURE)
+
+    def _undo_press(self) -> None:
+        """The current press is a hold, not a tap: cancels what it fired speculatively."""
+        if self._fired_on_press:
+            self._fire(self._fired_on_press, "cancel")
+            self._fired_on_press = None
+
+    def _resolve_pending(self) -> None:
+        """Ends a tap sequence that was interrupted by a hold: earlier taps stand as they were."""
+        if self._taps and not self._speculative:
+            self._fire(TAP_GESTURES[min(self._taps, len(TAP_GESTURES)) - 1])
+        self._end_sequence()
+
+    def _finish(self, gesture: str) -> None:
+        self._fire(gesture)
+        self._end_sequence()
+
+    def _end_sequence(self) -> None:
+        if self._tap_timer:
+            self._tap_timer.cancel()
+        self._tap_timer = None
+        self._taps = 0
+        self._speculative = None
+
+    def _cancel_long_press(self) -> None:
+        if self._long_press_timer:
+            self._long_press_timer.cancel()
+            self._long_press_timer = None
+
+    def _fire(self, gesture: str, how: str = "") -> None:
+        if (action := self._bindings.get(gesture)) is not None:
+            logging.debug(f"Button gesture: {gesture}{f' ({how})' if how else ''}")
+            action()
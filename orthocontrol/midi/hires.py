@@ -0,0 +1,103 @@
+# orthocontrol/midi/hires.py
+
+from typing import Callable
+
+# NRPN controller numbers
+NRPN_PARAMETER_MSB = 99
+NRPN_PARAMETER_LSB = 98
+DATA_ENTRY_MSB = 6
+DATA_ENTRY_LSB = 38
+
+HIGH_RESOLUTION_STEPS = 1 << 14
+
+ValueHandler = Callable[[float, float], None]  # (curve value, seconds since the previous message)
+
+
+class _PairAssembler:
+    """Assembles 14-bit values from MSB/LSB data bytes.
+
+    A value is only emitted once its LSB arrives, so a pair never produces two updates.
+    Controllers that only send an LSB when the coarse part is unchanged are handled by
+    reusing the last MSB. If two MSBs arrive without an LSB in between, the sender does not
+    use LSBs at all: the held MSB is emitted, and MSBs are emitted on their own from then
+    on, with the 7-bit value repeated in the low bits so 127 reaches the top of the range.
+    Deltas of held messages are carried into the emitted one.
+    """
+
+    __slots__ = ("_msb", "_msb_pending", "_msb_only", "_held_delta")
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self) -> None:
+        self._msb: int | None = None
+        self._msb_pending = False
+        self._msb_only = False
+        self._held_delta = 0.0
+
+    def msb(self, value: int, delta: float) -> None:
+        if self._msb_pending and not self._msb_only:
+            self._msb_only = True
+            self._emit((self._msb << 7) | self._msb, self._held_delta)
+            self._held_delta = 0.0
+        self._msb = value
+        if self._msb_only:
+            self._emit((value << 7) | value, self._held_delta + delta)
+            self._held_delta = 0.0
+        else:
+            self._msb_pending = True
+            self._held_delta += delta
+
+    def lsb(self, value: int, delta: float) -> None:
+        if self._msb is None:
+            self._held_delta += delta
+            return
+        self._msb_pending = False
+        self._msb_only = False
+        self._emit((self._msb << 7) | value, self._held_delta + delta)
+        self._held_delta = 0.0
+
+    def _emit(self, value: int, delta: float) -> None:
+        raise NotImplementedError
+
+
+class HighResolutionCC(_PairAssembler):
+    """14-bit CC: controller n (0-31) carries the MSB and controller n + 32 the LSB."""
+
+    __slots__ = ("_handler", "_lut")
+
+    def __init__(self, handler: ValueHandler, lut: tuple[float, ...]):
+        super().__init__()
+        self._handler = handler
+        self._lut = lut
+
+    def _emit(self, value: int, delta: float) -> None:
+        self._handler(self._lut[value], delta)
+
+
+class NrpnAssembler(_PairAssembler):
+    """NRPN on one channel: CC 99/98 select a parameter, CC 6/38 carry its 14-bit value.
+
+    `targets` maps parameter numbers to (handler, lut); values for other parameters are
+    dropped.
+    """
+
+    __slots__ = ("_targets", "_parameter_msb", "_parameter")
+
+    def __init__(self, targets: dict[int, tuple[ValueHandler, tuple[float, ...]]]):
+        super().__init__()
+        self._targets = targets
+        self._parameter_msb = 0
+        self._parameter: int | None = None
+
+    def parameter_msb(self, value: int, _delta: float) -> None:
+        self._parameter_msb = value
+
+    def parameter_lsb(self, value: int, _delta: float) -> None:
+        self._parameter = (self._parameter_msb << 7) | value
+        self._reset()
+
+    def _emit(self, value: int, delta: float) -> None:
+        if (target := self._targets.get(self._parameter)) is not None:
+            handler, lut = target
+            handler(lut[value], delta)
@@ -0,0 +1,211 @@
+# orthocontrol/midi/mapping.py
+
+import json
+from dataclasses import dataclass
+from typing import Callable
+
+from .filter import CONTROL_CHANGE, NOTE_OFF, NOTE_ON, MidiFilter
+from .hires import (DATA_ENTRY_LSB, DATA_ENTRY_MSB, HIGH_RESOLUTION_STEPS, NRPN_PARAMETER_LSB, NRPN_PARAMETER_MSB,
+                    HighResolutionCC, NrpnAssembler)
+
+MESSAGE_TYPES = {
+    "cc": CONTROL_CHANGE,
+    "cc14": CONTROL_CHANGE,  # 14-bit CC: `number` is the MSB controller (0-31), number + 32 the LSB
+    "nrpn": CONTROL_CHANGE,  # `number` is the NRPN parameter (0-16383)
+    "note_on": NOTE_ON,
+    "note_off": NOTE_OFF,
+    "note": NOTE_ON,  # Note On and Note Off: the value is the velocity, 0 on release
+}
+HIGH_RESOLUTION_MESSAGES = ("cc14", "nrpn")
+
+# Value curves, evaluated once per MIDI value (0-127) when the table is compiled
+CURVES: dict[str, Callable[[int], int]] = {
+    "linear": lambda value: int((value / 127.0) * 100),  # 0-127 → 0-100%
+    "audio": lambda value: round(((value / 127.0) ** 2) * 100),  # Finer steps at quiet levels
+    "raw": lambda value: value,  # Pass the MIDI value through
+    # Relative encoders: the value is a signed number of detents
+    "relative": lambda value: value - 128 if value >= 64 else value,  # Two's complement: 1 = +1, 127 = -1
+    "relative_offset": lambda value: value - 64,  # Offset binary: 65 = +1, 63 = -1
+    "relative_signed": lambda value: -(value - 64) if value >= 64 else value,  # Sign bit: 1 = +1, 65 = -1
+}
+
+RELEASE_LUT = (0,) * 128  # Note Off values for "note" mappings
+
+# The same curves for 14-bit values, without rounding so the full resolution carries through
+HIGH_RESOLUTION_CURVES: dict[str, Callable[[float], float]] = {
+    "linear": lambda fraction: fraction * 100,
+    "audio": lambda fraction: (fraction ** 2) * 100,
+    "raw": lambda fraction: fraction * (HIGH_RESOLUTION_STEPS - 1),
+}
+
+ActionHandler = Callable[[float, float], None]  # (curve value, seconds since the previous message)
+
+
+@dataclass(frozen=True)
+class MidiMapping:
+    """Maps one kind of MIDI message to an action.
+
+    `number` is the controller (for "cc"), MSB controller (for "cc14"), NRPN parameter (for
+    "nrpn") or note number; None matches all of them, except for the 14-bit types where a
+    number is required.
+    """
+    message: str
+    action: str
+    channel: int = 1
+    number: int | None = None
+    curve: str = "linear"
+
+    @classmethod
+    def from_dict(cls, config: dict) -> "MidiMapping":
+        mapping = cls(
+            message=config["message"],
+            action=config["action"],
+            channel=parse_channel(config.get("channel", 1)),
+            number=None if config.get("number") is None else int(config["number"]),
+            curve=config.get("curve", "linear"),
+        )
+        if mapping.message not in MESSAGE_TYPES:
+            raise ValueError(f"Unknown MIDI message type '{mapping.message}' (expected one of {', '.join(MESSAGE_TYPES)})")
+        curves = HIGH_RESOLUTION_CURVES if mapping.is_high_resolution else CURVES
+        if mapping.curve not in curves:
+            raise ValueError(f"Unknown curve '{mapping.curve}' for {mapping.message} (expected one of {', '.join(curves)})")
+        highest_number = {"cc14": 31, "nrpn": HIGH_RESOLUTION_STEPS - 1}.get(mapping.message, 127)
+        if mapping.is_high_resolution and mapping.number is None:
+            raise ValueError(f"A {mapping.message} mapping needs a number")
+        if mapping.number is not None and not 0 <= mapping.number <= highest_number:
+            raise ValueError(f"MIDI {mapping.message} number {mapping.number} out of range (0-{highest_number})")
+        return mapping
+
+    @property
+    def status(self) -> int:
+        return MESSAGE_TYPES[self.message] | (self.channel - 1)
+
+    @property
+    def is_relative(self) -> bool:
+        return self.curve.startswith("relative")
+
+    @property
+    def is_high_resolution(self) -> bool:
+        return self.message in HIGH_RESOLUTION_MESSAGES
+
+
+def parse_channel(value: int | str) -> int:
+    """A MIDI channel as users number it, 1-16."""
+    channel = int(value)
+    if not 1 <= channel <= 16:
+        raise ValueError(f"MIDI channel {channel} out of range (1-16)")
+    return channel
+
+
+def default_mappings(channel: int = 1, relative: bool = False) -> list[MidiMapping]:
+    """Built-in behaviour: any CC sets the volume, any note is the button (tap toggles play/pause).
+
+    With `relative` (the remote was put in relative mode with --midi-sysex) the CC values
+    are decoded as two's complement detents instead of absolute positions.
+    """
+    return [
+        MidiMapping(message="cc", action="volume_relative", channel=channel, curve="relative") if relative
+        else MidiMapping(message="cc", action="volume", channel=channel),
+        MidiMapping(message="note", action="button", channel=channel, curve="raw"),
+    ]
+
+
+def load_mappings(path: str) -> list[MidiMapping]:
+    """Loads a JSON list of mapping objects (see README)."""
+    with open(path) as f:
+        config = json.load(f)
+    if not isinstance(config, list):
+        raise ValueError("MIDI mapping file must contain a JSON list of mappings")
+    return [MidiMapping.from_dict(entry) for entry in config]
+
+
+class DispatchTable:
+    """Mappings compiled into a flat 256x128 array indexed by (status << 7) | data1.
+
+    Each slot holds None or (handler, lut), where lut is the mapping's curve precomputed
+    for all 128 MIDI values. Handling a message is then one index, one tuple unpack and
+    one more index, with no branching on message type and no float math.
+    Later mappings take precedence over earlier ones for the same slot.
+
+    14-bit mappings put a small assembler in front of the action: the slots for their MSB
+    and LSB controllers (or the NRPN controllers) feed a `HighResolutionCC` or per-channel
+    `NrpnAssembler`, which calls the action with a 16384-entry lut once a pair is complete.
+    """
+
+    __slots__ = ("entries", "can_collapse_cc", "_accept")
+
+    def __init__(self, mappings: list[MidiMapping], handlers: dict[str, ActionHandler]):
+        self.entries: list[tuple[ActionHandler, tuple[float, ...]] | None] = [None] * (256 * 128)
+        self._accept: dict[int, set[int] | None] = {}
+        # Collapsing to the last value per controller is only safe for absolute 7-bit values:
+        # a batch ending between a 14-bit MSB and its LSB would pair the new MSB with an old LSB
+        self.can_collapse_cc = not any(mapping.is_relative or mapping.is_high_resolution for mapping in mappings)
+        luts = {name: tuple(curve(value) for value in range(128)) for name, curve in CURVES.items()}
+        high_resolution_luts: dict[str, tuple[float, ...]] = {}
+        nrpn_targets: dict[int, dict[int, tuple[ActionHandler, tuple[float, ...]]]] = {}
+
+        for mapping in mappings:
+            if mapping.action not in handlers:
+                raise ValueError(f"Unknown action '{mapping.action}' (expected one of {', '.join(handlers)})")
+            handler = handlers[mapping.action]
+
+            if mapping.is_high_resolution:
+                if mapping.curve not in high_resolution_luts:
+                    curve = HIGH_RESOLUTION_CURVES[mapping.curve]
+                    high_resolution_luts[mapping.curve] = tuple(
+                        curve(value / (HIGH_RESOLUTION_STEPS - 1)) for value in range(HIGH_RESOLUTION_STEPS))
+                lut = high_resolution_luts[mapping.curve]
+                assert mapping.number is not None
+                if mapping.message == "cc14":
+                    assembler = HighResolutionCC(handler, lut)
+                    self._map(mapping.status, mapping.number, assembler.msb, luts["raw"])
+                    self._map(mapping.status, mapping.number + 32, assembler.lsb, luts["raw"])
+                else:
+                    nrpn_targets.setdefault(mapping.status, {})[mapping.number] = (handler, lut)
+                continue
+
+            entries = [(mapping.status, (handler, luts[mapping.curve]))]
+            if mapping.message == "note":
+                # Note Off is a release whatever its velocity says
+                entries.append((NOTE_OFF | (mapping.channel - 1), (handler, RELEASE_LUT)))
+            for status, entry in entries:
+                numbers = range(128) if mapping.number is None else (mapping.number,)
+                for number in numbers:
+                    self.entries[(status << 7) | number] = entry
+                if mapping.number is None:
+                    self._accept[status] = None
+                else:
+                    self._accept_number(status, mapping.number)
+
+        for status, targets in nrpn_targets.items():
+            nrpn = NrpnAssembler(targets)
+            self._map(status, NRPN_PARAMETER_MSB, nrpn.parameter_msb, luts["raw"])
+            self._map(status, NRPN_PARAMETER_LSB, nrpn.parameter_lsb, luts["raw"])
+            self._map(status, DATA_ENTRY_MSB, nrpn.msb, luts["raw"])
+            self._map(status, DATA_ENTRY_LSB, nrpn.lsb, luts["raw"])
+
+    def _map(self, status: int, number: int, handler: ActionHandler, lut: tuple[float, ...]) -> None:
+        self.entries[(status << 7) | number] = (handler, lut)
+        self._accept_number(status, number)
+
+    def _accept_number(self, status: int, number: int) -> None:
+        if status not in self._accept:
+            self._accept[status] = {number}
+        elif (accepted := self._accept[status]) is not None:
+            accepted.add(number)
+
+    def dispatch(self, message: list[int], delta: float) -> bool:
+        """Runs the action mapped to `message`, received `delta` seconds after the previous one.
+
+        Returns False if nothing is mapped.
+        """
+        entry = self.entries[(message[0] << 7) | message[1]]
+        if entry is None:
+            return False
+        handler, lut = entry
+        handler(lut[message[2]], delta)
+        return True
+
+    def midi_filter(self) -> MidiFilter:
+        """A MidiFilter that lets through exactly the messages this table has mappings for."""
+        return MidiFilter(self._accept)
@@ -0,0 +1,76 @@
+# orthocontrol/midi/motion.py
+
+import math
+
+SMOOTHING_TIME = 0.05  # EMA time constant (seconds) for velocity and acceleration
+GESTURE_GAP = 0.3  # A pause longer than this starts a new gesture from rest
+MIN_DELTA = 0.001  # rtmidi can report 0 for messages in the same packet
+STILL_SPEED = 5.0  # %/s; slower than this counts as not moving
+TREND_HORIZON = 0.5  # Seconds within which the knob must be predicted to stop (or double its speed)
+
+# Multipliers for the sync interval, see MotionTracker.pace_factor
+ACCELERATING_PACE = 2.0
+MOVING_PACE = 1.5
+DECELERATING_PACE = 0.8
+
+STEADY = "steady"
+MOVING = "moving"
+ACCELERATING = "accelerating"
+DECELERATING = "decelerating"
+
+
+class MotionTracker:
+    """Running velocity and acceleration estimate for one controller, in constant memory.
+
+    Fed with each new position and the rtmidi delta since the previous message, it keeps
+    time-weighted exponential moving averages of velocity (%/s) and of the change in speed
+    (%/s²). A pause longer than GESTURE_GAP resets the estimate, so every gesture starts
+    from rest.
+    """
+
+    __slots__ = ("velocity", "acceleration", "_position")
+
+    def __init__(self):
+        self.velocity = 0.0
+        self.acceleration = 0.0
+        self._position: float | None = None
+
+    def update(self, position: float, delta: float) -> None:
+        if self._position is None or delta > GESTURE_GAP:
+            self._position = position
+            self.velocity = 0.0
+            self.acceleration = 0.0
+            return
+
+        delta = max(delta, MIN_DELTA)
+        weight = 1.0 - math.exp(-delta / SMOOTHING_TIME)
+        previous_speed = abs(self.velocity)
+        self.velocity += weight * ((position - self._position) / delta - self.velocity)
+        self.acceleration += weight * ((abs(self.velocity) - previous_speed) / delta - self.acceleration)
+        self._position = position
+
+    @property
+    def phase(self) -> str:
+        """Judged relative to the current speed: decelerating if the knob would stop within
+        TREND_HORIZON at this rate, accelerating if its speed would double within it."""
+        speed = abs(self.velocity)
+        if self.acceleration < 0 and speed < -self.acceleration * TREND_HORIZON:
+            return DECELERATING
+        if speed < STILL_SPEED:
+            return STEADY
+        if self.acceleration * TREND_HORIZON > speed:
+            return ACCELERATING
+        return MOVING
+
+    def pace_factor(self) -> float:
+        """Multiplier for the sync interval: hold back while the knob speeds up or spins
+        (intermediate values are about to be stale), sync early while it slows down (it is
+        about to stop, and that final position is what matters)."""
+        phase = self.phase
+        if phase == ACCELERATING:
+            return ACCELERATING_PACE
+        if phase == MOVING:
+            return MOVING_PACE
+        if phase == DECELERATING:
+            return DECELERATING_PACE
+        return 1.0
@@ -0,0 +1,223 @@
+# orthocontrol/midi/ports.py
+
+import asyncio
+import logging
+import random
+import re
+from collections import deque
+from typing import Any, Callable
+
+# ALSA lists ports as "<client>:<port> <client id>:<port id>", and the ids change with
+# every connection (and differ between a device's input and output side)
+ALSA_PORT_IDS = re.compile(r" \d+:\d+$")
+
+
+def find_port(ports: list[str], name: str) -> int | None:
+    """Index of the port called `name`, or None.
+
+    An exact match wins; otherwise the ALSA client/port ids are ignored on both sides, so
+    the same --midi-name finds a port on macOS and Linux.
+    """
+    if name in ports:
+        return ports.index(name)
+    bare_name = ALSA_PORT_IDS.sub("", name)
+    for index, port in enumerate(ports):
+        if ALSA_PORT_IDS.sub("", port) == bare_name:
+            return index
+    return None
+
+
+BACKOFF_INITIAL = 1.0  # Seconds before the first reconnect attempt
+BACKOFF_MAX = 30.0  # Reconnect attempts back off to at most this interval
+ENUMERATION_TTL = 0.5  # Port lists younger than this are reused instead of asking the MIDI server again
+RESTART_BUDGET = 3  # MIDI server restarts allowed per RESTART_WINDOW
+RESTART_WINDOW = 600.0
+RECONNECT_HISTORY = 20  # Time-to-reconnect samples kept for the metrics log
+
+
+class PortDirectory:
+    """Input and output port lists shared by every `PortSupervisor` in the process.
+
+    Each list is enumerated at most once per `ttl`, whichever supervisor asks. Connected
+    supervisors check on a common grid (see `PortSupervisor.watch`), so however many ports
+    are open, one enumeration per check serves them all; reconnect attempts that line up
+    share one too. Losing a port or restarting the MIDI server invalidates the lists.
+    """
+
+    def __init__(self, midi_in: Any, midi_out: Any, ttl: float = ENUMERATION_TTL):
+        self._midi = {"in": midi_in, "out": midi_out}
+        self._ttl = ttl
+        self._cache: dict[str, tuple[float, list[str]]] = {}
+        self.lookups = 0
+        self.enumerations = 0
+
+    def ports(self, side: str) -> list[str]:
+        """Cached port list for "in" or "out"."""
+        now = asyncio.get_running_loop().time()
+        self.lookups += 1
+        cached = self._cache.get(side)
+        if cached is None or now - cached[0] >= self._ttl:
+            cached = (now, self._midi[side].get_ports())
+            self._cache[side] = cached
+            self.enumerations += 1
+        return cached[1]
+
+    def invalidate(self) -> None:
+        self._cache.clear()
+
+
+class MidiServerRestarts:
+    """MIDI server restarts for the whole process.
+
+    A restart drops every port, not just the one that is missing, so all supervisors draw
+    on one budget of `budget` restarts per `window`, and none restarts while another port
+    is connected.
+    """
+
+    def __init__(self, restart: Callable[[], None], budget: int = RESTART_BUDGET, window: float = RESTART_WINDOW):
+        self._restart = restart
+        self._budget = budget
+        self._window = window
+        self._times: deque[float] = deque()
+        self._connected: set[str] = set()
+        self.restarts = 0
+
+    def connected(self, port_name: str) -> None:
+        self._connected.add(port_name)
+
+    def disconnected(self, port_name: str) -> None:
+        self._connected.discard(port_name)
+
+    def restart(self, now: float, port_name: str) -> bool:
+        """Restarts the MIDI server for `port_name` if allowed. Returns True if it did."""
+        if self._connected - {port_name}:
+            logging.debug(f"Not restarting the MIDI server for '{port_name}': "
+                          f"{', '.join(sorted(self._connected))} connected")
+            return False
+        while self._times and now - self._times[0] >= self._window:
+            self._times.popleft()
+        if len(self._times) >= self._budget:
+            logging.debug("MIDI server restart budget used up, not restarting")
+            return False
+        logging.info(f"Attempting MIDIRestart due to port '{port_name}' unavailability.")
+        self._restart()
+        self._times.append(now)
+        self.restarts += 1
+        if len(self._times) >= self._budget:
+            logging.info(f"MIDI server restart budget ({self._budget} per {self._window:.0f}s) used up; "
+                         f"waiting for '{port_name}' without restarting for up to "
+                         f"{self._times[0] + self._window - now:.0f}s")
+        return True
+
+
+class PortSupervisor:
+    """Finds, watches and reconnects one MIDI port, without hammering the MIDI server.
+
+    While disconnected, attempts are spaced with exponential backoff (from
+    `backoff_initial` up to `backoff_max`) and full jitter, so the attempts of several
+    processes (or a sleeping remote waking up) do not line up. Failed attempts may restart
+    the MIDI server through `restarts`, which is shared by all supervisors and enforces
+    one budget for them; once it refuses, the supervisor keeps polling at the backoff rate.
+    While connected, only the input list is checked, every `check_interval` seconds.
+
+    Port lists come from `directory`, shared with the other supervisors. All timing uses
+    the running loop's clock.
+    """
+
+    def __init__(self, directory: PortDirectory, port_name: str, check_interval: float = BACKOFF_INITIAL,
+                 restarts: MidiServerRestarts | None = None, backoff_initial: float = BACKOFF_INITIAL,
+                 backoff_max: float = BACKOFF_MAX, rng: random.Random | None = None):
+        self._directory = directory
+        self.port_name = port_name
+        self._check_interval = check_interval
+        self._restarts = restarts
+        self._backoff_initial = backoff_initial
+        self._backoff_max = backoff_max
+        self._rng = rng or random.Random()
+        self._disconnected_at: float | None = None
+        self._retry_pending = False
+        # Metrics
+        self.attempts = 0  # Reconnect attempts since the port was last seen
+        self.restarts = 0  # MIDI server restarts this supervisor made
+        self.reconnects = 0
+        self.reconnect_times: deque[float] = deque(maxlen=RECONNECT_HISTORY)
+
+    async def wait_for_port(self) -> tuple[int, int]:
+        """Returns (input index, output index) once the port is present on both sides."""
+        loop = asyncio.get_running_loop()
+        if self._disconnected_at is None:
+            self._disconnected_at = loop.time()
+        if self._retry_pending:
+            self._retry_pending = False
+            await self._back_off(loop.time())
+        while True:
+            ports_in, ports_out = self._directory.ports("in"), self._directory.ports("out")
+            port_in_index = find_port(ports_in, self.port_name)
+            port_out_index = find_port(ports_out, self.port_name)
+            if port_in_index is not None and port_out_index is not None:
+                return port_in_index, port_out_index
+
+            if self.attempts == 0:
+                logging.info(f"Port unavailable: '{self.port_name}'")
+                logging.info(f"Available MIDI input ports: {ports_in}")
+                logging.info(f"Available MIDI output ports: {ports_out}")
+            else:
+                logging.debug(f"Port unavailable: '{self.port_name}' (attempt {self.attempts})")
+            await self._back_off(loop.time())
+
+    def backoff_delay(self) -> float:
+        """Full-jitter exponential backoff for the current attempt."""
+        ceiling = min(self._backoff_max, self._backoff_initial * 2 ** min(self.attempts, 32))
+        return self._rng.uniform(self._backoff_initial / 2, max(self._backoff_initial / 2, ceiling))
+
+    def connected(self) -> None:
+        """Records a successful open; call once the port is in use."""
+        now = asyncio.get_running_loop().time()
+        if self._disconnected_at is not None:
+            elapsed = now - self._disconnected_at
+            self.reconnect_times.append(elapsed)
+            self.reconnects += 1
+            logging.info(f"Connected to '{self.port_name}' after {elapsed:.1f}s "
+                         f"({self.attempts} retries, {self.restarts} MIDI server restarts so far)")
+        self._disconnected_at = None
+        self.attempts = 0
+        if self._restarts:
+            self._restarts.connected(self.port_name)
+
+    def disconnected(self, failed: bool = False) -> None:
+        """Records that the port was lost, or with `failed` that opening it failed (the next
+        attempt then waits for the backoff instead of trying again straight away)."""
+        if self._disconnected_at is None:
+            self._disconnected_at = asyncio.get_running_loop().time()
+        self._retry_pending = failed
+        self._directory.invalidate()
+        if self._restarts:
+            self._restarts.disconnected(self.port_name)
+
+    async def watch(self) -> None:
+        """Returns once the port has gone from the input list."""
+        loop = asyncio.get_running_loop()
+        while True:
+            # On a grid shared by all supervisors, so their checks share one enumeration
+            await asyncio.sleep(self._check_interval - loop.time() % self._check_interval)
+            if find_port(self._directory.ports("in"), self.port_name) is None:
+                logging.info(f"Port '{self.port_name}' disappeared")
+                return
+
+    def log_metrics(self) -> None:
+        if self.reconnect_times:
+            times = sorted(self.reconnect_times)
+            logging.info(f"MIDI port '{self.port_name}': {self.reconnects} connects, time to (re)connect "
+                         f"median {times[len(times) // 2]:.1f}s, max {times[-1]:.1f}s; "
+                         f"{self.restarts} MIDI server restarts; {self._directory.enumerations} port enumerations "
+                         f"for {self._directory.lookups} lookups across all ports")
+
+    async def _back_off(self, now: float) -> None:
+        self._maybe_restart(now)
+        await asyncio.sleep(self.backoff_delay())
+        self.attempts += 1
+
+    def _maybe_restart(self, now: float) -> None:
+        if self._restarts and self._restarts.restart(now, self.port_name):
+            self.restarts += 1
+            self._directory.invalidate()
@@ -0,0 +1,120 @@
+# orthocontrol/midi/session.py
+
+import asyncio
+import logging
+import mmap
+import struct
+from typing import Any, Callable, Iterator
+
+from .drain import MidiEvent
+from .filter import MidiFilter
+
+# File layout: an 8-byte magic header, then one fixed-width record per message, so the
+# n-th message sits at HEADER + n * RECORD.size and a log can be memory-mapped and indexed
+MAGIC = b"OCMIDI\x00\x01"
+RECORD = struct.Struct("<dB3s")  # delta seconds (float64), message length, message bytes (zero padded)
+MAX_MESSAGE_LENGTH = 3  # Channel messages only; sysex and clock are never recorded
+
+REPLAY_YIELD_EVERY = 64  # At max speed, let the loop run other tasks (the sync worker) this often
+
+
+class SessionRecorder:
+    """Appends the (message, delta) events `midi_callback` receives to a session log.
+
+    Writes go through a buffered file, so recording costs one struct pack per message on
+    the loop. Messages longer than three bytes are skipped, with their delta carried into
+    the next recorded one.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+        self._file.write(MAGIC)
+        self._carried_delta = 0.0
+        self.recorded = 0
+
+    def record(self, event: MidiEvent) -> None:
+        message, delta = event
+        if len(message) > MAX_MESSAGE_LENGTH:
+            self._carried_delta += delta
+            return
+        self._file.write(RECORD.pack(delta + self._carried_delta, len(message), bytes(message)))
+        self._carried_delta = 0.0
+        self.recorded += 1
+
+    def close(self) -> None:
+        self._file.close()
+        logging.info(f"MIDI session recorder: {self.recorded} messages written to {self._file.name}")
+
+    def __enter__(self) -> "SessionRecorder":
+        return self
+
+    def __exit__(self, *_exc_info: Any) -> None:
+        self.close()
+
+
+class SessionLog:
+    """Read-only, memory-mapped view of a session log; indexable and iterable as MidiEvents."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a MIDI session log")
+        self._count = (len(self._map) - len(MAGIC)) // RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> MidiEvent:
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        delta, length, data = RECORD.unpack_from(self._map, len(MAGIC) + index * RECORD.size)
+        return list(data[:length]), delta
+
+    def __iter__(self) -> Iterator[MidiEvent]:
+        end = len(MAGIC) + self._count * RECORD.size
+        for delta, length, data in RECORD.iter_unpack(memoryview(self._map)[len(MAGIC):end]):
+            yield list(data[:length]), delta
+
+    def duration(self) -> float:
+        return sum(event[1] for event in self)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "SessionLog":
+        return self
+
+    def __exit__(self, *_exc_info: Any) -> None:
+        self.close()
+
+
+async def replay_session(events: SessionLog | list[MidiEvent], callback: Callable[..., None], *callback_args: Any,
+                         speed: float = 1.0, midi_filter: MidiFilter | None = None) -> int:
+    """Feeds recorded events to `callback(event, *callback_args)`, as rtmidi would have.
+
+    `speed` scales the recorded timing (2.0 replays twice as fast); 0 replays as fast as
+    possible. Timing is kept against the loop clock, so sleep overshoot does not add up
+    over a long session. Events `midi_filter` rejects are dropped, with their delta carried
+    into the next accepted one. Returns the number of events delivered.
+    """
+    loop = asyncio.get_running_loop()
+    started = due = loop.time()
+    delivered = 0
+    carried_delta = 0.0
+    for message, delta in events:
+        if midi_filter is not None and not midi_filter.accepts(message):
+            carried_delta += delta
+            continue
+        if speed > 0:
+            due += (delta + carried_delta) / speed
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+        elif delivered % REPLAY_YIELD_EVERY == 0:
+            await asyncio.sleep(0)
+        callback((message, delta + carried_delta), *callback_args)
+        carried_delta = 0.0
+        delivered += 1
+    logging.info(f"MIDI replay: {delivered} messages in {loop.time() - started:.2f}s")
+    return delivered
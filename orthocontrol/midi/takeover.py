@@ -0,0 +1,120 @@
+# orthocontrol/midi/takeover.py
+
+import logging
+import time
+from dataclasses import dataclass
+
+PICKUP = "pickup"  # Ignore the knob until it passes the current volume
+SCALE = "scale"  # Move the volume at once, scaled so knob and volume meet at the end of the range
+JUMP = "jump"  # Take the knob position as the volume straight away
+MODES = (PICKUP, SCALE, JUMP)
+
+DEFAULT_TOLERANCE = 3.0  # Percent; a knob this close to the volume has picked it up
+DEFAULT_APP = "default"  # Settings key used for apps without their own entry
+
+
+@dataclass(frozen=True)
+class TakeoverSettings:
+    mode: str = PICKUP
+    tolerance: float = DEFAULT_TOLERANCE
+
+
+def parse_takeover_settings(spec: str) -> dict[str, TakeoverSettings]:
+    """Parses `MODE[:TOLERANCE]`, or a comma-separated list of `APP=MODE[:TOLERANCE]` where
+    the app `default` applies to apps without an entry (e.g. "Spotify=scale,Music=pickup:5")."""
+    settings = {DEFAULT_APP: TakeoverSettings()}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        app, _, value = item.rpartition("=")
+        mode, _, tolerance = value.partition(":")
+        if mode not in MODES:
+            raise ValueError(f"Unknown takeover mode '{mode}' (expected one of {', '.join(MODES)})")
+        settings[app or DEFAULT_APP] = TakeoverSettings(mode, float(tolerance) if tolerance else DEFAULT_TOLERANCE)
+    return settings
+
+
+class SoftTakeover:
+    """Decides when an absolute knob takes control of a volume it does not match.
+
+    After `reset` (a new connection, or the volume changed elsewhere) the knob and the
+    volume disagree. `feed` turns each knob position into the volume to set, or None while
+    the knob is not in control yet:
+    - pickup: nothing happens until the knob comes within `tolerance` of the volume;
+    - scale: every movement changes the volume, scaled by the room left in the direction
+      of travel, so the volume reaches 0% or 100% together with the knob and converges
+      on it; control is engaged once they are within `tolerance`;
+    - jump: the knob position applies at once.
+
+    Time from reset to control, and the messages ignored meanwhile, are kept as metrics.
+    """
+
+    def __init__(self, settings: TakeoverSettings = TakeoverSettings()):
+        self.settings = settings
+        self.engaged = False
+        self.volume: float | None = None  # Volume the knob has to take over
+        self._remote: float | None = None  # Previous knob position, for scaling
+        self._reset_time = time.monotonic()
+        self._ignored = 0
+        self.control_times: list[float] = []
+
+    def reset(self, volume: float | None, settings: TakeoverSettings | None = None) -> None:
+        if settings is not None:
+            self.settings = settings
+        self.engaged = False
+        self.volume = volume
+        self._remote = None
+        self._reset_time = time.monotonic()
+        self._ignored = 0
+
+    def engage(self) -> None:
+        self.engaged = True
+        self._remote = None
+
+    def feed(self, remote: float) -> float | None:
+        if self.engaged:
+            return remote
+        mode, tolerance = self.settings.mode, self.settings.tolerance
+        if self.volume is None:
+            # No volume to match, latch immediately
+            return self._take_control(remote, "No initial app volume. Remote latched immediately")
+        if mode == JUMP:
+            return self._take_control(remote, f"Remote jumped from {self.volume:.4g}%")
+        if abs(remote - self.volume) <= tolerance:
+            return self._take_control(remote, f"Remote latched (app volume was {self.volume:.4g}%)")
+        if mode == SCALE:
+            return self._scale(remote)
+
+        self._ignored += 1
+        logging.debug(
+            f"Waiting for latch: Remote at {remote:.4g}%, App at {self.volume:.4g}%. "
+            f"Difference {abs(remote - self.volume):.4g}% > {tolerance:g}%"
+        )
+        return None
+
+    def _scale(self, remote: float) -> float:
+        previous, volume = self._remote, self.volume
+        self._remote = remote
+        if previous is None or remote == previous:
+            return volume
+        if remote > previous:
+            volume += (remote - previous) * (100.0 - volume) / (100.0 - previous)
+        else:
+            volume -= (previous - remote) * volume / previous
+        self.volume = volume = max(0.0, min(100.0, volume))
+        if abs(remote - volume) <= self.settings.tolerance:
+            return self._take_control(remote, "Remote converged with the app volume")
+        logging.debug(f"Scaling takeover: Remote at {remote:.4g}% → {volume:.4g}%")
+        return volume
+
+    def _take_control(self, remote: float, how: str) -> float:
+        elapsed = time.monotonic() - self._reset_time
+        self.control_times.append(elapsed)
+        logging.info(f"{how} at {remote:.4g}%. Control engaged after {elapsed:.1f}s "
+                     f"({self._ignored} messages ignored, {self.settings.mode} mode).")
+        self.engage()
+        return remote
+
+    def log_metrics(self) -> None:
+        if self.control_times:
+            times = sorted(self.control_times)
+            logging.info(f"Takeover ({self.settings.mode}): time to control median {times[len(times) // 2]:.1f}s, "
+                         f"max {times[-1]:.1f}s over {len(times)} takeovers")
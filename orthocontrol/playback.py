@@ -0,0 +1,172 @@
+# orthocontrol/playback.py
+
+import asyncio
+import inspect
+import logging
+from concurrent.futures import Executor
+from contextlib import suppress
+from typing import Any, Awaitable, Callable
+
+from .ratelimit import AdaptiveTokenBucket
+from .sync import RATE_LIMIT_BACKOFF, retry_after
+
+FAST_POLL_INTERVAL = 1.0  # Seconds between refreshes right after a gesture
+IDLE_POLL_INTERVAL = 15.0  # Seconds between refreshes once nothing has happened for a while
+ACTIVE_WINDOW = 5.0  # A gesture keeps refreshes at the fast interval for this long
+
+PlaybackState = dict[str, Any]  # As returned by Spotify's current_playback()
+
+
+class PlaybackStateCache:
+    """One shared copy of the player's playback state, so reads cost no API calls.
+
+    A background task refreshes the state with `fetch`: a blocking call, run on
+    `executor`, or a coroutine function, awaited on the loop alongside volume writes. The refresh rate adapts: every `fast_interval` while a gesture was seen
+    within `active_window` (see `touch`), then the interval doubles with each refresh up
+    to `idle_interval`. A touch during a long idle wait cuts it short.
+
+    Our own successful writes go in through `update` straight away, so the cache does not
+    wait for the next refresh to know them. A refresh whose fetch started before the latest
+    `update` is dropped, as it may predate that write. When a refresh finds a volume other
+    than the cached one, the volume was changed elsewhere and `on_volume_change` is called
+    on the loop with it.
+
+    With a `limiter` (the backend's token bucket, shared with the volume sync worker), each
+    refresh takes a token, and a refresh is postponed until the bucket would let a paced
+    write through, so refreshes never eat into a spin's budget and wait out a 429 block. A
+    fetch that raises an error with `http_status` 429 backs the limiter off and postpones
+    refreshes for its Retry-After (or RATE_LIMIT_BACKOFF without one).
+    """
+
+    def __init__(self, fetch: Callable[[], PlaybackState | None | Awaitable[PlaybackState | None]],
+                 on_volume_change: Callable[[int], None] | None = None,
+                 fast_interval: float = FAST_POLL_INTERVAL, idle_interval: float = IDLE_POLL_INTERVAL,
+                 active_window: float = ACTIVE_WINDOW, executor: Executor | None = None,
+                 limiter: AdaptiveTokenBucket | None = None):
+        self._fetch = fetch
+        self._async_fetch = inspect.iscoroutinefunction(fetch)
+        self._on_volume_change = on_volume_change
+        self._fast_interval = fast_interval
+        self._idle_interval = idle_interval
+        self._active_window = active_window
+        self._executor = executor
+        self._limiter = limiter
+        self._rate_limited_until = float("-inf")
+        self.state: PlaybackState | None = None
+        self._interval = fast_interval
+        self._last_touch = float("-inf")
+        self._touched = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._generation = 0  # Bumped by every optimistic update
+        self.refreshes = 0
+        self.stale = 0  # Refreshes dropped because an update happened during the fetch
+        self.postponed = 0  # Refreshes held back by the limiter or a 429 block
+        self.rate_limited = 0  # Refreshes that got a 429
+
+    @property
+    def device(self) -> dict[str, Any]:
+        return (self.state or {}).get('device') or {}
+
+    @property
+    def volume(self) -> int | None:
+        volume = self.device.get('volume_percent')
+        return None if volume is None else int(volume)
+
+    @property
+    def device_id(self) -> str | None:
+        return self.device.get('id')
+
+    @property
+    def is_playing(self) -> bool | None:
+        return (self.state or {}).get('is_playing')
+
+    def set(self, state: PlaybackState | None) -> None:
+        """Replaces the state with a fresh read."""
+        self.state = state
+
+    def update(self, volume: int | None = None, is_playing: bool | None = None) -> None:
+        """Applies one of our own writes optimistically."""
+        self._generation += 1
+        if self.state is None:
+            return
+        if volume is not None and self.state.get('device'):
+            self.state['device']['volume_percent'] = volume
+        if is_playing is not None:
+            self.state['is_playing'] = is_playing
+
+    def touch(self) -> None:
+        """A gesture happened: refresh at the fast rate for a while. Must be called on the loop."""
+        self._last_touch = asyncio.get_running_loop().time()
+        if self._interval > self._fast_interval:
+            self._touched.set()
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run(), name="playback-state")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_refresh = loop.time()
+        while True:
+            self._touched.clear()
+            recent = loop.time() - self._last_touch < self._active_window
+            if recent:
+                self._interval = self._fast_interval
+            now = loop.time()
+            delay = last_refresh + self._interval - now
+            blocked = max(self._rate_limited_until, self._limiter.ready_at(now) if self._limiter else now) - now
+            if blocked > max(delay, 0.0):
+                self.postponed += 1
+                delay = blocked
+            if delay > 0:
+                with suppress(TimeoutError):
+                    await asyncio.wait_for(self._touched.wait(), delay)
+                    continue  # Touched: recompute the wait at the fast interval
+
+            await self.refresh()
+            last_refresh = loop.time()
+            if not recent:
+                self._interval = min(self._idle_interval, self._interval * 2)
+
+    async def refresh(self) -> None:
+        loop = asyncio.get_running_loop()
+        generation = self._generation
+        if self._limiter:
+            self._limiter.acquire(loop.time())
+        try:
+            if self._async_fetch:
+                state = await self._fetch()
+            else:
+                state = await loop.run_in_executor(self._executor, self._fetch)
+        except Exception as e:
+            if getattr(e, 'http_status', None) != 429:
+                raise
+            requested = retry_after(e)
+            backoff = RATE_LIMIT_BACKOFF if requested is None else requested
+            self._rate_limited_until = loop.time() + backoff
+            if self._limiter:
+                self._limiter.on_rate_limited(loop.time(), self._rate_limited_until)
+            self.rate_limited += 1
+            logging.warning(f"Playback state refresh rate limited: postponing refreshes for {backoff:g}s")
+            return
+        if self._limiter:
+            self._limiter.on_success()
+        self.refreshes += 1
+        if state is None:
+            return
+        if generation != self._generation:
+            self.stale += 1
+            logging.debug("Playback state refresh dropped: a write was applied during the fetch")
+            return
+        previous = self.volume
+        self.state = state
+        volume = self.volume
+        logging.debug(f"Playback state refreshed: volume {volume}%, next refresh in {self._interval:g}s")
+        if volume is not None and volume != previous and self._on_volume_change:
+            self._on_volume_change(volume)
@@ -0,0 +1,87 @@
+# orthocontrol/ratelimit.py
+
+import logging
+
+# Starting point for Spotify: ~180 requests/minute sustained, 429s after 20-30 quick calls
+SUSTAINED_RATE = 2.5  # Tokens (requests) per second
+BURST_CAPACITY = 10.0  # Tokens a quiet bucket holds
+MIN_RATE = 0.5
+MAX_RATE = 6.0
+MAX_BURST = 30.0
+RATE_INCREASE = 0.02  # Additive increase: tokens/s gained per `rate` successes (about one second at the limit)
+BURST_INCREASE = 0.2  # Tokens of burst gained per `burst` successes that drained the bucket
+RECOVERY_FACTOR = 5.0  # Below the starting limits, which are known to be safe, they grow this much faster
+DECREASE_FACTOR = 0.5  # Multiplicative decrease of rate and burst on a 429
+
+
+class AdaptiveTokenBucket:
+    """Per-backend token bucket whose refill rate and burst capacity follow AIMD.
+
+    A quiet bucket holds `burst` tokens, so a short gesture can sync on every change; a
+    long spin drains it and is held to the sustained `rate`. Each success nudges rate and
+    burst up additively, but only while demand is at the limit (an idle bucket proves
+    nothing about the backend); each 429 halves both (and empties the bucket), so the limiter
+    settles just below whatever limits the backend actually enforces.
+
+    Times are passed in by the caller (the event loop clock), so the bucket works the same
+    on a virtual clock.
+    """
+
+    __slots__ = ("rate", "burst", "_initial_rate", "_initial_burst", "_min_rate", "_max_rate", "_max_burst", "_tokens", "_updated", "_last_acquired")
+
+    def __init__(self, rate: float = SUSTAINED_RATE, burst: float = BURST_CAPACITY, min_rate: float = MIN_RATE,
+                 max_rate: float = MAX_RATE, max_burst: float = MAX_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._initial_rate = rate
+        self._initial_burst = burst
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._max_burst = max_burst
+        self._tokens = burst
+        self._updated: float | None = None
+        self._last_acquired = float("-inf")
+
+    def ready_at(self, now: float, spread: bool = True, pace: float = 1.0) -> float:
+        """Earliest time a request may be made; with `spread=False`, as soon as a token is there.
+        `pace` scales the spreading, never the wait for a token."""
+        self._refill(now)
+        if self._tokens < 1.0:
+            return now + (1.0 - self._tokens) / self.rate
+        if not spread:
+            return now
+        # Spread the burst: back to back while at least half full, then approaching one refill
+        # period apart as the bucket empties
+        half = self.burst / 2
+        if self._tokens >= half:
+            return now
+        return max(now, self._last_acquired + (1.0 - self._tokens / half) / self.rate * pace)
+
+    def acquire(self, now: float) -> None:
+        """Takes a token for a request made at `now`."""
+        self._refill(now)
+        self._tokens -= 1.0
+        self._last_acquired = now
+
+    def on_success(self) -> None:
+        if self._tokens >= 1.0:
+            return
+        self.rate = min(self._max_rate, self.rate + RATE_INCREASE / self.rate
+                        * (RECOVERY_FACTOR if self.rate < self._initial_rate else 1.0))
+        self.burst = min(self._max_burst, self.burst + BURST_INCREASE / self.burst
+                         * (RECOVERY_FACTOR if self.burst < self._initial_burst else 1.0))
+
+    def on_rate_limited(self, now: float, retry_at: float | None = None) -> None:
+        """Backs off after a 429. With `retry_at` (from the server's Retry-After), the bucket
+        holds exactly one token by then, so the first request after the block (usually the
+        final value the knob stopped at) is not delayed further by the lowered rate."""
+        self.rate = max(self._min_rate, self.rate * DECREASE_FACTOR)
+        self.burst = max(1.0, self.burst * DECREASE_FACTOR)
+        self._refill(now)
+        self._tokens = 1.0 - max(0.0, retry_at - now) * self.rate if retry_at is not None else min(self._tokens, 0.0)
+        logging.info(f"Rate limiter: backing off to {self.rate:.2f} requests/s, burst {self.burst:.1f}")
+
+    def _refill(self, now: float) -> None:
+        if self._updated is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
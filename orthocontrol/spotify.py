@@ -0,0 +1,247 @@
+# orthocontrol/spotify.py
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlencode, urlsplit
+
+from orthocontrol.connection import ConnectionStats, ResumingSSLContext
+
+API_BASE = "https://api.spotify.com/v1"
+POOL_SIZE = 4  # Connections to the API host; reads and writes each get their own
+REQUEST_TIMEOUT = 5.0
+KEEPALIVE_INTERVAL = 20.0  # Probe after this long without a request, before the host drops idle connections
+DEVICE_CACHE_TTL = 60.0  # Seconds a resolved Spotify device is trusted without asking the API again
+
+
+class SpotifyApiError(Exception):
+    """An error response from the Web API. Same attributes as spotipy's SpotifyException,
+    so callers (and `retry_after`) can treat both alike."""
+
+    def __init__(self, http_status: int, code: int, msg: str, reason: str | None = None,
+                 headers: dict[str, str] | None = None):
+        super().__init__(f"http status: {http_status}, code: {code} - {msg}, reason: {reason}")
+        self.http_status = http_status
+        self.code = code
+        self.msg = msg
+        self.reason = reason
+        self.headers = headers or {}
+
+
+class _Connection:
+    __slots__ = ("reader", "writer", "reused")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class AsyncSpotifyClient:
+    """Spotify Web API client on asyncio streams, for the calls orthocontrol makes.
+
+    Method names and return values follow spotipy. Requests are plain HTTP/1.1 over a
+    small pool of keep-alive connections, so a playback read does not queue behind a slow
+    volume write. Every call can be cancelled: the connection it was using is closed, as
+    its state is unknown, and the pool opens a fresh one when needed. A new connection
+    resumes the TLS session of an earlier one instead of doing a full handshake, and
+    `keep_alive` probes while idle so the host does not drop the pool in the first place.
+    Connect and TLS handshake times, request times and resumptions go to `stats`.
+
+    `access_token` is awaited for each request: pass `TokenRefresher.access_token`, which
+    returns the token it renews ahead of expiry. When a request is rejected with 401 anyway,
+    `on_unauthorized` (`TokenRefresher.unauthorized`) gets a new token and the request is
+    retried once if it did.
+    Errors raise `SpotifyApiError`.
+    """
+
+    def __init__(self, access_token: Callable[[], Awaitable[str]], base_url: str = API_BASE,
+                 pool_size: int = POOL_SIZE, timeout: float = REQUEST_TIMEOUT, cafile: str | None = None,
+                 on_unauthorized: Callable[[], Awaitable[bool]] | None = None):
+        self._access_token = access_token
+        self._on_unauthorized = on_unauthorized
+        url = urlsplit(base_url)
+        self._secure = url.scheme == "https"
+        self._host = url.hostname
+        self._port = url.port or (443 if self._secure else 80)
+        self._authority = url.netloc
+        self._path = url.path.rstrip("/")
+        self._timeout = timeout
+        self.stats = ConnectionStats()
+        self._ssl_context = ResumingSSLContext(self.stats, cafile) if self._secure else None
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle: list[_Connection] = []
+        self.cancelled = 0
+
+    async def current_user(self) -> dict[str, Any] | None:
+        return await self._request("GET", "/me")
+
+    async def current_playback(self) -> dict[str, Any] | None:
+        return await self._request("GET", "/me/player")
+
+    async def devices(self) -> dict[str, Any] | None:
+        return await self._request("GET", "/me/player/devices")
+
+    async def volume(self, volume_percent: int, device_id: str | None = None) -> None:
+        params = {"volume_percent": volume_percent}
+        if device_id:
+            params["device_id"] = device_id
+        await self._request("PUT", "/me/player/volume", params)
+
+    async def transfer_playback(self, device_id: str, force_play: bool = True) -> None:
+        await self._request("PUT", "/me/player", payload={"device_ids": [device_id], "play": force_play})
+
+    async def keep_alive(self, interval: float = KEEPALIVE_INTERVAL) -> None:
+        """Probes the API host whenever no request went out for `interval`, so a pooled
+        connection stays open for the next real request."""
+        while True:
+            idle = time.monotonic() - self.stats.last_request
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                continue
+            self.stats.probes += 1
+            try:
+                await self._exchange_pooled("HEAD", "/", b"", {})
+            except Exception as e:  # Whatever went wrong, keep probing
+                logging.debug(f"Spotify keep-alive probe failed: {e!r}")
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def log_metrics(self) -> None:
+        self.stats.log_metrics("Spotify API")
+        logging.info(f"Spotify API: {self.cancelled} requests cancelled in flight")
+
+    async def _request(self, method: str, path: str, params: dict[str, Any] | None = None,
+                       payload: Any = None) -> Any:
+        target = self._path + path + (f"?{urlencode(params)}" if params else "")
+        body = json.dumps(payload).encode() if payload is not None else b""
+        headers = {"Accept": "application/json"}
+        if payload is not None:
+            headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            headers["Authorization"] = f"Bearer {await self._access_token()}"
+            status, response_headers, content = await self._exchange_pooled(method, target, body, headers)
+            # A 401 means the token expired early (e.g. across a suspend): refresh once and retry
+            if status != 401 or attempt or not self._on_unauthorized or not await self._on_unauthorized():
+                break
+        if status >= 400:
+            message, reason = content.decode(errors="replace"), None
+            try:
+                error = json.loads(content).get("error", message)
+            except (ValueError, AttributeError):
+                error = message  # Not a JSON object: an HTML page or empty body from a proxy or gateway
+            if isinstance(error, dict):
+                message, reason = str(error.get("message", message)), error.get("reason")
+            else:
+                message = str(error)
+            raise SpotifyApiError(status, -1, f"{method} {target}:\n {message}", reason, response_headers)
+        try:
+            return json.loads(content) if content else None
+        except ValueError as e:
+            raise SpotifyApiError(status, -1, f"{method} {target}:\n invalid JSON response: {e}",
+                                  headers=response_headers) from e
+
+    async def _exchange_pooled(self, method: str, target: str, body: bytes,
+                               headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        started = time.perf_counter()
+        self.stats.last_request = time.monotonic()  # In flight counts as busy: no probe alongside
+        async with self._slots:
+            for attempt in range(2):
+                connection = await self._acquire()
+                try:
+                    response = await asyncio.wait_for(self._exchange(connection, method, target, body, headers),
+                                                      self._timeout)
+                except asyncio.CancelledError:
+                    self.cancelled += 1
+                    connection.close()
+                    raise
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    connection.close()
+                    if connection.reused and attempt == 0:
+                        logging.debug(f"Spotify API: pooled connection was closed ({e}), reconnecting")
+                        continue  # The host dropped the idle connection; the request never reached it
+                    raise
+                except BaseException:
+                    connection.close()
+                    raise
+                self.stats.requests += 1
+                self.stats.request_ms.append((time.perf_counter() - started) * 1000.0)
+                self.stats.last_request = time.monotonic()
+                if self._ssl_context and not connection.reused:
+                    # TLS 1.3 tickets arrive after the handshake; by the first response they are in
+                    ssl_object = connection.writer.get_extra_info('ssl_object')
+                    if ssl_object and ssl_object.session:
+                        self._ssl_context.sessions[self._host] = ssl_object.session
+                status, response_headers, content = response
+                if response_headers.get("connection", "").lower() == "close":
+                    connection.close()
+                else:
+                    connection.reused = True
+                    self._idle.append(connection)
+                return response
+        raise AssertionError("unreachable")
+
+    async def _acquire(self) -> _Connection:
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.reader.at_eof():
+                return connection
+            connection.close()
+        started = time.perf_counter()
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self._host, self._port), self._timeout)
+        connected = time.perf_counter()
+        if self._ssl_context:
+            try:
+                await asyncio.wait_for(writer.start_tls(self._ssl_context, server_hostname=self._host),
+                                       self._timeout)
+            except BaseException:
+                writer.close()
+                raise
+            self.stats.tls_ms.append((time.perf_counter() - connected) * 1000.0)
+            if writer.get_extra_info('ssl_object').session_reused:
+                self.stats.resumed += 1
+        self.stats.connect_ms.append((connected - started) * 1000.0)
+        self.stats.connections += 1
+        return _Connection(reader, writer)
+
+    async def _exchange(self, connection: _Connection, method: str, target: str, body: bytes,
+                        headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self._authority}", f"Content-Length: {len(body)}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        connection.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await connection.writer.drain()
+
+        reader = connection.reader
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before the response")
+        status = int(status_line.split()[1])
+        response_headers: dict[str, str] = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            content = b""
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while size := int((await reader.readline()).split(b";")[0], 16):
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # Trailers
+            content = b"".join(chunks)
+        elif "content-length" in response_headers:
+            content = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            content = await reader.read()
+            response_headers["connection"] = "close"
+        return status, response_headers, content
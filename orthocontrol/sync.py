@@ -0,0 +1,340 @@
+# orthocontrol/sync.py
+
+import asyncio
+import inspect
+import logging
+import random
+import time
+from concurrent.futures import Executor
+from contextlib import suppress
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from .ratelimit import AdaptiveTokenBucket
+
+T = TypeVar('T')
+
+SYNC_INTERVAL = 0.25  # 250ms = 4 updates/second max
+BURST_SYNC_INTERVAL = 0.05  # Floor between attempts when a token bucket does the limiting
+RATE_LIMIT_BACKOFF = 10.0  # 10 seconds when rate limited and the server gives no Retry-After
+RETRY_AFTER_JITTER = 0.25  # Up to this many seconds added to Retry-After, so clients don't return in lockstep
+SETTLE_DELAY = 0.4  # The knob has settled this long after its last message; its final value is due
+TIMER_SLACK = 0.001  # A hold this close to expiring counts as expired
+VOLUME_STEPS = 100  # Backend volume resolution: Spotify and AppleScript take whole percents
+ABANDON_AFTER = 0.3  # An async write in flight this long is cancelled when a newer target is waiting
+
+
+class LatestValueMailbox(Generic[T]):
+    """Single-slot mailbox between a producer and a consumer on the same event loop.
+
+    The value and its generation are stored together as one tuple. Older values are
+    overwritten, and the generation counter lets the consumer tell how many of them it
+    never saw. The consumer awaits the wakeup event, which is only set when the consumer
+    has already cleared it.
+    """
+
+    __slots__ = ("_slot", "_taken_generation", "_ready")
+
+    def __init__(self):
+        self._slot: tuple[T | None, int] = (None, 0)
+        self._taken_generation = 0
+        self._ready = asyncio.Event()
+
+    def put(self, value: T) -> int:
+        """Publishes a new value (producer side). Returns its generation."""
+        generation = self._slot[1] + 1
+        self._slot = (value, generation)
+        if not self._ready.is_set():
+            self._ready.set()
+        return generation
+
+    def peek(self) -> tuple[T | None, int]:
+        """Returns the latest (value, generation) without consuming it."""
+        return self._slot
+
+    def take(self) -> tuple[T | None, int, int]:
+        """Consumes the latest value (consumer side).
+
+        Returns (value, generation, missed) where `missed` counts values that were
+        overwritten before the consumer saw them. Taking again without a new put returns
+        the same value with missed == 0.
+        """
+        self._ready.clear()
+        value, generation = self._slot
+        missed = max(0, generation - self._taken_generation - 1)
+        self._taken_generation = generation
+        return value, generation, missed
+
+    async def wait(self, timeout: float | None = None) -> bool:
+        """Waits until a value has been put since the last take (or `wake` was called)."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
+
+    def wake(self) -> None:
+        """Wakes a waiting consumer without publishing a value."""
+        self._ready.set()
+
+
+def retry_after(error: Exception) -> float | None:
+    """Seconds the server asked to wait in the Retry-After header of `error`, if any.
+
+    Works with any exception carrying a `headers` mapping, such as spotipy's
+    SpotifyException. The header is either a number of seconds or an HTTP date.
+    """
+    headers = getattr(error, 'headers', None) or {}
+    value = headers.get('Retry-After', headers.get('retry-after'))
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class VolumeSyncWorker:
+    """Pushes the most recent target volume to a backend from an asyncio task.
+
+    Targets arrive through a `LatestValueMailbox`, and the task sleeps until a new
+    one is posted, so an idle knob costs no wakeups at all. Writes are single-flight: at
+    most one backend call runs at a time, and targets posted meanwhile overwrite each
+    other, so only the newest goes next (counted in `coalesced`). Backend load is capped
+    at one call per round trip however fast the knob turns. The first change after a quiet
+    period is synced immediately; follow-up changes are held back until `sync_interval`
+    has passed since the previous attempt (or until a rate-limit backoff has expired).
+
+    A backend call that raises an error with `http_status` 429 blocks syncing for the
+    error's Retry-After (or `rate_limit_backoff` without one) plus up to RETRY_AFTER_JITTER.
+    Targets posted meanwhile overwrite each other in the mailbox, so only the latest one
+    is sent once the block ends.
+
+    With a `limiter` (the backend's token bucket), the interval is only a floor between
+    attempts: a quiet bucket lets a short gesture sync every `sync_interval`, and a long
+    spin is held to the bucket's refill rate. The limiter learns from successes and 429s.
+
+    A settle timer keyed to the last `set_target` acts as a trailing debounce: once
+    `settle_delay` has passed without input, a final value that is still pending (held back
+    by pacing, the limiter, or a failed attempt) is sent without waiting any longer. It fires
+    at most once per input and never cuts a 429 block short.
+
+    `pace`, if given, returns a multiplier for the interval (and for the limiter's spacing
+    of a draining burst, which is what decides timing once the bucket is below half full)
+    and is consulted again whenever a new target arrives during a hold; the MIDI motion tracker uses it to sync early while
+    the knob decelerates and to hold back while it accelerates.
+
+    Targets are float percents, so high-resolution controllers keep their precision up to
+    here. They are quantized to the backend's `volume_steps` grid before being compared
+    with the last synced value, so a change finer than the backend can represent costs
+    no request.
+
+    `on_synced`, if given, is called on the loop with each volume the backend accepted.
+    `observed` tells the worker about volume changes made elsewhere, so a knob moving back
+    to the old value is not mistaken for a no-op.
+
+    All timing goes through the running loop's clock, so the schedule can be driven by a
+    loop with a virtual clock. A blocking backend call runs on `executor` (the loop's
+    default executor when None).
+
+    `sync_volume` may also be a coroutine function (a native async backend). Its write is
+    then abandoned, i.e. cancelled, when it has been in flight for `abandon_after` and a
+    newer target is waiting, and the newer one goes out instead of queueing behind a stale
+    write. Writes younger than that always complete, so a steady spin cannot starve them.
+    """
+
+    def __init__(self, sync_volume: Callable[[float], bool | Awaitable[bool]], sync_interval: float = SYNC_INTERVAL,
+                 rate_limit_backoff: float = RATE_LIMIT_BACKOFF, executor: Executor | None = None,
+                 pace: Callable[[], float] | None = None, volume_steps: int = VOLUME_STEPS,
+                 on_synced: Callable[[float], None] | None = None, limiter: AdaptiveTokenBucket | None = None,
+                 rng: random.Random | None = None, settle_delay: float | None = SETTLE_DELAY,
+                 abandon_after: float = ABANDON_AFTER):
+        self._sync_volume = sync_volume
+        self._async_backend = inspect.iscoroutinefunction(sync_volume)
+        self._abandon_after = abandon_after
+        self._sync_interval = sync_interval
+        self._rate_limit_backoff = rate_limit_backoff
+        self._executor = executor
+        self._pace = pace
+        self._volume_steps = volume_steps
+        self._on_synced = on_synced
+        self._limiter = limiter
+        self._rng = rng or random.Random()
+        self._settle_delay = settle_delay
+        self._last_input_time = float("-inf")
+        self.synced_volume: float | None = None  # Volume the backend is believed to be at
+        self._mailbox: LatestValueMailbox[float] = LatestValueMailbox()
+        self._task: asyncio.Task[None] | None = None
+        self._target_posted = asyncio.Event()  # Set by each set_target; watched by an async write in flight
+        self.wakeups = 0  # Number of times the worker task woke up, for diagnostics
+        self.skipped_targets = 0  # Targets overwritten before the worker saw them
+        self.settles = 0  # Attempts made by the settle timer
+        self.writes = 0  # Backend calls made
+        self.coalesced = 0  # Targets superseded while a backend call was in flight
+        self.abandoned = 0  # Async writes cancelled in flight for a newer target
+
+    @property
+    def target(self) -> float | None:
+        return self._mailbox.peek()[0]
+
+    def set_target(self, volume_percent: float) -> None:
+        """Updates the target volume and wakes the worker. Must be called on the event loop."""
+        if self._mailbox.peek()[0] != volume_percent:
+            logging.debug(f"Target volume: {volume_percent:.4g}%")
+        self._mailbox.put(volume_percent)
+        self._last_input_time = asyncio.get_running_loop().time()
+        self._target_posted.set()
+
+    def observed(self, volume_percent: float) -> None:
+        """Records the backend's volume as read from elsewhere (e.g. changed in the player)."""
+        self.synced_volume = self.quantize(volume_percent)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run(), name="volume-sync")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_attempt_time = float("-inf")
+        rate_limited_until = float("-inf")
+        settled_generation = 0  # Latest input that was delivered, or already had its settle attempt
+
+        logging.info(f"Volume sync worker started ({self._sync_interval * 1000:.0f}ms interval)")
+
+        try:
+            while True:
+                # Sleep until a target is posted
+                await self._mailbox.wait()
+                self.wakeups += 1
+
+                # Immediate for the first change, paced for the ones that follow. With a pace
+                # hint, every new target during the hold may shorten or stretch it.
+                while True:
+                    now = loop.time()
+                    settle_at = self._last_input_time + self._settle_delay \
+                        if self._settle_delay is not None and self._mailbox.peek()[1] != settled_generation else None
+                    hold_until, settling = self._hold_until(now, last_attempt_time, rate_limited_until, settle_at)
+                    if now + TIMER_SLACK >= hold_until:
+                        break
+                    if self._pace is None:
+                        await asyncio.sleep(hold_until - now)
+                    elif await self._mailbox.wait(hold_until - now):
+                        self._take()
+                    self.wakeups += 1
+
+                current_target = self._take()
+                generation = self._mailbox.peek()[1]
+                if current_target is None:
+                    continue
+                current_target = self.quantize(current_target)
+                if current_target == self.synced_volume:
+                    settled_generation = generation
+                    continue
+
+                if settling:
+                    settled_generation = generation
+                    self.settles += 1
+                logging.info(f"Syncing volume: {self.synced_volume}% → {current_target:.4g}%{' (settled)' if settling else ''}")
+                last_attempt_time = now
+                if self._limiter:
+                    self._limiter.acquire(now)
+                self.writes += 1
+                try:
+                    if await self._write(current_target):
+                        if self._limiter:
+                            self._limiter.on_success()
+                        self.synced_volume = current_target
+                        if self._mailbox.peek()[1] == generation:
+                            settled_generation = generation
+                        if self._on_synced:
+                            self._on_synced(current_target)
+                    else:
+                        self._mailbox.wake()  # Retry (or go on to the newer target) after the interval
+                except Exception as e:
+                    self._mailbox.wake()
+                    if getattr(e, 'http_status', None) == 429:
+                        requested = retry_after(e)
+                        backoff = (self._rate_limit_backoff if requested is None else requested) \
+                            + self._rng.uniform(0.0, RETRY_AFTER_JITTER)
+                        logging.warning(f"RATE LIMITED! Backing off for {backoff:.2f} seconds "
+                                        f"(Retry-After: {'none' if requested is None else f'{requested:g}s'})")
+                        rate_limited_until = loop.time() + backoff
+                        if self._limiter:
+                            self._limiter.on_rate_limited(loop.time(), rate_limited_until)
+                    else:
+                        logging.error(f"Volume sync error: {e}")
+                # Targets posted during the call: all but the newest never reach the backend
+                self.coalesced += max(0, self._mailbox.peek()[1] - generation - 1)
+        finally:
+            logging.info("Volume sync worker stopped")
+
+    def log_metrics(self) -> None:
+        logging.info(f"Volume sync: {self.writes} backend writes ({self.abandoned} abandoned), {self.coalesced} "
+                     f"targets coalesced in flight, {self.skipped_targets} skipped in total, {self.settles} settles")
+
+    def quantize(self, volume_percent: float) -> float:
+        """Rounds a volume to the nearest value the backend can represent."""
+        step = 100 / self._volume_steps
+        return round(volume_percent / step) * step
+
+    async def _write(self, volume: float) -> bool:
+        """Makes the backend call. Returns False if it failed or was abandoned."""
+        loop = asyncio.get_running_loop()
+        if not self._async_backend:
+            return await loop.run_in_executor(self._executor, self._sync_volume, volume)
+
+        self._target_posted.clear()
+        write = loop.create_task(self._sync_volume(volume))
+        try:
+            await asyncio.wait({write}, timeout=self._abandon_after)
+            while not write.done():
+                newest = self._mailbox.peek()[0]
+                if self._target_posted.is_set() and newest is not None and self.quantize(newest) != volume:
+                    write.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await write
+                    if write.cancelled():
+                        self.abandoned += 1
+                        # The backend may or may not have applied it: whatever comes next is sent
+                        self.synced_volume = None
+                        logging.info(f"Abandoned stale volume write of {volume:.4g}%")
+                        return False
+                    break
+                # Wait for the write to finish or for the next target
+                self._target_posted.clear()
+                posted = loop.create_task(self._target_posted.wait())
+                await asyncio.wait({write, posted}, return_when=asyncio.FIRST_COMPLETED)
+                posted.cancel()
+            return write.result()
+        finally:
+            write.cancel()  # No-op once done; otherwise the worker itself is being stopped
+
+    def _hold_until(self, now: float, last_attempt_time: float, rate_limited_until: float,
+                    settle_at: float | None) -> tuple[float, bool]:
+        """When the next attempt is due, and whether it is due because the knob settled."""
+        pace = self._pace() if self._pace else 1.0
+        hold_until = last_attempt_time + self._sync_interval * pace
+        if self._limiter:
+            hold_until = max(hold_until, self._limiter.ready_at(now, pace=pace))
+        settling = False
+        if settle_at is not None:
+            # A settled value skips pacing and the burst spreading, but still needs a token
+            settle_at = max(settle_at, self._limiter.ready_at(now, spread=False)) if self._limiter else settle_at
+            settling = settle_at < hold_until
+            hold_until = min(hold_until, settle_at)
+        return max(hold_until, rate_limited_until), settling
+
+    def _take(self) -> float | None:
+        current_target, _, missed = self._mailbox.take()
+        self.skipped_targets += missed
+        return current_target
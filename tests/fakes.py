@@ -0,0 +1,362 @@
+"""Fakes shared by the tests and benchmark.py: a virtual-clock event loop, synthetic knob
+gestures, and local stand-ins for the Spotify token endpoint, API host and Web API."""
+
+import asyncio
+import json
+import math
+import os
+import random
+import selectors
+import ssl
+import subprocess
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import Executor, Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from orthocontrol.midi.mapping import CURVES
+
+
+class VirtualClockSelector(selectors.DefaultSelector):
+    """Selector that never waits for a timeout: it polls, then moves the clock forward by
+    the timeout the loop asked for. Without a timeout (no timers) it blocks as usual."""
+
+    def __init__(self):
+        super().__init__()
+        self.time = 0.0
+
+    def select(self, timeout=None):
+        if timeout is None:
+            return super().select()
+        self.time += timeout
+        return super().select(0)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop whose clock jumps straight to the next timer instead of sleeping.
+
+    Anything that times itself with loop.time(), asyncio.sleep() or call_later() runs
+    deterministically and as fast as the CPU allows.
+    """
+
+    def __init__(self):
+        self._clock = VirtualClockSelector()
+        super().__init__(self._clock)
+
+    def time(self):
+        return self._clock.time
+
+
+class InlineExecutor(Executor):
+    """Runs 'blocking' calls inline, so they take no virtual time."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def knob_gestures(count, seed=2, durations=(0.3, 1.5)):
+    """Absolute-knob gestures (accelerate, cruise, decelerate) as ([start, end], events) pairs.
+
+    A message is emitted whenever the 0-127 position changes, like the real remote does;
+    events carry (percent, delta) after the default linear curve.
+    """
+    rng = random.Random(seed)
+    linear = CURVES["linear"]
+    position = 64
+    gestures = []
+    for _ in range(count):
+        amount = rng.randint(8, 60)
+        target = position + amount if position + amount <= 127 and (position - amount < 0 or rng.random() < 0.5) \
+            else max(0, position - amount)
+        duration = rng.uniform(*durations)
+        events = []
+        last_value, last_time = position, 0.0
+        step = 0.001
+        t = step
+        while t <= duration:
+            # Smoothstep easing: speed ramps up, cruises, then ramps down
+            progress = t / duration
+            eased = progress * progress * (3 - 2 * progress)
+            value = round(position + (target - position) * eased)
+            if value != last_value:
+                events.append((linear(value), t - last_time))
+                last_value, last_time = value, t
+            t += step
+        gestures.append(events)
+        position = target
+    return gestures
+
+
+async def replay_gestures(gestures, worker, tracker, gap):
+    """Feeds gestures to the worker in virtual time; returns per-gesture (start, end, final value)."""
+    loop = asyncio.get_running_loop()
+    worker.start()
+    windows = []
+    for events in gestures:
+        await asyncio.sleep(gap)
+        start = loop.time()
+        for percent, delta in events:
+            await asyncio.sleep(delta)
+            if tracker:
+                tracker.update(percent, delta)
+            worker.set_target(percent)
+        windows.append((start, loop.time(), events[-1][0]))
+    await asyncio.sleep(gap)
+    await worker.stop()
+    return windows
+
+
+class RateLimited(Exception):
+    http_status = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("429 Too Many Requests")
+        self.headers = {} if retry_after is None else {"Retry-After": str(math.ceil(retry_after))}
+
+
+class FlakyBackend:
+    """Blocking `sync_volume` for a VolumeSyncWorker on `loop` that fails `failure_rate` of
+    calls and answers `rate_limit_rate` of them with a 429 blocking it for a second. Each call
+    is recorded as (loop time, volume, settles the worker had made by then)."""
+
+    def __init__(self, loop, failure_rate, rate_limit_rate, seed):
+        self._loop = loop
+        self._failure_rate = failure_rate
+        self._rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._blocked_until = float("-inf")
+        self.worker = None
+        self.attempts = []
+
+    def __call__(self, volume):
+        now = self._loop.time()
+        self.attempts.append((now, volume, self.worker.settles if self.worker else 0))
+        if now < self._blocked_until or self._rng.random() < self._rate_limit_rate:
+            self._blocked_until = max(self._blocked_until, now + 1.0)
+            raise RateLimited(self._blocked_until - now)
+        return self._rng.random() >= self._failure_rate
+
+
+class FakeTokenEndpoint(ThreadingHTTPServer):
+    """Local OAuth token endpoint that hands out short-lived tokens after a delay."""
+
+    def __init__(self, lifetime, delay):
+        super().__init__(("127.0.0.1", 0), self.Handler)
+        self.lifetime = lifetime
+        self.delay = delay
+        self.issued = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/token"
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(self.server.delay)
+            self.server.issued += 1
+            body = json.dumps({"access_token": f"token-{self.server.issued}", "token_type": "Bearer",
+                               "expires_in": self.server.lifetime, "refresh_token": "refresh"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_args):
+            pass
+
+
+class FakeOAuth:
+    """The parts of spotipy's SpotifyOAuth that the client and TokenRefresher use, against
+    FakeTokenEndpoint. Like spotipy, get_access_token refreshes inline when the token is
+    about to expire (within `inline_margin`)."""
+
+    def __init__(self, url, lifetime, inline_margin):
+        self._url = url
+        self._inline_margin = inline_margin
+        self.cache_handler = self
+        self._token_info = {"access_token": "token-0", "refresh_token": "refresh",
+                            "expires_in": lifetime, "expires_at": time.time() + lifetime}
+        self.inline_refreshes = 0
+
+    def get_cached_token(self):
+        return self._token_info
+
+    def refresh_access_token(self, refresh_token):
+        data = urllib.parse.urlencode({"grant_type": "refresh_token", "refresh_token": refresh_token}).encode()
+        with urllib.request.urlopen(self._url, data) as response:
+            token_info = json.load(response)
+        token_info["expires_at"] = time.time() + token_info["expires_in"]
+        self._token_info = token_info
+        return token_info
+
+    def get_access_token(self):
+        """Called by the client before every request: the knob's hot path."""
+        if self._token_info["expires_at"] - time.time() < self._inline_margin:
+            self.inline_refreshes += 1
+            self.refresh_access_token(self._token_info["refresh_token"])
+        return self._token_info["access_token"]
+
+
+class HandshakeCountingServer(ThreadingHTTPServer):
+    """Local HTTPS stand-in for the API host. Counts full and resumed TLS handshakes, adds
+    `rtt` per round trip (two for a new connection with a full handshake, one with a resumed
+    one) and drops connections idle for longer than `idle_timeout`, like the real host."""
+
+    def __init__(self, certfile, idle_timeout, rtt):
+        super().__init__(("127.0.0.1", 0), self.Handler)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile)
+        self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+        self.rtt = rtt
+        self.Handler.timeout = idle_timeout
+        self.full_handshakes = 0
+        self.resumed_handshakes = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"https://localhost:{self.server_address[1]}/"
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # Headers and body go out separately; no delayed-ACK stalls
+
+        def setup(self):
+            self.request.do_handshake()
+            if self.request.session_reused:
+                self.server.resumed_handshakes += 1
+                time.sleep(self.server.rtt)
+            else:
+                self.server.full_handshakes += 1
+                time.sleep(2 * self.server.rtt)
+            super().setup()
+
+        def do_HEAD(self):
+            time.sleep(self.server.rtt)
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            time.sleep(self.server.rtt)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, *_args):
+            pass
+
+
+def self_signed_certificate(directory):
+    path = os.path.join(directory, "localhost.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+                    "-addext", "subjectAltName=DNS:localhost", "-keyout", path, "-out", path],
+                   check=True, capture_output=True)
+    return path
+
+
+async def static_token():
+    """An AsyncSpotifyClient access_token for servers that accept any token."""
+    return "token"
+
+
+class MockSpotifyApi(ThreadingHTTPServer):
+    """Local stand-in for the Spotify Web API: the player endpoints orthocontrol uses.
+
+    Every request takes `rtt`. Every `stall_every`-th volume write stalls for `stall` before
+    answering; the volume itself is applied when the request arrives, only the response is
+    late. A transfer makes the device active after `activation_delay`; until then volume
+    writes get 404 NO_ACTIVE_DEVICE. Applied volumes are recorded with time.monotonic().
+    Tokens in `expired` get 401.
+    """
+
+    def __init__(self, rtt, stall_every=0, stall=0.0, activation_delay=0.0):
+        super().__init__(("127.0.0.1", 0), self.Handler)
+        self.rtt = rtt
+        self.stall_every = stall_every
+        self.stall = stall
+        self.activation_delay = activation_delay
+        self.volume = 50
+        self.active_at = 0.0  # time.monotonic() from which the device is active; inf while inactive
+        self.volume_writes = 0
+        self.applied = []
+        self.expired = set()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def handle_error(self, request, client_address):
+        pass  # Clients close connections whose request they abandoned
+
+    def playback(self):
+        return {"device": {"id": "mock-device", "name": "Mock", "is_active": time.monotonic() >= self.active_at,
+                           "volume_percent": self.volume}, "is_playing": True}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def reply(self, status, payload=None):
+            body = json.dumps(payload).encode() if payload is not None else b""
+            self.send_response(status)
+            if body:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def handle_api(self):
+            server = self.server
+            url = urllib.parse.urlsplit(self.path)
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self.reply(401, {"error": {"status": 401, "message": "No token provided"}})
+            if self.headers["Authorization"].removeprefix("Bearer ") in server.expired:
+                return self.reply(401, {"error": {"status": 401, "message": "The access token expired"}})
+            route = (self.command, url.path)
+            delay = server.rtt
+            if route == ("GET", "/v1/me/player"):
+                response = 200, server.playback()
+            elif route == ("GET", "/v1/me/player/devices"):
+                response = 200, {"devices": [server.playback()["device"]]}
+            elif route == ("PUT", "/v1/me/player"):
+                server.active_at = time.monotonic() + server.activation_delay
+                response = 204, None
+            elif route == ("PUT", "/v1/me/player/volume"):
+                if time.monotonic() < server.active_at:
+                    response = 404, {"error": {"status": 404, "message": "Player command failed: No active device found",
+                                               "reason": "NO_ACTIVE_DEVICE"}}
+                else:
+                    server.volume = int(urllib.parse.parse_qs(url.query)["volume_percent"][0])
+                    server.applied.append((time.monotonic(), server.volume))
+                    server.volume_writes += 1
+                    if server.stall_every and server.volume_writes % server.stall_every == 0:
+                        delay = server.stall
+                    response = 204, None
+            else:
+                response = 404, {"error": {"status": 404, "message": "Service not found"}}
+            time.sleep(delay)
+            self.reply(*response)
+
+        do_GET = do_PUT = handle_api
+
+        def do_HEAD(self):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *_args):
+            pass
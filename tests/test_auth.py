@@ -0,0 +1,125 @@
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from orthocontrol.auth import WAKE_CHECK_INTERVAL, TokenRefresher
+from orthocontrol.spotify import AsyncSpotifyClient
+from tests.fakes import FakeOAuth, FakeTokenEndpoint, InlineExecutor, MockSpotifyApi, VirtualClockLoop
+
+
+@pytest.fixture
+def endpoint():
+    endpoint = FakeTokenEndpoint(lifetime=1.0, delay=0.05)
+    yield endpoint
+    endpoint.shutdown()
+
+
+def test_refresh_delay_fits_short_lived_tokens():
+    refresher = TokenRefresher(None, margin=300.0, jitter=30.0, rng=random.Random(1))
+    delay = refresher.refresh_delay({"expires_in": 60, "expires_at": time.time() + 60})
+    # Margin shrinks to half the lifetime, jitter to a tenth
+    assert 24.0 <= delay <= 30.0
+
+
+def test_refreshes_ahead_of_expiry_and_serves_token_from_memory(endpoint):
+    auth = FakeOAuth(endpoint.url, lifetime=1.0, inline_margin=0.1)
+    refresher = TokenRefresher(auth, executor=ThreadPoolExecutor(max_workers=1))
+
+    async def knob():
+        await refresher.load()
+        refresher.start()
+        tokens = set()
+        for _ in range(50):
+            tokens.add(await refresher.access_token())
+            await asyncio.sleep(0.05)
+        await refresher.stop()
+        return tokens
+
+    tokens = asyncio.run(knob())
+    assert refresher.refreshes >= 3
+    assert refresher.failures == 0
+    assert len(tokens) >= refresher.refreshes  # Every refreshed token was served (the last one may come after)
+    assert refresher._token_info["access_token"] == auth.get_cached_token()["access_token"]
+
+
+def test_access_token_does_not_touch_the_auth_manager(endpoint):
+    auth = FakeOAuth(endpoint.url, lifetime=1.0, inline_margin=0.1)
+    refresher = TokenRefresher(auth)
+    assert asyncio.run(refresher.access_token()) == ""
+    asyncio.run(refresher.load())
+    auth.cache_handler = None  # Any cache read from here on would fail
+    assert asyncio.run(refresher.access_token()) == "token-0"
+
+
+def test_concurrent_refreshes_are_single_flight(endpoint):
+    auth = FakeOAuth(endpoint.url, lifetime=1.0, inline_margin=0.1)
+    refresher = TokenRefresher(auth, executor=ThreadPoolExecutor(max_workers=2))
+
+    async def refresh_twice():
+        return await asyncio.gather(refresher.refresh(), refresher.refresh())
+
+    assert asyncio.run(refresh_twice()) == [True, True]
+    assert endpoint.issued == 1
+    assert asyncio.run(refresher.access_token()) == "token-1"
+
+
+def test_expired_token_is_refreshed_before_use(endpoint):
+    auth = FakeOAuth(endpoint.url, lifetime=1.0, inline_margin=0.1)
+    refresher = TokenRefresher(auth)
+
+    async def after_suspend():
+        await refresher.load()
+        refresher._token_info["expires_at"] = time.time() - 1.0  # The proactive refresh slept through it
+        return await refresher.access_token()
+
+    assert asyncio.run(after_suspend()) == "token-1"
+    assert refresher.refreshes == 1
+
+
+def test_rejected_request_is_retried_with_a_refreshed_token(endpoint):
+    api = MockSpotifyApi(rtt=0.0)
+    api.expired.add("token-0")
+    auth = FakeOAuth(endpoint.url, lifetime=1.0, inline_margin=0.1)
+    refresher = TokenRefresher(auth)
+
+    async def write():
+        await refresher.load()
+        client = AsyncSpotifyClient(refresher.access_token, base_url=api.url, on_unauthorized=refresher.unauthorized)
+        try:
+            await client.volume(30)
+        finally:
+            await client.close()
+
+    asyncio.run(write())
+    api.shutdown()
+    assert [volume for _, volume in api.applied] == [30]
+    assert refresher.refreshes == 1
+
+
+def test_refresh_loop_notices_a_wall_clock_jump(monkeypatch):
+    endpoint = FakeTokenEndpoint(lifetime=3600.0, delay=0.0)
+    loop = VirtualClockLoop()
+    suspended = 0.0
+    started = time.time()
+    monkeypatch.setattr(time, "time", lambda: started + loop.time() + suspended)
+    auth = FakeOAuth(endpoint.url, lifetime=3600.0, inline_margin=0.0)
+    refresher = TokenRefresher(auth, executor=InlineExecutor(), rng=random.Random(1))
+
+    async def suspend_for_an_hour():
+        nonlocal suspended
+        refresher.start()
+        await asyncio.sleep(60.0)
+        suspended = 3600.0  # The loop clock stood still meanwhile
+        await asyncio.sleep(WAKE_CHECK_INTERVAL)
+        token = refresher._token_info["access_token"]  # Not access_token(), which would refresh it itself
+        await refresher.stop()
+        return token
+
+    token = loop.run_until_complete(suspend_for_an_hour())
+    loop.close()
+    endpoint.shutdown()
+    assert token == "token-1"
+    assert refresher.refreshes == 1
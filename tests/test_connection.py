@@ -0,0 +1,46 @@
+import shutil
+import time
+
+import pytest
+
+from orthocontrol.connection import PooledSession
+from tests.fakes import HandshakeCountingServer, self_signed_certificate
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl for a test certificate")
+
+IDLE_TIMEOUT = 0.3
+
+
+@pytest.fixture
+def certfile(tmp_path):
+    return self_signed_certificate(tmp_path)
+
+
+@pytest.fixture
+def server(certfile):
+    server = HandshakeCountingServer(certfile, IDLE_TIMEOUT, rtt=0.0)
+    yield server
+    server.shutdown()
+
+
+def test_pooled_session_reuses_its_connection(server, certfile):
+    session = PooledSession()
+    session.verify = certfile
+    session.trust_env = False  # REQUESTS_CA_BUNDLE would override `verify`
+    for _ in range(3):
+        assert session.get(server.url).status_code == 200
+    session.close()
+    assert (server.full_handshakes, server.resumed_handshakes) == (1, 0)
+    assert (session.stats.requests, session.stats.connections) == (3, 1)
+
+
+def test_pooled_session_resumes_tls(server, certfile):
+    session = PooledSession()
+    session.verify = certfile
+    session.trust_env = False
+    assert session.get(server.url).status_code == 200
+    time.sleep(IDLE_TIMEOUT * 2)
+    assert session.get(server.url).status_code == 200
+    session.close()
+    assert (server.full_handshakes, server.resumed_handshakes) == (1, 1)
+    assert session.stats.resumed == 1
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from orthocontrol.midi.gestures import DOUBLE_TAP, LONG_PRESS, LONG_PRESS_GESTURE, TAP, ButtonGestures
+from tests.fakes import VirtualClockLoop
+
+
+def run_button(events, long_press_bound=True):
+    """Replays (time, "press" | "release" | "turn") on a virtual clock; returns (time, gesture) fired."""
+    loop = VirtualClockLoop()
+    fired = []
+    bindings = {gesture: (lambda gesture=gesture: fired.append((loop.time(), gesture)))
+                for gesture in (TAP, DOUBLE_TAP) + ((LONG_PRESS_GESTURE,) if long_press_bound else ())}
+    button = ButtonGestures(bindings, undoable=frozenset({TAP}))
+
+    async def replay():
+        actions = {"press": button.press, "release": button.release, "turn": button.turned}
+        for at, event in events:
+            loop.call_at(at, actions[event])
+        await asyncio.sleep(events[-1][0] + 2.0)
+
+    loop.run_until_complete(replay())
+    loop.close()
+    return fired
+
+
+def test_tap_fires_on_release_when_a_long_press_is_bound():
+    assert run_button([(0.0, "press"), (0.1, "release")]) == [(pytest.approx(0.1), TAP)]
+
+
+def test_long_press_does_not_toggle_the_tap_first():
+    fired = run_button([(0.0, "press"), (1.0, "release")])
+    assert fired == [(pytest.approx(LONG_PRESS), LONG_PRESS_GESTURE)]
+
+
+def test_second_tap_undoes_the_speculative_tap():
+    fired = run_button([(0.0, "press"), (0.1, "release"), (0.2, "press"), (0.3, "release")])
+    assert [gesture for _, gesture in fired] == [TAP, TAP, DOUBLE_TAP]
+    assert fired[-1][0] == pytest.approx(0.3)  # No triple tap is bound, so no need to wait for one
+
+
+def test_without_long_press_tap_fires_on_press_and_press_turn_undoes_it():
+    assert run_button([(0.0, "press"), (0.1, "release")], long_press_bound=False) == [(0.0, TAP)]
+    fired = run_button([(0.0, "press"), (0.2, "turn"), (0.4, "release")], long_press_bound=False)
+    assert fired == [(0.0, TAP), (pytest.approx(0.2), TAP)]
@@ -0,0 +1,50 @@
+import pytest
+
+from orthocontrol.midi.hires import HIGH_RESOLUTION_STEPS, HighResolutionCC, NrpnAssembler
+
+LUT = tuple(float(value) for value in range(HIGH_RESOLUTION_STEPS))
+
+
+def recording():
+    values = []
+    return values, lambda value, delta: values.append((value, delta))
+
+
+def test_pair_emits_once_with_the_held_delta():
+    values, handler = recording()
+    cc = HighResolutionCC(handler, LUT)
+    cc.msb(64, 0.01)
+    cc.lsb(1, 0.002)
+    cc.lsb(2, 0.01)  # Coarse part unchanged: the sender only sends the LSB
+    assert values == [((64 << 7) | 1, pytest.approx(0.012)), ((64 << 7) | 2, 0.01)]
+
+
+def test_msb_only_sender_emits_the_held_msb_and_reaches_full_scale():
+    values, handler = recording()
+    cc = HighResolutionCC(handler, LUT)
+    cc.msb(100, 0.01)
+    cc.msb(127, 0.02)
+    cc.msb(0, 0.03)
+    assert values == [(float((100 << 7) | 100), 0.01), (float(HIGH_RESOLUTION_STEPS - 1), 0.02), (0.0, 0.03)]
+
+
+def test_lsb_after_msb_only_returns_to_pairs():
+    values, handler = recording()
+    cc = HighResolutionCC(handler, LUT)
+    cc.msb(10, 0.0)
+    cc.msb(11, 0.0)
+    cc.lsb(5, 0.0)
+    cc.msb(12, 0.0)
+    cc.lsb(6, 0.0)
+    assert [value for value, _ in values] == [(10 << 7) | 10, (11 << 7) | 11, (11 << 7) | 5, (12 << 7) | 6]
+
+
+def test_nrpn_routes_values_to_the_selected_parameter():
+    volume, volume_handler = recording()
+    nrpn = NrpnAssembler({(1 << 7) | 2: (volume_handler, LUT)})
+    for parameter in ((1, 3), (1, 2)):
+        nrpn.parameter_msb(parameter[0], 0.0)
+        nrpn.parameter_lsb(parameter[1], 0.0)
+        nrpn.msb(20, 0.0)
+        nrpn.lsb(30, 0.0)
+    assert volume == [((20 << 7) | 30, 0.0)]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from orthocontrol.playback import PlaybackStateCache
+from orthocontrol.ratelimit import AdaptiveTokenBucket
+from tests.fakes import RateLimited, VirtualClockLoop
+
+
+def run_cache(fetch, limiter, until, before_start=None):
+    """Runs a cache refreshing every second on a virtual clock; returns the fetch times."""
+    loop = VirtualClockLoop()
+    fetches = []
+
+    async def timed_fetch():
+        fetches.append(loop.time())
+        return await fetch()
+
+    cache = PlaybackStateCache(timed_fetch, fast_interval=1.0, idle_interval=1.0, limiter=limiter)
+
+    async def main():
+        if before_start:
+            before_start(loop.time())
+        cache.start()
+        await asyncio.sleep(until)
+        await cache.stop()
+
+    loop.run_until_complete(main())
+    loop.close()
+    return fetches, cache
+
+
+async def playing():
+    return {"device": {"id": "device", "volume_percent": 50}, "is_playing": True}
+
+
+def test_refreshes_wait_out_a_block_on_the_shared_limiter():
+    limiter = AdaptiveTokenBucket()
+
+    def worker_rate_limited(now):
+        limiter.on_rate_limited(now, now + 5.0)  # A volume write got a 429 with Retry-After: 5
+
+    fetches, cache = run_cache(playing, limiter, until=8.5, before_start=worker_rate_limited)
+    assert fetches == pytest.approx([5.0, 6.0, 7.0, 8.0])
+    assert cache.postponed == 1
+
+
+def test_rate_limited_refresh_backs_off_the_limiter():
+    limiter = AdaptiveTokenBucket()
+    rate = limiter.rate
+    calls = 0
+
+    async def limited_once():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise RateLimited(retry_after=3.0)
+        return await playing()
+
+    fetches, cache = run_cache(limited_once, limiter, until=5.5)
+    assert fetches == pytest.approx([1.0, 4.0, 5.0])
+    assert cache.rate_limited == 1
+    assert cache.refreshes == 2
+    assert limiter.rate < rate
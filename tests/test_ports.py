@@ -0,0 +1,80 @@
+import asyncio
+import random
+
+from orthocontrol.midi.ports import BACKOFF_MAX, MidiServerRestarts, PortDirectory, PortSupervisor, find_port
+from tests.fakes import VirtualClockLoop
+
+
+class FakeMidiSide:
+    """get_ports() of an rtmidi MidiIn/MidiOut; counts enumerations."""
+
+    def __init__(self, ports):
+        self.ports = ports
+        self.enumerations = 0
+
+    def get_ports(self):
+        self.enumerations += 1
+        return list(self.ports)
+
+
+def test_find_port_ignores_alsa_ids():
+    ports = ["Midi Through:Midi Through Port-0 14:0", "ortho remote:ortho remote MIDI 1 28:0"]
+    assert find_port(ports, "ortho remote:ortho remote MIDI 1 28:0") == 1
+    assert find_port(ports, "ortho remote:ortho remote MIDI 1 32:0") == 1
+    assert find_port(ports, "ortho remote:ortho remote MIDI 1") == 1
+    assert find_port(ports, "other") is None
+
+
+def test_supervisors_share_one_enumeration_per_check():
+    loop = VirtualClockLoop()
+    names = ["remote a", "remote b", "remote c"]
+    midi_in, midi_out = FakeMidiSide(names), FakeMidiSide(names)
+    directory = PortDirectory(midi_in, midi_out)
+    supervisors = [PortSupervisor(directory, name, check_interval=1.0) for name in names]
+
+    async def watch_for(seconds):
+        watches = [loop.create_task(supervisor.watch()) for supervisor in supervisors]
+        await asyncio.sleep(seconds)
+        for watch in watches:
+            watch.cancel()
+        await asyncio.gather(*watches, return_exceptions=True)
+
+    loop.run_until_complete(watch_for(10.5))
+    loop.close()
+    assert midi_in.enumerations == 10
+    assert directory.lookups == 30
+
+
+def test_reconnect_backs_off_and_restarts_within_budget():
+    loop = VirtualClockLoop()
+    midi_in, midi_out = FakeMidiSide([]), FakeMidiSide([])
+    directory = PortDirectory(midi_in, midi_out)
+    restarted = []
+    restarts = MidiServerRestarts(lambda: restarted.append(loop.time()), budget=2)
+    supervisor = PortSupervisor(directory, "remote", restarts=restarts, rng=random.Random(1))
+
+    def plug_in():
+        midi_in.ports = midi_out.ports = ["remote"]
+
+    async def reconnect():
+        loop.call_at(120.0, plug_in)
+        indexes = await supervisor.wait_for_port()
+        supervisor.connected()
+        return indexes, loop.time()
+
+    indexes, connected_at = loop.run_until_complete(reconnect())
+    loop.close()
+    assert indexes == (0, 0)
+    assert 120.0 <= connected_at <= 120.0 + BACKOFF_MAX  # Found on the first attempt after plugging in
+    assert len(restarted) == 2  # The budget, then polling at the backoff rate
+    assert supervisor.attempts == 0 and supervisor.reconnects == 1
+
+
+def test_no_restart_while_another_port_is_connected():
+    restarted = []
+    restarts = MidiServerRestarts(lambda: restarted.append(True))
+    restarts.connected("remote a")
+    assert not restarts.restart(0.0, "remote b")
+    restarts.disconnected("remote a")
+    assert restarts.restart(0.0, "remote b")
+    assert restarted == [True]
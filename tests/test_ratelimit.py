@@ -0,0 +1,86 @@
+import random
+from collections import deque
+
+import pytest
+
+from orthocontrol.ratelimit import SUSTAINED_RATE, AdaptiveTokenBucket
+from orthocontrol.sync import BURST_SYNC_INTERVAL, VolumeSyncWorker
+from tests.fakes import InlineExecutor, RateLimited, VirtualClockLoop, knob_gestures, replay_gestures
+
+
+def test_quiet_bucket_allows_a_burst_then_holds_to_the_rate():
+    bucket = AdaptiveTokenBucket(rate=2.0, burst=4.0)
+    for _ in range(4):
+        assert bucket.ready_at(0.0, spread=False) == 0.0
+        bucket.acquire(0.0)
+    assert bucket.ready_at(0.0, spread=False) == pytest.approx(0.5)
+
+
+def test_pace_scales_the_spreading_but_not_the_wait_for_a_token():
+    bucket = AdaptiveTokenBucket(rate=2.0, burst=4.0)
+    for _ in range(3):
+        bucket.acquire(0.0)
+    assert bucket.ready_at(0.0, pace=2.0) - bucket.ready_at(0.0) == pytest.approx(bucket.ready_at(0.0))
+    bucket.acquire(0.0)
+    assert bucket.ready_at(0.0, pace=2.0) == bucket.ready_at(0.0) == pytest.approx(0.5)
+
+
+def test_idle_successes_do_not_raise_the_limits():
+    bucket = AdaptiveTokenBucket()
+    for t in range(100):
+        bucket.acquire(float(t))
+        bucket.on_success()
+    assert (bucket.rate, bucket.burst) == (SUSTAINED_RATE, 10.0)
+
+
+def test_limits_recover_to_their_starting_point_faster_than_they_probe_beyond_it():
+    def gain_at_the_limit(bucket):
+        while bucket.ready_at(0.0, spread=False) == 0.0:
+            bucket.acquire(0.0)  # Drain it: only demand at the limit raises the limits
+        rate = bucket.rate
+        for _ in range(2):
+            bucket.acquire(0.0)
+            bucket.on_success()
+        return bucket.rate - rate
+
+    bucket = AdaptiveTokenBucket(rate=2.0, burst=4.0)
+    bucket.on_rate_limited(0.0)
+    assert gain_at_the_limit(AdaptiveTokenBucket(rate=2.0)) > 0.0
+    assert gain_at_the_limit(bucket) > 4 * gain_at_the_limit(AdaptiveTokenBucket(rate=2.0))
+
+
+def test_retry_after_leaves_exactly_one_token_at_the_retry_time():
+    bucket = AdaptiveTokenBucket(rate=2.0, burst=4.0)
+    bucket.acquire(0.0)
+    bucket.on_rate_limited(0.0, retry_at=3.0)
+    assert bucket.rate == 1.0
+    assert bucket.ready_at(0.0, spread=False) == pytest.approx(3.0)
+    assert bucket.ready_at(0.0) == pytest.approx(3.0)
+
+
+def test_spins_stay_under_a_window_limit_and_land_their_final_values():
+    """A backend allowing 90 calls per 30 s, as `benchmark.py ratelimit` uses."""
+    gap, limit, window_length = 2.0, 90, 30.0
+    loop = VirtualClockLoop()
+    synced, rejected, window = [], [], deque()
+
+    def sync_volume(volume):
+        now = loop.time()
+        while window and window[0] <= now - window_length:
+            window.popleft()
+        if len(window) >= limit:
+            rejected.append(now)
+            raise RateLimited(window[0] + window_length - now)
+        window.append(now)
+        synced.append((now, volume))
+        return True
+
+    worker = VolumeSyncWorker(sync_volume, sync_interval=BURST_SYNC_INTERVAL, executor=InlineExecutor(),
+                              limiter=AdaptiveTokenBucket(), rng=random.Random(1))
+    windows = loop.run_until_complete(
+        replay_gestures(knob_gestures(10, seed=3, durations=(5.0, 15.0)), worker, None, gap))
+    loop.close()
+
+    assert rejected == []
+    for start, end, final in windows:
+        assert [volume for t, volume in synced if start <= t < end + gap][-1] == round(final)
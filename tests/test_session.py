@@ -0,0 +1,52 @@
+import pytest
+
+from orthocontrol.midi.filter import MidiFilter
+from orthocontrol.midi.session import SessionLog, SessionRecorder, replay_session
+from tests.fakes import VirtualClockLoop
+
+EVENTS = [([0xB0, 7, 10], 0.0), ([0xF0, 0x7E, 0x7F, 0x06, 0x01, 0xF7], 0.05), ([0x90, 60, 100], 0.1),
+          ([0xB0, 7, 20], 0.25), ([0x80, 60, 0], 0.5)]
+
+
+@pytest.fixture
+def session_path(tmp_path):
+    path = tmp_path / "session.ocmidi"
+    with SessionRecorder(str(path)) as recorder:
+        for event in EVENTS:
+            recorder.record(event)
+    return path
+
+
+def test_log_reads_back_recorded_events_with_skipped_deltas_carried(session_path):
+    with SessionLog(str(session_path)) as log:
+        assert len(log) == 4
+        assert list(log) == [([0xB0, 7, 10], 0.0), ([0x90, 60, 100], pytest.approx(0.15)),
+                             ([0xB0, 7, 20], 0.25), ([0x80, 60, 0], 0.5)]
+        assert log[3] == ([0x80, 60, 0], 0.5)
+        assert log.duration() == pytest.approx(0.9)
+        with pytest.raises(IndexError):
+            log[4]
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "not-a-session"
+    path.write_bytes(b"MThd\x00\x00\x00\x06")
+    with pytest.raises(ValueError):
+        SessionLog(str(path))
+
+
+def test_replay_keeps_recorded_timing_and_carries_filtered_deltas(session_path):
+    loop = VirtualClockLoop()
+    delivered = []
+
+    def callback(event, label):
+        delivered.append((loop.time(), event, label))
+
+    with SessionLog(str(session_path)) as log:
+        count = loop.run_until_complete(replay_session(log, callback, "remote", speed=2.0,
+                                                       midi_filter=MidiFilter({0xB0: {7}})))
+    loop.close()
+    assert count == 2
+    assert [(t, message, delta) for t, (message, delta), _ in delivered] == [
+        (0.0, [0xB0, 7, 10], 0.0), (pytest.approx(0.2), [0xB0, 7, 20], pytest.approx(0.4))]
+    assert delivered[0][2] == "remote"
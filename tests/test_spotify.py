@@ -0,0 +1,189 @@
+import asyncio
+import shutil
+
+import certifi
+import pytest
+
+from orthocontrol.connection import ConnectionStats, ResumingSSLContext
+from orthocontrol.spotify import AsyncSpotifyClient, SpotifyApiError
+from orthocontrol.sync import VolumeSyncWorker
+from tests.fakes import HandshakeCountingServer, MockSpotifyApi, self_signed_certificate, static_token
+
+IDLE_TIMEOUT = 0.3
+needs_openssl = pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl for a test certificate")
+
+
+@pytest.fixture
+def api():
+    api = MockSpotifyApi(rtt=0.01)
+    yield api
+    api.shutdown()
+
+
+@pytest.fixture
+def certfile(tmp_path):
+    return self_signed_certificate(tmp_path)
+
+
+@pytest.fixture
+def https_server(certfile):
+    server = HandshakeCountingServer(certfile, IDLE_TIMEOUT, rtt=0.0)
+    yield server
+    server.shutdown()
+
+
+def run_client(api, calls, **kwargs):
+    """Runs `calls(client)` against the mock API; returns its result and the client."""
+    async def main():
+        client = AsyncSpotifyClient(static_token, base_url=api.url, **kwargs)
+        try:
+            return await calls(client), client
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_reads_and_writes_share_pooled_connections(api):
+    async def calls(client):
+        await client.volume(30)
+        playback = await client.current_playback()
+        devices = await client.devices()
+        return playback, devices
+
+    (playback, devices), client = run_client(api, calls)
+    assert playback["device"]["volume_percent"] == 30
+    assert devices["devices"][0]["id"] == "mock-device"
+    assert [volume for _, volume in api.applied] == [30]
+    assert (client.stats.requests, client.stats.connections) == (3, 1)
+
+
+def test_error_response_raises_with_status_and_reason(api):
+    api.active_at = float("inf")
+
+    async def calls(client):
+        with pytest.raises(SpotifyApiError) as error:
+            await client.volume(40)
+        await client.transfer_playback("mock-device", force_play=False)
+        await client.volume(40)
+        return error.value
+
+    error, _ = run_client(api, calls)
+    assert error.http_status == 404
+    assert error.reason == "NO_ACTIVE_DEVICE"
+    assert api.volume == 40
+
+
+def test_cancelled_request_closes_its_connection(api):
+    api.stall_every, api.stall = 1, 1.0
+
+    async def calls(client):
+        write = asyncio.create_task(client.volume(60))
+        await asyncio.sleep(0.2)
+        write.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await write
+        api.stall_every = 0
+        return await client.current_playback()
+
+    playback, client = run_client(api, calls)
+    assert playback["device"]["volume_percent"] == 60  # Applied on arrival; only the response stalled
+    assert client.cancelled == 1
+    assert client.stats.connections == 2
+
+
+def test_sync_worker_abandons_a_stalled_write_for_a_newer_target(api):
+    api.stall_every, api.stall = 1, 2.0
+
+    async def calls(client):
+        async def sync_volume(volume):
+            await client.volume(round(volume))
+            return True
+
+        worker = VolumeSyncWorker(sync_volume, sync_interval=0.05, abandon_after=0.3, settle_delay=None)
+        worker.start()
+        worker.set_target(20)
+        await asyncio.sleep(0.1)
+        api.stall_every = 0
+        worker.set_target(70)
+        await asyncio.sleep(1.0)
+        await worker.stop()
+        return worker
+
+    worker, client = run_client(api, calls)
+    assert worker.abandoned == 1
+    assert worker.synced_volume == 70
+    assert api.volume == 70
+    assert client.cancelled == 1
+
+
+@needs_openssl
+def test_client_resumes_tls_after_the_host_drops_the_connection(https_server, certfile):
+    async def requests_with_idle_gap():
+        client = AsyncSpotifyClient(static_token, base_url=https_server.url, cafile=certfile)
+        await client.current_user()
+        await client.current_user()  # Reuses the pooled connection
+        await asyncio.sleep(IDLE_TIMEOUT * 2)
+        await client.current_user()
+        await client.close()
+        return client.stats
+
+    stats = asyncio.run(requests_with_idle_gap())
+    assert (https_server.full_handshakes, https_server.resumed_handshakes) == (1, 1)
+    assert (stats.requests, stats.connections, stats.resumed) == (3, 2, 1)
+    assert len(stats.connect_ms) == len(stats.tls_ms) == 2
+
+
+@needs_openssl
+def test_client_keep_alive_holds_the_connection_open(https_server, certfile):
+    async def requests_with_keep_alive():
+        client = AsyncSpotifyClient(static_token, base_url=https_server.url, cafile=certfile)
+        await client.current_user()
+        keep_alive = asyncio.create_task(client.keep_alive(IDLE_TIMEOUT / 3))
+        await asyncio.sleep(IDLE_TIMEOUT * 3)
+        await client.current_user()
+        keep_alive.cancel()
+        await client.close()
+        return client.stats
+
+    stats = asyncio.run(requests_with_keep_alive())
+    assert (https_server.full_handshakes, https_server.resumed_handshakes) == (1, 0)
+    assert stats.probes >= 3
+    assert stats.connections == 1
+
+
+def test_default_ssl_context_trusts_the_certifi_bundle():
+    context = ResumingSSLContext(ConnectionStats())
+    bundled = ResumingSSLContext(ConnectionStats(), certifi.where())
+    assert context.cert_store_stats()["x509_ca"] == bundled.cert_store_stats()["x509_ca"] > 0
+
+
+@pytest.mark.parametrize("status, content_type, body, message", [
+    (502, "text/html", b"<html>Bad Gateway</html>", "<html>Bad Gateway</html>"),
+    (502, "text/plain", b"", ""),
+    (503, "application/json", b'["unavailable"]', '["unavailable"]'),
+    (400, "application/json", b'{"error": "invalid_request"}', "invalid_request"),
+])
+def test_error_bodies_that_are_not_json_objects_raise_api_errors(status, content_type, body, message):
+    async def canned_response():
+        async def respond(reader, writer):
+            while await reader.readline() not in (b"\r\n", b""):
+                pass
+            writer.write(f"HTTP/1.1 {status} Error\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(respond, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = AsyncSpotifyClient(static_token, base_url=f"http://127.0.0.1:{port}/v1")
+        try:
+            with pytest.raises(SpotifyApiError) as error:
+                await client.current_playback()
+            return error.value
+        finally:
+            await client.close()
+            server.close()
+
+    error = asyncio.run(canned_response())
+    assert error.http_status == status
+    assert error.msg.endswith(message)
@@ -0,0 +1,40 @@
+import sys
+
+import pytest
+
+if sys.version_info < (3, 12):
+    pytest.skip("the control strategies use typing.override (Python 3.12)", allow_module_level=True)
+
+from spotipy.exceptions import SpotifyException  # noqa: E402
+
+from orthocontrol.control.spotify_api_strategy import SpotifyApiMediaStrategy  # noqa: E402
+from orthocontrol.playback import PlaybackStateCache  # noqa: E402
+
+
+class FakeSpotify:
+    """The spotipy.Spotify calls the strategy makes. Playback has moved to `device`;
+    volume writes to any other device get 404."""
+
+    def __init__(self, device):
+        self.device = device
+        self.volume_writes = []
+
+    def current_playback(self):
+        return {"device": {"id": self.device, "name": "Speaker", "volume_percent": 50}, "is_playing": True}
+
+    def volume(self, volume_percent, device_id=None):
+        self.volume_writes.append((volume_percent, device_id))
+        if device_id != self.device:
+            raise SpotifyException(404, -1, "Device not found", reason="NO_ACTIVE_DEVICE")
+
+
+def test_device_rejected_with_404_is_not_taken_from_stale_playback_state():
+    sp = FakeSpotify("new-device")
+    playback_state = PlaybackStateCache(sp.current_playback)
+    playback_state.set({"device": {"id": "old-device", "volume_percent": 50}, "is_playing": True})
+    strategy = SpotifyApiMediaStrategy(sp, playback_state=playback_state)
+
+    assert not strategy.set_volume("Spotify", 40)
+    assert strategy.set_volume("Spotify", 45)
+    assert strategy.set_volume("Spotify", 50)
+    assert sp.volume_writes == [(40, "old-device"), (45, "new-device"), (50, "new-device")]
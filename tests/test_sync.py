@@ -0,0 +1,128 @@
+import asyncio
+import random
+import time
+
+import pytest
+
+from orthocontrol.midi.motion import MotionTracker
+from orthocontrol.ratelimit import AdaptiveTokenBucket
+from orthocontrol.sync import BURST_SYNC_INTERVAL, RETRY_AFTER_JITTER, VolumeSyncWorker, retry_after
+from tests.fakes import FlakyBackend, InlineExecutor, RateLimited, VirtualClockLoop, knob_gestures, replay_gestures
+
+
+def run_worker(targets, sync_interval, settle_delay, until):
+    """Posts (time, percent) targets to a worker on a virtual clock; returns (time, volume) writes."""
+    loop = VirtualClockLoop()
+    writes = []
+
+    def sync_volume(volume):
+        writes.append((loop.time(), volume))
+        return True
+
+    worker = VolumeSyncWorker(sync_volume, sync_interval=sync_interval, executor=InlineExecutor(),
+                              settle_delay=settle_delay)
+
+    async def feed():
+        worker.start()
+        for at, percent in targets:
+            loop.call_at(at, worker.set_target, percent)
+        await asyncio.sleep(until)
+        await worker.stop()
+
+    loop.run_until_complete(feed())
+    loop.close()
+    return writes, worker.settles
+
+
+async def sleep_and_time(loop, delays):
+    times = []
+    for delay in delays:
+        await asyncio.sleep(delay)
+        times.append(loop.time())
+    return times
+
+
+def test_virtual_clock_jumps_to_timers():
+    loop = VirtualClockLoop()
+    times = loop.run_until_complete(sleep_and_time(loop, (0.5, 1.25, 60.0)))
+    loop.close()
+    assert times == pytest.approx([0.5, 1.75, 61.75])
+
+
+def test_settle_sends_held_final_value_early():
+    writes, settles = run_worker([(0.0, 10), (0.1, 20)], sync_interval=1.0, settle_delay=0.4, until=2.0)
+    assert [volume for _, volume in writes] == [10, 20]
+    assert writes[1][0] == pytest.approx(0.5)
+    assert settles == 1
+
+
+def test_without_settle_final_value_waits_for_interval():
+    writes, settles = run_worker([(0.0, 10), (0.1, 20)], sync_interval=1.0, settle_delay=None, until=2.0)
+    assert [volume for _, volume in writes] == [10, 20]
+    assert writes[1][0] == pytest.approx(1.0)
+    assert settles == 0
+
+
+@pytest.mark.parametrize("failure_rate, rate_limit_rate", [(0.0, 0.0), (0.2, 0.0), (0.1, 0.05)])
+def test_settle_fires_at_most_once_per_gesture_and_delivers_final_values(failure_rate, rate_limit_rate):
+    gap = 1.5
+    loop = VirtualClockLoop()
+    backend = FlakyBackend(loop, failure_rate, rate_limit_rate, seed=3)
+    tracker = MotionTracker()
+    backend.worker = VolumeSyncWorker(backend, sync_interval=BURST_SYNC_INTERVAL, executor=InlineExecutor(),
+                                      pace=tracker.pace_factor, limiter=AdaptiveTokenBucket(), rng=random.Random(3))
+    windows = loop.run_until_complete(replay_gestures(knob_gestures(100, seed=3), backend.worker, tracker, gap))
+    loop.close()
+
+    settles_before = 0
+    for start, end, final in windows:
+        in_gesture = [(volume, settles) for t, volume, settles in backend.attempts if start <= t < end + gap]
+        assert in_gesture[-1][0] == round(final)
+        assert in_gesture[-1][1] - settles_before <= 1
+        settles_before = in_gesture[-1][1]
+
+
+class HeaderError(Exception):
+    def __init__(self, headers):
+        super().__init__("429 Too Many Requests")
+        self.headers = headers
+
+
+def test_retry_after_reads_seconds_and_http_dates(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: 1_000_000_000.0)  # Sun, 09 Sep 2001 01:46:40 GMT
+    assert retry_after(HeaderError({"Retry-After": "7"})) == 7.0
+    assert retry_after(HeaderError({"retry-after": "2.5"})) == 2.5
+    assert retry_after(HeaderError({"Retry-After": "Sun, 09 Sep 2001 01:47:10 GMT"})) == 30.0
+    assert retry_after(HeaderError({"Retry-After": "Sun, 09 Sep 2001 01:40:00 GMT"})) == 0.0
+    assert retry_after(HeaderError({"Retry-After": "-3"})) == 0.0
+
+
+def test_retry_after_is_none_without_a_usable_header():
+    assert retry_after(Exception()) is None
+    assert retry_after(HeaderError(None)) is None
+    assert retry_after(HeaderError({"Retry-After": "soon"})) is None
+
+
+def test_worker_waits_out_retry_after_plus_jitter():
+    loop = VirtualClockLoop()
+    writes = []
+
+    def sync_volume(volume):
+        writes.append((loop.time(), volume))
+        if len(writes) == 1:
+            raise RateLimited(3)
+        return True
+
+    worker = VolumeSyncWorker(sync_volume, sync_interval=0.25, executor=InlineExecutor(), rng=random.Random(1))
+
+    async def feed():
+        worker.start()
+        loop.call_at(0.0, worker.set_target, 10)
+        loop.call_at(0.1, worker.set_target, 20)
+        await asyncio.sleep(5.0)
+        await worker.stop()
+
+    loop.run_until_complete(feed())
+    loop.close()
+    assert [volume for _, volume in writes] == [10, 20]
+    assert 3.0 <= writes[1][0] <= 3.0 + RETRY_AFTER_JITTER
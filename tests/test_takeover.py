@@ -0,0 +1,42 @@
+import pytest
+
+from orthocontrol.midi import takeover
+from orthocontrol.midi.takeover import JUMP, PICKUP, SCALE, SoftTakeover, TakeoverSettings, parse_takeover_settings
+
+
+def test_parse_per_app_settings():
+    settings = parse_takeover_settings("Spotify=scale,Music=pickup:5,jump")
+    assert settings == {"default": TakeoverSettings(JUMP), "Spotify": TakeoverSettings(SCALE),
+                        "Music": TakeoverSettings(PICKUP, 5.0)}
+    with pytest.raises(ValueError):
+        parse_takeover_settings("Spotify=grab")
+
+
+def test_pickup_ignores_the_knob_until_it_reaches_the_volume(monkeypatch):
+    now = 100.0
+    monkeypatch.setattr(takeover.time, "monotonic", lambda: now)
+    knob = SoftTakeover(TakeoverSettings(PICKUP, tolerance=2.0))
+    knob.reset(60.0)
+    assert [knob.feed(position) for position in (20.0, 40.0, 57.0)] == [None, None, None]
+    now = 101.5
+    assert knob.feed(59.0) == 59.0
+    assert knob.feed(30.0) == 30.0  # Engaged: follows the knob from here on
+    assert knob.control_times == [1.5]
+
+
+def test_scale_converges_on_the_knob_at_the_end_of_its_travel():
+    knob = SoftTakeover(TakeoverSettings(SCALE, tolerance=1.0))
+    knob.reset(80.0)
+    volumes = [knob.feed(position) for position in (20.0, 40.0, 60.0, 80.0, 100.0)]
+    assert volumes[0] == 80.0  # The first message only sets the reference position
+    assert volumes[1:4] == sorted(volumes[1:4]) and volumes[1] > 80.0
+    assert volumes[-1] == 100.0
+    assert knob.engaged
+
+
+def test_jump_and_unknown_volume_take_control_at_once():
+    knob = SoftTakeover(TakeoverSettings(JUMP))
+    knob.reset(80.0)
+    assert knob.feed(10.0) == 10.0
+    knob.reset(None, TakeoverSettings(PICKUP))
+    assert knob.feed(10.0) == 10.0